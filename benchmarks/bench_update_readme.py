@@ -0,0 +1,272 @@
+"""
+Reproducible benchmarks for marker replacement and commit-info fetching.
+
+Every case runs in a fresh worker process so peak RSS is measured per case.
+Results are written as JSON and can be compared against a previous run:
+
+    python benchmarks/bench_update_readme.py --preset quick --output bench.json
+    python benchmarks/bench_update_readme.py --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+KB = 1024
+MB = 1024 * KB
+
+# (kind, params) pairs; documents are generated on the fly in a temp directory
+PRESETS = {
+    "quick": [
+        ("replace", {"size": 1 * KB, "markers": 1}),
+        ("replace", {"size": 1 * MB, "markers": 100}),
+        ("replace", {"size": 1 * MB, "markers": 100, "pathological": True}),
+        ("stream", {"size": 1 * MB, "markers": 100}),
+        ("batch", {"files": 200, "size": 4 * KB, "workers": 8}),
+        ("fetch", {"requests": 20, "latency_ms": 20, "concurrency": 8}),
+    ],
+    "full": [
+        ("replace", {"size": 1 * KB, "markers": 1}),
+        ("replace", {"size": 1 * MB, "markers": 100}),
+        ("replace", {"size": 50 * MB, "markers": 1000}),
+        ("replace", {"size": 50 * MB, "markers": 10000}),
+        ("replace", {"size": 50 * MB, "markers": 100, "pathological": True}),
+        ("stream", {"size": 50 * MB, "markers": 1000}),
+        ("stream", {"size": 500 * MB, "markers": 1000}),
+        ("batch", {"files": 3000, "size": 4 * KB, "workers": 16}),
+        ("fetch", {"requests": 200, "latency_ms": 50, "concurrency": 32}),
+    ],
+}
+
+
+def generate_document(path: Path, size: int, markers: int, pathological: bool = False, seed: int = 0):
+    """
+    Write a synthetic Markdown document of roughly `size` bytes with `markers`
+    marker sections spread evenly through it. Pathological documents fill the
+    space between sections with unterminated START comments and near-miss
+    tokens that make naive non-greedy patterns backtrack.
+    """
+    rng = random.Random(seed)
+    names = [f"SECTION_{i}" for i in range(markers)]
+    filler_line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"
+    if pathological:
+        filler_line = "<!-- SECTION_0_START --> <!-- SECTION_X_END <!-- -- >\n"
+    gap = max(0, size // max(1, markers) - 64)
+    filler = (filler_line * (gap // len(filler_line) + 1))[:gap]
+
+    with open(path, "w", encoding="utf-8") as f:
+        for name in names:
+            f.write(filler)
+            f.write(f"\n<!-- {name}_START -->\nold {rng.random()}\n<!-- {name}_END -->\n")
+    return names
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _timed(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _case_replace(params: dict, repeat: int, tmp: Path, stream: bool = False) -> dict:
+    from update_readme import update_file, update_file_streaming
+
+    path = tmp / "doc.md"
+    names = generate_document(path, params["size"], params["markers"], params.get("pathological", False))
+    size = path.stat().st_size
+    # A new status per iteration, so every run rewrites the sections instead of
+    # taking the unchanged path once the first run has written them
+    statuses = iter(range(repeat))
+    update = update_file_streaming if stream else update_file
+    run = lambda: update(path, status=f"✅ {next(statuses)}", markers=names, backup="off")
+    samples = _timed(run, repeat)
+    return {"samples": samples, "bytes": size}
+
+
+def _case_batch(params: dict, repeat: int, tmp: Path) -> dict:
+    from update_readme import update_files
+
+    paths = []
+    for i in range(params["files"]):
+        path = tmp / f"pkg{i}" / "README.md"
+        path.parent.mkdir()
+        generate_document(path, params["size"], 1, seed=i)
+        paths.append(path)
+    statuses = iter(range(repeat))
+    run = lambda: update_files(
+        paths, status=f"✅ {next(statuses)}", markers=["SECTION_0"], workers=params["workers"], backup="off"
+    )
+    samples = _timed(run, repeat)
+    return {"samples": samples, "files": len(paths)}
+
+
+class _SlowCommits(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    body = json.dumps([
+        {"commit": {"author": {"date": "2025-01-01T00:00:00Z"}, "message": "benchmark commit"}}
+    ]).encode("utf-8")
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _case_fetch(params: dict, repeat: int, tmp: Path) -> dict:
+    import update_readme_rest
+
+    _SlowCommits.latency = params["latency_ms"] / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowCommits)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    update_readme_rest.GITHUB_API = f"http://127.0.0.1:{server.server_port}"
+    os.environ["GITHUB_TOKEN"] = "benchmark"
+    targets = [("owner", f"repo{i}") for i in range(params["requests"])]
+    try:
+        single = _timed(lambda: update_readme_rest.fetch_latest_user_commit_info("owner", "repo"), repeat)
+        many = _timed(
+            lambda: update_readme_rest.fetch_many_latest_user_commit_info(
+                targets, concurrency=params["concurrency"]
+            ),
+            repeat,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {"samples": single, "batch_samples": many, "files": len(targets)}
+
+
+CASES = {
+    "replace": _case_replace,
+    "stream": lambda params, repeat, tmp: _case_replace(params, repeat, tmp, stream=True),
+    "batch": _case_batch,
+    "fetch": _case_fetch,
+}
+
+
+def run_case(kind: str, params: dict, repeat: int) -> dict:
+    """Run one case in the current process and summarise it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = CASES[kind](params, repeat, Path(tmp))
+
+    samples = raw["samples"]
+    median = statistics.median(samples)
+    result = {
+        "name": kind + "[" + ",".join(f"{k}={v}" for k, v in sorted(params.items())) + "]",
+        "kind": kind,
+        "params": params,
+        "repeat": repeat,
+        "p50_ms": median * 1000,
+        "p99_ms": _percentile(samples, 99) * 1000,
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        // (1024 if sys.platform == "darwin" else 1),
+    }
+    if "bytes" in raw:
+        result["mb_per_s"] = raw["bytes"] / MB / median
+    if "batch_samples" in raw:
+        batch_median = statistics.median(raw["batch_samples"])
+        result["batch_p50_ms"] = batch_median * 1000
+        result["files_per_s"] = raw["files"] / batch_median
+    elif "files" in raw:
+        result["files_per_s"] = raw["files"] / median
+    return result
+
+
+def run_isolated(kind: str, params: dict, repeat: int) -> dict:
+    """Run one case in a fresh process so peak RSS belongs to that case alone."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(run_case, kind, params, repeat).result()
+
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "-C", str(ROOT), "rev-parse", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Return a description of every case whose p50 latency grew by more than
+    `threshold` (a fraction) compared to `baseline`.
+    """
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(result["name"])
+        if before and result["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            regressions.append(
+                f"{result['name']}: p50 {before['p50_ms']:.2f} ms -> {result['p50_ms']:.2f} ms"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark marker replacement and fetch paths")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--repeat", type=int, default=5, help="Iterations per case")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Fail if any case regressed against BASELINE")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p50 slowdown (default: 0.2)")
+    args = parser.parse_args()
+
+    report = {"meta": _metadata(), "results": []}
+    for kind, params in PRESETS[args.preset]:
+        result = run_isolated(kind, params, args.repeat)
+        report["results"].append(result)
+        print(f"{result['name']}: p50 {result['p50_ms']:.2f} ms", file=sys.stderr)
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(baseline, report, args.threshold)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Differential fuzzing of the marker engines against a reference implementation.
+
+Documents are generated from a seed, so every failure can be replayed:
+nested, overlapping, unbalanced and duplicated markers, markers that are
+prefixes of each other, near-miss comments, START attributes (including
+embedded templates), long lines, non-ASCII text, CRLF line endings and
+byte order marks. Each case checks every
+engine (in-memory, bytes/mmap scan, streaming with random chunk sizes,
+MarkerIndex) against a deliberately naive reference, and fails if it takes
+longer than the time limit or allocates more than the memory budget. Cases
+run in a pool of worker processes, one per core by default:
+
+    python fuzz/fuzz_markers.py --cases 2000 --max-size 4194304
+    python fuzz/fuzz_markers.py --seed 1234 --cases 1    # replay one case
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from update_readme import (  # noqa: E402
+    MarkerIndex,
+    MarkerNotFoundError,
+    RunContext,
+    find_marker_regions,
+    update_path,
+)
+
+KB = 1024
+MB = 1024 * KB
+
+MARKERS = ("A", "A_B", "B", "SECTION")
+STATUS = "fuzzed ✅"
+TEMPLATE_ATTR = 'template="'
+
+DEFAULT_CASES = 200
+DEFAULT_MAX_SIZE = 64 * KB
+# Per case: seconds, and bytes of Python allocations per byte of document
+DEFAULT_TIME_LIMIT = 10.0
+MEMORY_FACTOR = 24
+MEMORY_SLACK = 4 * MB
+
+_WORDS = ["lorem", "ipsum", "dolor", "<!--", "-->", "--", "<", ">", "_START", "_END", "é", "✅", "日本"]
+
+
+def _attrs(rng: random.Random) -> str:
+    """START/END attributes: an embedded template or text full of near-misses."""
+    if rng.random() < 0.5:
+        body = "".join(rng.choice("ab -<>!_é") for _ in range(rng.randint(0, 12)))
+        return f'{TEMPLATE_ATTR}{body}"'
+    return "".join(rng.choice("xyz =-<>!_\"✅") for _ in range(rng.randint(0, 16)))
+
+
+def _token(rng: random.Random) -> str:
+    marker = rng.choice(MARKERS)
+    kind = rng.choice(("START", "START", "END"))
+    roll = rng.random()
+    if roll < 0.6:
+        return f"<!-- {marker}_{kind} -->"
+    if roll < 0.8:
+        return f"<!-- {marker}_{kind} {_attrs(rng)} -->"
+    # Near misses that no engine may treat as markers
+    return rng.choice((
+        f"<!--{marker}_{kind}-->",
+        f"<!-- {marker}_{kind}-->",
+        f"<!-- {marker}_{kind} --",
+        f"<!-- {marker.lower()}_{kind} -->",
+        f"<!-- {marker}_{kind[:-1]} -->",
+        f"<!-- {marker}_{kind} {_attrs(rng)}\n -->",
+        f"<!-- {marker}X_{kind} -->",
+    ))
+
+
+def _text(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(_WORDS)
+        sep = "\n" if rng.random() < 0.15 else " "
+        words.append(word + sep)
+        length += len(word) + 1
+    return "".join(words)
+
+
+def generate_document(seed: int, max_size: int = DEFAULT_MAX_SIZE) -> str:
+    """Generate one random document, reproducibly from `seed`."""
+    rng = random.Random(seed)
+    size = int(max_size ** rng.random())
+    shape = rng.choice(("dense", "sparse", "unterminated", "long_line"))
+    parts = []
+    length = 0
+    while length < size:
+        if shape == "dense":
+            piece = _token(rng) + _text(rng, rng.randint(0, 40))
+        elif shape == "sparse":
+            piece = _text(rng, rng.randint(0, 4 * KB)) + _token(rng)
+        elif shape == "unterminated":
+            # STARTs whose END never comes, followed by lots of text to rescan
+            piece = f"<!-- {rng.choice(MARKERS)}_START -->" + _text(rng, rng.randint(0, 2 * KB))
+        else:
+            piece = _text(rng, rng.randint(0, 2 * KB)).replace("\n", " ") + _token(rng)
+        parts.append(piece)
+        length += len(piece)
+    if shape != "unterminated" and rng.random() < 0.8:
+        # Usually give every marker at least one complete pair somewhere
+        for marker in rng.sample(MARKERS, rng.randint(1, len(MARKERS))):
+            at = rng.randint(0, len(parts))
+            parts.insert(at, f"<!-- {marker}_START -->\nold\n<!-- {marker}_END -->\n")
+    document = "".join(parts)
+    if rng.random() < 0.25:
+        document = document.replace("\n", "\r\n")
+    if rng.random() < 0.1:
+        document = "\ufeff" + document
+    return document
+
+
+def generate_case(seed: int, max_size: int = DEFAULT_MAX_SIZE):
+    """The document of `seed` and the markers it is updated with."""
+    rng = random.Random(-seed - 1)
+    return generate_document(seed, max_size), rng.sample(MARKERS, rng.randint(1, len(MARKERS)))
+
+
+def _reference_token(content: str, i: int, markers: list):
+    """Return (end, marker, kind, attrs) for a marker comment at `i`, else None."""
+    for marker in sorted(markers, key=len, reverse=True):
+        for kind in ("START", "END"):
+            head = f"<!-- {marker}_{kind}"
+            if not content.startswith(head, i):
+                continue
+            p = i + len(head)
+            if content.startswith(" -->", p):
+                return p + 4, marker, kind, None
+            if content.startswith(" ", p):
+                q = content.find(" -->", p + 1)
+                attrs = content[p + 1:q]
+                if q >= 0 and "\n" not in attrs and "-->" not in attrs:
+                    return q + 4, marker, kind, attrs
+    return None
+
+
+def reference_regions(content: str, markers: list):
+    """
+    Naive model of marker pairing: (regions, missing, attrs), where attrs
+    holds each region's START attributes.
+    """
+    tokens = []
+    i = content.find("<!-- ")
+    while i >= 0:
+        token = _reference_token(content, i, markers)
+        if token is None:
+            i = content.find("<!-- ", i + 1)
+        else:
+            tokens.append((i,) + token)
+            i = content.find("<!-- ", token[0])
+
+    regions, attrs = [], []
+    k = 0
+    while k < len(tokens):
+        start, _, marker, kind, start_attrs = tokens[k]
+        close = None
+        if kind == "START":
+            close = next(
+                (j for j in range(k + 1, len(tokens)) if tokens[j][2:4] == (marker, "END")), None
+            )
+        if close is None:
+            k += 1
+            continue
+        regions.append((marker, start, tokens[close][1]))
+        attrs.append(start_attrs)
+        k = close + 1
+    found = {marker for marker, _, _ in regions}
+    return regions, [m for m in markers if m not in found], attrs
+
+
+def reference_update(content: str, markers: list):
+    """Expected file contents, or the missing markers."""
+    regions, missing, attrs = reference_regions(content, markers)
+    if missing:
+        return None, missing
+    # New sections follow the first line ending of the document
+    first = content.find("\n")
+    newline = "\r\n" if first > 0 and content[first - 1] == "\r" else "\n"
+    parts = []
+    pos = 0
+    for (marker, start, end), start_attrs in zip(regions, attrs):
+        body = STATUS
+        if start_attrs is not None and TEMPLATE_ATTR in start_attrs:
+            rest = start_attrs[start_attrs.index(TEMPLATE_ATTR) + len(TEMPLATE_ATTR):]
+            if '"' in rest:
+                body = rest[:rest.index('"')]
+        start_token = content[start:content.index("-->", start) + 3]
+        parts.append(content[pos:start])
+        parts.append(f"{start_token}{newline}{body}{newline}<!-- {marker}_END -->")
+        pos = end
+    parts.append(content[pos:])
+    return "".join(parts), []
+
+
+def _byte_regions(content: str, regions: list) -> list:
+    def offset(i):
+        return len(content[:i].encode("utf-8"))
+    return [(marker, offset(start), offset(end)) for marker, start, end in regions]
+
+
+def _run_engine(engine: str, path: Path, content: str, markers: list, rng: random.Random):
+    # Bytes in and out, so line endings reach the engines untranslated
+    path.write_bytes(content.encode("utf-8"))
+    sections = {m: "template:{status}" for m in markers}
+    context = RunContext(["clock"], {"status": STATUS})
+    kwargs = {"backup": "off"}
+    if engine == "stream":
+        # Tiny chunks split every token somewhere, but cost one read per byte
+        tiny = len(content) <= 4 * KB
+        kwargs.update(stream=True, chunk_size=rng.choice((1, 2, 7, 16, 64, 4 * KB) if tiny else (64, 4 * KB, MB)))
+    elif engine == "index":
+        kwargs["index"] = MarkerIndex()
+    try:
+        update_path(path, sections, context, **kwargs)
+        if engine == "index":
+            # The second run goes through the index entry and must be a no-op
+            assert not update_path(path, sections, context, **kwargs), "index rerun rewrote the file"
+    except MarkerNotFoundError as e:
+        assert path.read_bytes() == content.encode("utf-8"), "file changed despite missing markers"
+        return None, sorted(e.markers)
+    return path.read_bytes().decode("utf-8"), []
+
+
+def check_case(seed: int, max_size: int = DEFAULT_MAX_SIZE, time_limit: float = DEFAULT_TIME_LIMIT):
+    """
+    Run every engine on the document of `seed`. Returns None if all agree
+    with the reference within the limits, else a description of the failure.
+    """
+    content, markers = generate_case(seed, max_size)
+    rng = random.Random(seed)
+    encoded_size = len(content.encode("utf-8"))
+    memory_limit = MEMORY_FACTOR * encoded_size + MEMORY_SLACK
+
+    regions, missing, _ = reference_regions(content, markers)
+    expected, expected_missing = reference_update(content, markers)
+    checks = [
+        ("scan", lambda: find_marker_regions(content, markers), (regions, missing)),
+        (
+            "scan_bytes",
+            lambda: find_marker_regions(content.encode("utf-8"), markers),
+            (_byte_regions(content, regions), missing),
+        ),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "doc.md"
+        for engine in ("memory", "stream", "index"):
+            checks.append((
+                engine,
+                lambda engine=engine: _run_engine(engine, path, content, markers, rng),
+                (expected, sorted(expected_missing)),
+            ))
+
+        for name, run, want in checks:
+            tracemalloc.start()
+            started = time.perf_counter()
+            try:
+                got = run()
+            except AssertionError as e:
+                return f"seed {seed}: {name}: {e}"
+            finally:
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            if got != want:
+                return f"seed {seed}: {name} disagrees with the reference (markers {markers})"
+            if elapsed > time_limit:
+                return f"seed {seed}: {name} took {elapsed:.2f} s for {encoded_size} bytes"
+            if peak > memory_limit:
+                return f"seed {seed}: {name} allocated {peak} bytes for {encoded_size} bytes"
+    return None
+
+
+def run_cases(
+    seeds: list,
+    max_size: int = DEFAULT_MAX_SIZE,
+    time_limit: float = DEFAULT_TIME_LIMIT,
+    workers: int = None,
+) -> list:
+    """
+    Check `seeds` across a process pool and return the failure descriptions.
+    A case still running after twice `time_limit` (e.g. a catastrophically
+    backtracking regex, which cannot be interrupted) fails and the pool is
+    killed.
+    """
+    failures = []
+    pool = multiprocessing.get_context("fork").Pool(workers or os.cpu_count())
+    try:
+        pending = [(seed, pool.apply_async(check_case, (seed, max_size, time_limit))) for seed in seeds]
+        for seed, result in pending:
+            try:
+                failure = result.get(timeout=2 * time_limit)
+            except multiprocessing.TimeoutError:
+                failures.append(f"seed {seed}: still running after {2 * time_limit:.0f} s")
+                break
+            if failure:
+                failures.append(failure)
+    finally:
+        pool.terminate()
+        pool.join()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz the marker engines against a reference")
+    parser.add_argument("--cases", type=int, default=DEFAULT_CASES, help="Number of documents")
+    parser.add_argument("--seed", type=int, default=None, help="First seed (default: random)")
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_SIZE, help="Largest document in bytes")
+    parser.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="Seconds per engine and case")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    first = args.seed if args.seed is not None else random.randrange(1 << 32)
+    print(f"Fuzzing {args.cases} documents from seed {first}", file=sys.stderr)
+    failures = run_cases(range(first, first + args.cases), args.max_size, args.time_limit, args.workers)
+    for failure in failures:
+        print(f"Failure: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks")))
+
+from bench_update_readme import compare, generate_document, run_case
+
+
+def test_generate_document_has_every_marker(tmp_path):
+    """Synthetic documents contain one section per marker and roughly the requested size."""
+    path = tmp_path / "doc.md"
+    names = generate_document(path, 64 * 1024, 10)
+    text = path.read_text(encoding="utf-8")
+    assert all(f"<!-- {n}_START -->" in text and f"<!-- {n}_END -->" in text for n in names)
+    assert 60 * 1024 < len(text) < 70 * 1024
+
+
+def test_run_case_reports_metrics():
+    """A tiny replacement case yields the machine-readable fields used for comparisons."""
+    result = run_case("replace", {"size": 4096, "markers": 3, "pathological": True}, repeat=2)
+    assert result["name"] == "replace[markers=3,pathological=True,size=4096]"
+    assert result["p50_ms"] > 0 and result["p99_ms"] >= result["p50_ms"]
+    assert result["mb_per_s"] > 0 and result["peak_rss_kb"] > 0
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": [{"name": "a", "p50_ms": 10.0}, {"name": "b", "p50_ms": 10.0}]}
+    current = {"results": [{"name": "a", "p50_ms": 11.0}, {"name": "b", "p50_ms": 13.0}]}
+    assert compare(baseline, current, threshold=0.2) == ["b: p50 10.00 ms -> 13.00 ms"]
@@ -0,0 +1,35 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "fuzz")))
+
+import fuzz_markers
+from fuzz_markers import check_case, generate_case, generate_document, reference_regions, run_cases
+
+# FUZZ_SEED and FUZZ_CASES widen the run, e.g. in a nightly job
+FIRST_SEED = int(os.getenv("FUZZ_SEED", "0"))
+CASES = int(os.getenv("FUZZ_CASES", "60"))
+
+
+def test_engines_agree_with_reference():
+    """Every engine matches the reference on random documents, within the time and memory limits."""
+    assert run_cases(range(FIRST_SEED, FIRST_SEED + CASES), max_size=32 * 1024) == []
+
+
+def test_reference_model():
+    """The reference pairs STARTs with the next END and honours attributes and near misses."""
+    content = (
+        '<!-- A_START x="<!-- A_END" --> <!-- A_START-->\n<!-- A_END -->'
+        "<!-- B_END --><!-- B_START --> <!-- A_START -->"
+    )
+    regions, missing, attrs = reference_regions(content, ["A", "B"])
+    assert regions == [("A", 0, content.index("\n") + 15)]
+    assert missing == ["B"] and attrs == ['x="<!-- A_END"']
+    assert generate_document(7) == generate_document(7)
+
+
+def test_harness_reports_failures(monkeypatch):
+    """A wrong or slow engine is reported with the seed that reproduces it."""
+    seed = next(s for s in range(100) if reference_regions(*generate_case(s, 4096))[0])
+    assert "took" in check_case(seed, max_size=4096, time_limit=0)
+
+    monkeypatch.setattr(fuzz_markers, "find_marker_regions", lambda content, markers: ([], list(markers)))
+    assert check_case(seed, max_size=4096).startswith(f"seed {seed}: scan disagrees")
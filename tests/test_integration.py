@@ -28,4 +28,72 @@ def test_cli_end_to_end(tmp_path):
     # 4. Assert that README.md was updated and a backup exists
     updated = (tmp_path / "README.md").read_text(encoding="utf-8")
     assert "Last updated:" in updated
-    assert (tmp_path / "README.md.bak").exists()
\ No newline at end of file
+    assert (tmp_path / "README.md.bak").exists()
+
+def test_cli_batch_globs(tmp_path):
+    # Two package READMEs updated by a single invocation
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "README.md").write_text(
+            "<!-- AUTO_SECTION_START -->\nold\n<!-- AUTO_SECTION_END -->\n",
+            encoding="utf-8"
+        )
+
+    script_path = Path(__file__).parent.parent / "update_readme.py"
+    result = subprocess.run(
+        [sys.executable, str(script_path), "*/README.md", "--workers", "2"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 0
+    for name in ("a", "b"):
+        assert "Last updated:" in (tmp_path / name / "README.md").read_text(encoding="utf-8")
+
+# Import-time budget (microseconds, cumulative) for loading every CLI module,
+# measured with `python -X importtime`. Network libraries must stay deferred.
+STARTUP_BUDGET_US = 150_000
+DEFERRED_MODULES = {"requests", "urllib3", "asyncio", "multiprocessing", "difflib"}
+
+def test_cli_startup_budget():
+    root = Path(__file__).parent.parent
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import update_readme, update_readme_rest, update_readme_graphql, update_readme_git"],
+        cwd=root,
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 0, result.stderr
+
+    imported, total = set(), 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            imported.add(name.strip())
+            if name.strip().startswith("update_readme"):
+                total += int(cumulative)
+    assert not DEFERRED_MODULES & imported
+    assert total < STARTUP_BUDGET_US
+
+def test_cli_git_source(tmp_path):
+    # --source git fills the section from the local history, no extra script needed
+    def git(*args):
+        subprocess.run(["git", "-C", str(tmp_path), *args], check=True, capture_output=True)
+
+    git("init", "-q")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "--allow-empty", "-m", "Add feature")
+    readme = tmp_path / "README.md"
+    readme.write_text("<!-- AUTO_SECTION_START -->\n<!-- AUTO_SECTION_END -->\n", encoding="utf-8")
+
+    script_path = Path(__file__).parent.parent / "update_readme.py"
+    result = subprocess.run(
+        [sys.executable, str(script_path), "--source", "git", "--backup", "off"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 0, result.stdout
+    assert "- Commit message: Add feature" in readme.read_text(encoding="utf-8")
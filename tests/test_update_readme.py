@@ -5,7 +5,32 @@ import re
 import pytest
 from pathlib import Path
 import tempfile
-from update_readme import update_file, MarkerNotFoundError
+from update_readme import (
+    update_file,
+    find_marker_regions,
+    replace_marker_regions,
+    update_files,
+    update_file_streaming,
+    render_file,
+    write_atomic,
+    update_path,
+    format_changes,
+    RunContext,
+    compile_template,
+    load_sections,
+    parse_refresh,
+    Manifest,
+    MarkerIndex,
+    Transaction,
+    recover_transaction,
+    expand_paths,
+    batch_exit_code,
+    MarkerNotFoundError,
+    UPDATED,
+    UNCHANGED,
+    MISSING,
+    ERROR,
+)
 
 
 @pytest.fixture
@@ -138,3 +163,836 @@ def test_backup_file_overwrite(single_marker):
     # The .bak file from the second run should contain the content after first update
     bak_content = bak2.read_text(encoding="utf-8")
     assert content_after_first == bak_content
+
+
+def test_all_missing_markers_reported_together(single_marker):
+    """
+    Every missing marker should be named in a single MarkerNotFoundError, and the file left untouched.
+    """
+    original = single_marker.read_text(encoding="utf-8")
+
+    with pytest.raises(MarkerNotFoundError) as excinfo:
+        update_file(single_marker, status="STATUS", markers=["AUTO_SECTION", "FIRST", "SECOND"])
+    assert excinfo.value.markers == ["FIRST", "SECOND"]
+    assert "'FIRST', 'SECOND'" in str(excinfo.value)
+    assert single_marker.read_text(encoding="utf-8") == original
+    assert not single_marker.with_suffix(".md.bak").exists()
+
+
+def test_find_marker_regions_pairing():
+    """
+    Repeated sections are all found, nested tokens belong to the enclosing region,
+    and unterminated starts are ignored.
+    """
+    content = (
+        "<!-- A_START -->x<!-- A_END -->\n"
+        "<!-- B_START --><!-- A_START -->y<!-- B_END -->\n"
+        "<!-- A_START -->z<!-- A_END -->\n"
+        "<!-- B_START -->dangling"
+    )
+    regions, missing = find_marker_regions(content, ["A", "B"])
+
+    assert missing == []
+    assert [(m, content[s:e]) for m, s, e in regions] == [
+        ("A", "<!-- A_START -->x<!-- A_END -->"),
+        ("B", "<!-- B_START --><!-- A_START -->y<!-- B_END -->"),
+        ("A", "<!-- A_START -->z<!-- A_END -->"),
+    ]
+
+    updated = replace_marker_regions(content, regions, lambda marker: f"[{marker}]")
+    assert updated == "[A]\n[B]\n[A]\n<!-- B_START -->dangling"
+
+
+def test_update_files_reports_per_file_results(tmp_path):
+    """
+    update_files should process every file in the batch and classify each outcome.
+    """
+    good = tmp_path / "good.md"
+    good.write_text("<!-- AUTO_SECTION_START -->\nold\n<!-- AUTO_SECTION_END -->\n", encoding="utf-8")
+    bare = tmp_path / "bare.md"
+    bare.write_text("# No markers here", encoding="utf-8")
+    absent = tmp_path / "absent.md"
+
+    results = update_files([good, bare, absent], status="OK", markers=["AUTO_SECTION"], workers=2)
+
+    assert [r.path for r in results] == [good, bare, absent]
+    assert [r.outcome for r in results] == [UPDATED, MISSING, ERROR]
+    assert results[1].missing == ["AUTO_SECTION"]
+    assert batch_exit_code(results) == 1
+    assert "- Deployment status: OK" in good.read_text(encoding="utf-8")
+    assert bare.read_text(encoding="utf-8") == "# No markers here"
+
+
+def test_update_files_in_worker_processes(tmp_path):
+    """
+    With processes=True the run context is pickled into the workers, which
+    render the same values as a threaded run.
+    """
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text("<!-- AUTO_SECTION_START -->\nold\n<!-- AUTO_SECTION_END -->\n", encoding="utf-8")
+        paths.append(path)
+
+    results = update_files(paths, status="OK", workers=2, processes=True, backup="off")
+
+    assert [r.outcome for r in results] == [UPDATED] * 3
+    contents = {p.read_text(encoding="utf-8") for p in paths}
+    assert len(contents) == 1
+    assert "- Deployment status: OK" in contents.pop()
+
+
+def test_expand_paths_globs_and_dedupes(tmp_path):
+    """
+    Glob patterns expand recursively and duplicate paths are only returned once.
+    """
+    (tmp_path / "pkg").mkdir()
+    a = tmp_path / "README.md"
+    b = tmp_path / "pkg" / "README.md"
+    a.write_text("a", encoding="utf-8")
+    b.write_text("b", encoding="utf-8")
+
+    paths = expand_paths([str(tmp_path / "**" / "README.md"), str(a)])
+    assert paths == [a, b]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_streaming_matches_in_memory(tmp_path, chunk_size):
+    """
+    The streaming rewrite should produce exactly what the in-memory engine produces,
+    whatever the chunk size, including tokens split across chunk boundaries.
+    """
+    content = (
+        "héader\n<!-- A_START -->\nold ü\n<!-- A_END -->\n"
+        + "filler line\n" * 50
+        + "<!-- B_START --><!-- A_START -->nested<!-- B_END -->\n"
+        + "<!-- A_START -->again<!-- A_END -->\n<!-- B_START -->unterminated"
+    )
+    readme = tmp_path / "README.md"
+    readme.write_text(content, encoding="utf-8")
+
+    expected = render_file(content, "OK", ["A", "B"], readme, now="2000-01-01 00:00:00")
+    assert update_file_streaming(
+        readme, status="OK", markers=["A", "B"], chunk_size=chunk_size, now="2000-01-01 00:00:00"
+    )
+    assert readme.read_text(encoding="utf-8") == expected
+    assert readme.with_suffix(".md.bak").read_text(encoding="utf-8") == content
+
+    # A second identical run finds nothing to change and leaves the file alone
+    assert not update_file_streaming(
+        readme, status="OK", markers=["A", "B"], chunk_size=chunk_size, now="2000-01-01 00:00:00"
+    )
+
+
+def test_streaming_missing_marker_leaves_file(single_marker):
+    """
+    A missing marker aborts the streaming rewrite without touching the file or leaving temp files.
+    """
+    original = single_marker.read_text(encoding="utf-8")
+
+    with pytest.raises(MarkerNotFoundError):
+        update_file_streaming(single_marker, markers=["AUTO_SECTION", "MISSING"], chunk_size=16)
+    assert single_marker.read_text(encoding="utf-8") == original
+    assert sorted(p.name for p in single_marker.parent.iterdir()) == ["README.md"]
+
+
+def test_write_atomic_skips_unchanged(tmp_path):
+    """
+    write_atomic should not touch the file, its inode or its backup when the content is unchanged.
+    """
+    target = tmp_path / "README.md"
+    target.write_text("same", encoding="utf-8")
+    before = os.stat(target)
+
+    assert not write_atomic(target, "same")
+    after = os.stat(target)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["README.md"]
+
+
+@pytest.mark.parametrize("mode", ["off", "copy", "hardlink"])
+def test_write_atomic_backup_modes(tmp_path, mode):
+    """
+    Changed content replaces the file atomically and keeps the old content only when asked to.
+    """
+    target = tmp_path / "README.md"
+    target.write_text("old", encoding="utf-8")
+    target.chmod(0o640)
+
+    assert write_atomic(target, "new", backup=mode)
+    assert target.read_text(encoding="utf-8") == "new"
+    assert target.stat().st_mode & 0o777 == 0o640
+
+    backup_path = tmp_path / "README.md.bak"
+    if mode == "off":
+        assert not backup_path.exists()
+    else:
+        assert backup_path.read_text(encoding="utf-8") == "old"
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_replace_atomic_writes_state_files(tmp_path, monkeypatch):
+    """
+    State files are written through one helper: it creates the directory,
+    and a failed replace leaves the old file and no temp file behind.
+    """
+    from update_readme import replace_atomic
+
+    target = tmp_path / "state" / "manifest.json"
+    replace_atomic(target, "{}")
+    replace_atomic(target, b"\x00binary")
+    assert target.read_bytes() == b"\x00binary"
+    assert target.stat().st_mode & 0o777 == 0o644
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        replace_atomic(target, "lost")
+    assert target.read_bytes() == b"\x00binary"
+    assert sorted(p.name for p in target.parent.iterdir()) == ["manifest.json"]
+
+
+@pytest.mark.parametrize("chunk_size", [5, 1 << 20])
+def test_unterminated_start_does_not_hide_later_sections(tmp_path, chunk_size):
+    """
+    A START without any matching END after it is kept verbatim, and sections after it are still replaced.
+    """
+    content = (
+        "<!-- A_START -->old a<!-- A_END -->\n"
+        "<!-- A_START --> dangling\n"
+        "<!-- B_START -->old b<!-- B_END -->\n"
+    )
+    readme = tmp_path / "README.md"
+    readme.write_text(content, encoding="utf-8")
+
+    regions, missing = find_marker_regions(content, ["A", "B"])
+    assert missing == []
+    assert [m for m, _, _ in regions] == ["A", "B"]
+
+    expected = render_file(content, "OK", ["A", "B"], readme, now="now")
+    assert "<!-- A_START --> dangling\n<!-- B_START -->\n- Last updated: now" in expected
+    update_file_streaming(readme, status="OK", markers=["A", "B"], chunk_size=chunk_size, now="now")
+    assert readme.read_text(encoding="utf-8") == expected
+
+
+def test_run_context_shares_providers_across_files(tmp_path, monkeypatch):
+    """
+    A provider runs once per run even when several markers and files need it, and
+    providers needed together run concurrently.
+    """
+    import threading
+    import update_readme
+
+    calls = []
+    barrier = threading.Barrier(2, timeout=5)
+
+    def slow_commit(values):
+        calls.append("commit")
+        barrier.wait()
+        return {"timestamp": "2001-02-03 04:05:06", "message": f"from {values['repo']}"}
+
+    def slow_clock(values):
+        calls.append("clock")
+        barrier.wait()
+        return {"now": "2001-01-01 00:00:00"}
+
+    monkeypatch.setitem(update_readme.PROVIDERS, "fake", (("timestamp", "message"), slow_commit))
+    monkeypatch.setitem(update_readme.PROVIDERS, "clock", (("now",), slow_clock))
+
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text(
+            "<!-- COMMIT_START --><!-- COMMIT_END -->\n<!-- STATUS_START --><!-- STATUS_END -->\n",
+            encoding="utf-8",
+        )
+        paths.append(path)
+
+    context = RunContext(["clock", "fake"], {"repo": "demo", "status": "OK"})
+    results = update_files(
+        paths, sections={"COMMIT": "commit", "STATUS": "status"}, context=context, workers=4
+    )
+
+    assert [r.outcome for r in results] == [UPDATED] * 4
+    assert sorted(calls) == ["clock", "commit"]
+    text = paths[3].read_text(encoding="utf-8")
+    assert "- Commit message: from demo" in text
+    assert "- Last updated: 2001-01-01 00:00:00\n- Deployment status: OK" in text
+
+
+def test_run_context_skips_fetch_when_markers_missing(tmp_path, monkeypatch):
+    """
+    Nothing is fetched for a file whose markers are missing.
+    """
+    import update_readme
+
+    def fail(values):
+        raise AssertionError("provider should not run")
+
+    monkeypatch.setitem(update_readme.PROVIDERS, "fake", (("timestamp", "message"), fail))
+    path = tmp_path / "README.md"
+    path.write_text("no markers", encoding="utf-8")
+
+    with pytest.raises(MarkerNotFoundError):
+        update_path(path, {"AUTO_SECTION": "commit"}, RunContext(["fake"], {"status": "OK"}))
+
+
+def test_incremental_run_skips_unchanged_files(tmp_path, monkeypatch):
+    """
+    With a manifest, a rerun with the same inputs leaves files untouched and
+    only processes files that were edited since the last run.
+    """
+    import update_readme
+
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text("<!-- AUTO_SECTION_START --><!-- AUTO_SECTION_END -->\n", encoding="utf-8")
+        paths.append(path)
+
+    manifest = Manifest(tmp_path / "manifest.json")
+    first = update_files(paths, status="OK", backup="off", manifest=manifest)
+    assert [r.outcome for r in first] == [UPDATED] * 3
+    manifest.save()
+
+    # Edit one file; its neighbours must not even be read again
+    paths[1].write_text("intro\n<!-- AUTO_SECTION_START --><!-- AUTO_SECTION_END -->\n", encoding="utf-8")
+    read = []
+    real_update_path = update_readme.update_path
+    monkeypatch.setattr(
+        update_readme, "update_path", lambda p, *a, **kw: read.append(p) or real_update_path(p, *a, **kw)
+    )
+    manifest = Manifest(tmp_path / "manifest.json")
+    second = update_files(paths, status="OK", backup="off", manifest=manifest)
+    assert [r.outcome for r in second] == [UNCHANGED, UPDATED, UNCHANGED]
+    assert read == [paths[1]]
+
+
+def test_incremental_run_reprocesses_when_inputs_change(tmp_path):
+    """
+    A different status (or marker set) invalidates every manifest entry, while
+    touching a file without changing its contents does not.
+    """
+    path = tmp_path / "README.md"
+    path.write_text("<!-- AUTO_SECTION_START --><!-- AUTO_SECTION_END -->\n", encoding="utf-8")
+    manifest = Manifest(tmp_path / "manifest.json")
+    update_files([path], status="OK", backup="off", manifest=manifest)
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert manifest.is_fresh(path, ["AUTO_SECTION"], RunContext(values={"status": "OK"}).fingerprint({"AUTO_SECTION": "status"}))
+
+    results = update_files([path], status="FAIL", backup="off", manifest=manifest)
+    assert results[0].outcome == UPDATED
+    assert "FAIL" in path.read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_incremental_run_reports_provider_failure_per_file(tmp_path, monkeypatch, processes):
+    """
+    A provider failing while the manifest fingerprint is computed is reported
+    as an error for every file instead of aborting the batch.
+    """
+    import update_readme
+
+    def fail(values):
+        raise update_readme.CommitInfoError("git log failed")
+
+    monkeypatch.setitem(update_readme.PROVIDERS, "fake", (("timestamp", "message"), fail))
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text("<!-- AUTO_SECTION_START --><!-- AUTO_SECTION_END -->\n", encoding="utf-8")
+        paths.append(path)
+    manifest = Manifest(tmp_path / "manifest.json")
+
+    results = update_files(
+        paths,
+        sections={"AUTO_SECTION": "commit"},
+        context=RunContext(["fake"], {"status": "OK"}),
+        workers=2,
+        processes=processes,
+        manifest=manifest,
+    )
+
+    assert [r.outcome for r in results] == [ERROR, ERROR]
+    assert all("git log failed" in r.error for r in results)
+    assert all(p.read_text(encoding="utf-8") == "<!-- AUTO_SECTION_START --><!-- AUTO_SECTION_END -->\n" for p in paths)
+
+
+def test_marker_index_rewrites_equal_length_sections_in_place(tmp_path, monkeypatch):
+    """
+    With an index, re-stamping a status of the same length edits the file in
+    place (same inode), and the byte offsets are reused on the next update.
+    """
+    import update_readme
+
+    path = tmp_path / "README.md"
+    path.write_text("héllo\n<!-- AUTO_SECTION_START --><!-- AUTO_SECTION_END -->\nbye\n", encoding="utf-8")
+    index = MarkerIndex()
+    sections = {"AUTO_SECTION": "status"}
+
+    # First update changes the section length: full atomic rewrite
+    assert update_path(path, sections, RunContext(values={"status": "OK", "now": "2001-01-01 00:00:00"}), index=index)
+    inode = os.stat(path).st_ino
+
+    assert update_path(path, sections, RunContext(values={"status": "KO", "now": "2001-01-01 00:00:00"}), index=index, backup="off")
+    assert os.stat(path).st_ino == inode
+    assert "- Deployment status: KO" in path.read_text(encoding="utf-8")
+    assert path.read_text(encoding="utf-8").startswith("héllo\n")
+
+    def no_scan(*args):
+        raise AssertionError("index should be reused")
+
+    monkeypatch.setattr(update_readme, "find_marker_regions", no_scan)
+    assert update_path(path, sections, RunContext(values={"status": "OK", "now": "2001-01-01 00:00:01"}), index=index, backup="off")
+    assert path.read_text(encoding="utf-8").endswith("- Last updated: 2001-01-01 00:00:01\n- Deployment status: OK\n<!-- AUTO_SECTION_END -->\nbye\n")
+
+
+def test_marker_index_detects_external_edits(tmp_path):
+    """
+    An entry whose file changed behind the index's back is rebuilt, and a
+    longer section falls back to an atomic rewrite with a backup.
+    """
+    path = tmp_path / "README.md"
+    path.write_text("<!-- AUTO_SECTION_START --><!-- AUTO_SECTION_END -->\n", encoding="utf-8")
+    index = MarkerIndex()
+    sections = {"AUTO_SECTION": "status"}
+    update_path(path, sections, RunContext(values={"status": "OK"}), index=index, backup="off")
+
+    path.write_text("new intro\n" + path.read_text(encoding="utf-8"), encoding="utf-8")
+    assert update_path(path, sections, RunContext(values={"status": "LONGER"}), index=index)
+    text = path.read_text(encoding="utf-8")
+    assert text.startswith("new intro\n<!-- AUTO_SECTION_START -->")
+    assert "- Deployment status: LONGER\n<!-- AUTO_SECTION_END -->" in text
+    assert (tmp_path / "README.md.bak").exists()
+
+
+def test_embedded_template_is_rendered_and_kept(tmp_path, monkeypatch):
+    """
+    A template embedded in the START comment replaces the configured renderer,
+    the comment itself is preserved, both engines agree, and providers whose
+    fields the template does not use are never called.
+    """
+    import update_readme
+
+    def fail(values):
+        raise AssertionError("commit info should not be fetched")
+
+    monkeypatch.setitem(update_readme.PROVIDERS, "fake", (("timestamp", "message"), fail))
+    start = '<!-- AUTO_SECTION_START template="Built {now} \\"{status}\\"\\n> ok" -->'
+    content = f"intro\n{start}\nold\n<!-- AUTO_SECTION_END -->\n"
+    expected = f'intro\n{start}\nBuilt 2001-01-01 00:00:00 "OK"\n> ok\n<!-- AUTO_SECTION_END -->\n'
+
+    for stream in (False, True):
+        path = tmp_path / f"README{stream}.md"
+        path.write_text(content, encoding="utf-8")
+        context = RunContext(["fake"], {"status": "OK", "now": "2001-01-01 00:00:00"})
+        assert update_path(path, {"AUTO_SECTION": "commit"}, context, stream=stream, backup="off", chunk_size=16)
+        assert path.read_text(encoding="utf-8") == expected
+        assert not update_path(path, {"AUTO_SECTION": "commit"}, context, stream=stream, backup="off")
+
+
+def test_templates_compile_once_and_load_from_config(tmp_path):
+    """
+    Config templates are compiled once per process and reject unsupported fields.
+    """
+    config = tmp_path / "sections.json"
+    config.write_text(
+        '{"sections": {"A": {"template": "- Now: {now}"}, "B": "status"}}', encoding="utf-8"
+    )
+    sections = load_sections(config)
+    assert sections == {"A": "template:- Now: {now}", "B": "status"}
+    assert compile_template("- Now: {now}") is compile_template("- Now: {now}")
+    assert compile_template("- Now: {now}")[0] == ("now",)
+
+    with pytest.raises(ValueError):
+        compile_template("{env[HOME]}")
+
+
+def test_templates_only_see_allow_listed_environment(tmp_path, monkeypatch):
+    """
+    No provider exposes the environment; variables listed for env_values are
+    plain `env_<NAME>` fields.
+    """
+    from update_readme import env_values
+
+    monkeypatch.setenv("GITHUB_TOKEN", "secret-token")
+    monkeypatch.setenv("DEPLOY_URL", "https://example.com")
+    path = tmp_path / "README.md"
+    path.write_text('<!-- A_START template="{env}" --><!-- A_END -->\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="No provider"):
+        update_path(path, {"A": "status"}, RunContext(values={"status": "OK"}), backup="off")
+
+    context = RunContext(values=dict(env_values(["DEPLOY_URL"]), status="OK"))
+    path.write_text("<!-- A_START --><!-- A_END -->\n", encoding="utf-8")
+    update_path(path, {"A": "template:{env_DEPLOY_URL}"}, context, backup="off")
+    assert "https://example.com" in path.read_text(encoding="utf-8")
+
+    with pytest.raises(ValueError, match="NOT_SET"):
+        env_values(["NOT_SET"])
+
+
+def _marked(text):
+    return f"<!-- AUTO_SECTION_START -->\n{text}\n<!-- AUTO_SECTION_END -->\n"
+
+
+def test_transaction_publishes_all_files_at_commit(tmp_path):
+    """
+    Staged files stay untouched until commit, which publishes them all and
+    leaves no journal, temp or undo files behind.
+    """
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    paths = [tmp_path / "a.md", docs / "b.md"]
+    for p in paths:
+        p.write_text(_marked("old"), encoding="utf-8")
+    journal = tmp_path / "txn.journal"
+    txn = Transaction(journal)
+
+    context = RunContext(["clock"], {"status": "OK"})
+    for stream in (False, True):
+        assert update_path(
+            paths[stream], {"AUTO_SECTION": "status"}, context, stream=stream, transaction=txn
+        )
+    assert len(txn) == 2
+    assert all(p.read_text(encoding="utf-8") == _marked("old") for p in paths)
+
+    assert txn.commit() == 2
+    for p in paths:
+        assert "Deployment status: OK" in p.read_text(encoding="utf-8")
+        assert p.with_suffix(".md.bak").read_text(encoding="utf-8") == _marked("old")
+    assert not journal.exists()
+    leftovers = [f.name for f in tmp_path.rglob(".*")]
+    assert leftovers == []
+
+
+def test_transaction_aborts_batch_on_failure(tmp_path):
+    good = tmp_path / "good.md"
+    good.write_text(_marked("old"), encoding="utf-8")
+    bad = tmp_path / "bad.md"
+    bad.write_text("no markers\n", encoding="utf-8")
+
+    results = update_files([good, bad], status="OK", transaction=Transaction(tmp_path / "j"))
+    assert [r.outcome for r in results] == [ERROR, MISSING]
+    assert "aborted" in results[0].error
+    assert good.read_text(encoding="utf-8") == _marked("old")
+    assert sorted(f.name for f in tmp_path.iterdir()) == ["bad.md", "good.md"]
+
+
+@pytest.mark.parametrize("direction", ["forward", "back"])
+def test_interrupted_transaction_recovers(tmp_path, monkeypatch, direction):
+    """
+    A commit that dies after replacing some files leaves its journal; the batch
+    can then be completed or undone as a whole.
+    """
+    import update_readme
+
+    paths = [tmp_path / f"{name}.md" for name in "abc"]
+    for p in paths:
+        p.write_text(_marked("old"), encoding="utf-8")
+    journal = tmp_path / "txn.journal"
+    txn = Transaction(journal)
+
+    calls = []
+    real_backup = update_readme._backup
+
+    def crash_on_second(path, mode):
+        calls.append(path)
+        if len(calls) == 2:
+            raise OSError("disk went away")
+        real_backup(path, mode)
+
+    monkeypatch.setattr(update_readme, "_backup", crash_on_second)
+    with pytest.raises(OSError):
+        update_files(paths, status="NEW", workers=1, backup="off", transaction=txn)
+    monkeypatch.setattr(update_readme, "_backup", real_backup)
+    assert journal.exists()
+    with pytest.raises(FileExistsError):
+        Transaction(journal)
+
+    recovered = recover_transaction(journal, direction)
+    contents = [p.read_text(encoding="utf-8") for p in paths]
+    if direction == "forward":
+        assert recovered == 2
+        assert all("Deployment status: NEW" in c for c in contents)
+    else:
+        assert recovered == 1
+        assert contents == [_marked("old")] * 3
+    assert sorted(f.name for f in tmp_path.iterdir()) == ["a.md", "b.md", "c.md"]
+
+
+def test_streaming_keeps_tokens_whole_across_chunks(tmp_path):
+    """
+    A START whose attributes contain an END-like comment is one token, even
+    when it is skipped inside an open section and split across chunks.
+    """
+    content = (
+        "<!-- A_START --> x <!-- A_START y <!-- A_END --> z\n"
+        "<!-- A_END -->\n<!-- A_START --><!-- A_START q <!-- A_END -->"
+    )
+    regions, missing = find_marker_regions(content, ["A"])
+    expected = replace_marker_regions(content, regions, lambda m: "<!-- A_START -->\nS\n<!-- A_END -->")
+    for chunk_size in (1, 5, 17, 4096):
+        path = tmp_path / f"doc{chunk_size}.md"
+        path.write_text(content, encoding="utf-8")
+        update_path(
+            path, {"A": "template:S"}, RunContext([], {}), stream=True, backup="off", chunk_size=chunk_size
+        )
+        assert path.read_text(encoding="utf-8") == expected
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_dry_run_reports_section_diffs_without_writing(tmp_path, stream):
+    """
+    A dry run writes nothing (no temp or backup files) and reports each changed
+    section with its line numbers before and after the update, as a unified
+    diff with one hunk per section; both engines agree.
+    """
+    readme = tmp_path / "README.md"
+    content = (
+        "intro\n<!-- A_START -->\nold\n<!-- A_END -->\n"
+        "<!-- B_START -->x<!-- B_END --> tail\n"
+        "<!-- C_START -->\n- Last updated: 2001-01-01 00:00:00\n- Deployment status: ✅\n<!-- C_END -->\n"
+    )
+    readme.write_text(content, encoding="utf-8")
+    sections = {m: "status" for m in ("A", "B", "C")}
+    context = RunContext(["clock"], {"status": "✅", "now": "2001-01-01 00:00:00"})
+
+    changes = []
+    assert update_path(readme, sections, context, stream=stream, chunk_size=8, changes=changes)
+    assert readme.read_text(encoding="utf-8") == content
+    assert os.listdir(tmp_path) == ["README.md"]
+    assert [(c.marker, c.old_line, c.new_line) for c in changes] == [("A", 2, 2), ("B", 5, 6)]
+
+    result = update_files([readme], sections=sections, context=context, dry_run=True)[0]
+    assert result.outcome == UPDATED and result.changes == changes
+    assert format_changes([result]) == (
+        f"--- a/{readme.as_posix()}\n+++ b/{readme.as_posix()}\n"
+        "@@ -2,3 +2,4 @@ A\n"
+        " <!-- A_START -->\n"
+        "-old\n+- Last updated: 2001-01-01 00:00:00\n+- Deployment status: ✅\n"
+        " <!-- A_END -->\n"
+        "@@ -5 +6,4 @@ B\n"
+        "-<!-- B_START -->x<!-- B_END -->\n"
+        "+<!-- B_START -->\n+- Last updated: 2001-01-01 00:00:00\n+- Deployment status: ✅\n+<!-- B_END -->\n"
+    )
+
+    update_path(readme, sections, context, backup="off")
+    lines = readme.read_text(encoding="utf-8").splitlines(keepends=True)
+    for change in changes:
+        start = change.new_line - 1
+        assert "".join(lines[start:])[:len(change.new)] == change.new
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_dry_run_diff_of_crlf_file_has_plain_line_endings(tmp_path, stream):
+    """Hunks of a CRLF file end their lines in "\\n" only, like those of an LF file."""
+    readme = tmp_path / "README.md"
+    readme.write_bytes(b"intro\r\n<!-- A_START -->\r\nold\r\n<!-- A_END -->\r\n")
+    context = RunContext([], {"status": "OK", "now": "2001-01-01 00:00:00"})
+
+    changes = []
+    assert update_path(readme, {"A": "status"}, context, stream=stream, changes=changes)
+    lines = changes[0].hunks()
+    assert lines == [
+        "@@ -2,3 +2,4 @@ A\n",
+        " <!-- A_START -->\n",
+        "-old\n",
+        "+- Last updated: 2001-01-01 00:00:00\n",
+        "+- Deployment status: OK\n",
+        " <!-- A_END -->\n",
+    ]
+
+
+def test_dry_run_batch_emits_json_change_set(tmp_path):
+    """
+    A parallel dry run over many files reports every outcome in the JSON
+    change set and leaves the files and the manifest untouched.
+    """
+    import json
+
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text(_marked("old") if i else "no markers\n", encoding="utf-8")
+        paths.append(path)
+    manifest = Manifest(tmp_path / "manifest.json")
+
+    results = update_files(paths, workers=4, processes=True, manifest=manifest, dry_run=True)
+    assert [r.outcome for r in results] == [MISSING, UPDATED, UPDATED, UPDATED]
+    assert all(p.read_text(encoding="utf-8") == (_marked("old") if i else "no markers\n") for i, p in enumerate(paths))
+    manifest.save()
+    assert sorted(os.listdir(tmp_path)) == [p.name for p in paths]
+
+    change_set = json.loads(format_changes(results, "json"))
+    assert [f["outcome"] for f in change_set["files"]] == [MISSING, UPDATED, UPDATED, UPDATED]
+    change = change_set["files"][1]["changes"][0]
+    assert change["marker"] == "AUTO_SECTION" and change["old"] == _marked("old").rstrip("\n")
+    assert "- Deployment status: ✅" in change["new"]
+
+
+def test_run_single_reports_dry_runs_and_fresh_files(tmp_path, capsys):
+    """
+    The single-file CLIs share run_single: a dry run prints the diff, a
+    write returns True and a rerun with fresh sections says so.
+    """
+    from update_readme import run_single
+
+    path = tmp_path / "README.md"
+    path.write_text('<!-- A_START refresh="1h" -->\nold\n<!-- A_END -->\n', encoding="utf-8")
+    context = RunContext(values={"status": "OK", "now": "2001-01-01 10:00:00"})
+
+    assert run_single(path, {"A": "status"}, context, backup="off", dry_run=True) is False
+    assert "-old\n" in capsys.readouterr().out
+    assert run_single(path, {"A": "status"}, context, backup="off") is True
+    assert run_single(path, {"A": "status"}, context, backup="off") is False
+    assert capsys.readouterr().out == "README.md is already up to date.\n"
+
+    with pytest.raises(SystemExit):
+        run_single(path, {"B": "status"}, context)
+    assert capsys.readouterr().out == "Warning: No B markers found.\n"
+
+
+def test_byte_engine_keeps_bom_line_endings_and_other_bytes(tmp_path):
+    """
+    Files are updated as bytes: the BOM, CRLF line endings and bytes that are
+    not UTF-8 outside the sections survive, the new sections use CRLF too,
+    and both engines write the same bytes.
+    """
+    original = (
+        b"\xef\xbb\xbfintro caf\xe9\r\n<!-- AUTO_SECTION_START -->\r\nold\r\n"
+        b"<!-- AUTO_SECTION_END -->\r\ntail\r\n"
+    )
+    written = []
+    for stream in (False, True):
+        readme = tmp_path / f"README{stream}.md"
+        readme.write_bytes(original)
+        context = RunContext(["clock"], {"status": "✅", "now": "2001-01-01 00:00:00"})
+        assert update_path(readme, {"AUTO_SECTION": "status"}, context, stream=stream, backup="off", chunk_size=4)
+        written.append(readme.read_bytes())
+    assert written[0] == written[1]
+    assert written[0] == (
+        b"\xef\xbb\xbfintro caf\xe9\r\n<!-- AUTO_SECTION_START -->\r\n"
+        + "- Last updated: 2001-01-01 00:00:00\r\n- Deployment status: ✅\r\n".encode("utf-8")
+        + b"<!-- AUTO_SECTION_END -->\r\ntail\r\n"
+    )
+
+    readme = tmp_path / "README.md"
+    readme.write_bytes(original.replace(b"\xe9", b"e"))
+    updated = update_file(readme, backup="off")
+    assert isinstance(updated, str) and updated.encode("utf-8") == readme.read_bytes()
+    assert updated.startswith("\ufeffintro cafe\r\n") and "\n- Deployment status: ✅\r\n" in updated
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_refresh_interval_skips_fetch_and_rewrite_while_fresh(tmp_path, monkeypatch, stream):
+    """
+    A section with a refresh interval is stamped when rendered and then left
+    alone, without resolving its fields, until the interval has passed.
+    """
+    import update_readme
+
+    calls = []
+
+    def fake(values):
+        calls.append(values["now"])
+        return {"timestamp": "2001-01-01 00:00:00", "message": f"commit {len(calls)}"}
+
+    monkeypatch.setitem(update_readme.PROVIDERS, "fake", (("timestamp", "message"), fake))
+    readme = tmp_path / "README.md"
+    readme.write_text('<!-- A_START refresh="1h" -->\nold\n<!-- A_END -->\n', encoding="utf-8")
+
+    def run(now):
+        context = RunContext(["fake"], {"status": "✅", "now": now})
+        return update_path(readme, {"A": "commit"}, context, stream=stream, backup="off")
+
+    assert run("2001-01-01 10:00:00")
+    content = readme.read_text(encoding="utf-8")
+    assert content.startswith('<!-- A_START refresh="1h" stamp="2001-01-01 10:00:00" -->\n')
+    assert "- Commit message: commit 1\n" in content
+    assert not run("2001-01-01 10:59:59")
+    assert readme.read_text(encoding="utf-8") == content and len(calls) == 1
+    assert run("2001-01-01 11:00:00")
+    content = readme.read_text(encoding="utf-8")
+    assert content.startswith('<!-- A_START refresh="1h" stamp="2001-01-01 11:00:00" -->\n')
+    assert "- Commit message: commit 2\n" in content
+
+
+def test_refresh_changed_rewrites_only_when_fields_change(tmp_path):
+    """
+    A "changed" section keeps a fingerprint of its fields, leaving out the
+    clock, and is only rewritten once they change; bad policies are errors.
+    """
+    readme = tmp_path / "README.md"
+    readme.write_text('<!-- A_START refresh="changed" -->\n<!-- A_END -->\n', encoding="utf-8")
+
+    def run(status, now):
+        context = RunContext(["clock"], {"status": status, "now": now})
+        return update_files([readme], sections={"A": "status"}, context=context)[0].outcome
+
+    assert run("✅", "2001-01-01 10:00:00") == UPDATED
+    content = readme.read_text(encoding="utf-8")
+    assert 'stamp="2001-01-01 10:00:00" fingerprint="' in content
+    assert run("✅", "2001-01-02 10:00:00") == UNCHANGED
+    assert readme.read_text(encoding="utf-8") == content
+    assert run("❌", "2001-01-03 10:00:00") == UPDATED
+    assert "- Last updated: 2001-01-03 10:00:00\n- Deployment status: ❌\n" in readme.read_text(encoding="utf-8")
+
+    assert parse_refresh("changed 6h") == (6 * 3600, True)
+    with pytest.raises(ValueError):
+        parse_refresh("hourly")
+    readme.write_text('<!-- A_START refresh="hourly" -->\n<!-- A_END -->\n', encoding="utf-8")
+    assert run("✅", "2001-01-01 10:00:00") == ERROR
+
+
+def test_streaming_memory_stays_bounded_after_unterminated_start(tmp_path):
+    """
+    The text after a START without an END is spooled to disk rather than held
+    in memory while the engine looks for the END, and is still rescanned.
+    """
+    import tracemalloc
+
+    readme = tmp_path / "README.md"
+    with open(readme, "w", encoding="utf-8") as f:
+        f.write("<!-- B_START -->\n")
+        for _ in range(64):
+            f.write("lorem ipsum dolor sit amet\n" * 2400)
+        f.write(_marked("old"))
+
+    tracemalloc.start()
+    with pytest.raises(MarkerNotFoundError):
+        update_file_streaming(readme, markers=["AUTO_SECTION", "B"], chunk_size=1 << 16, backup="off")
+    assert update_file_streaming(readme, markers=["AUTO_SECTION"], chunk_size=1 << 16, backup="off")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert readme.stat().st_size > 4 * 10**6
+    assert peak < 1 << 20
+    assert readme.read_text(encoding="utf-8").endswith("- Deployment status: ✅\n<!-- AUTO_SECTION_END -->\n")
+
+
+def test_streaming_memory_stays_bounded_on_long_line_with_open_comment(tmp_path):
+    """
+    A line many chunks long with a "<!--" that is never closed is flushed
+    once it is longer than any START comment, instead of held in the carry
+    and rescanned on every chunk.
+    """
+    import tracemalloc
+
+    readme = tmp_path / "README.md"
+    with open(readme, "w", encoding="utf-8") as f:
+        f.write("intro <!-- dangling")
+        for _ in range(128):
+            f.write("x" * (1 << 16))
+        f.write("\n" + _marked("old"))
+
+    tracemalloc.start()
+    assert update_file_streaming(readme, chunk_size=1 << 16, backup="off")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 1 << 20
+    content = readme.read_text(encoding="utf-8")
+    assert content.startswith("intro <!-- dangling" + "x" * 100)
+    assert content.endswith("- Deployment status: ✅\n<!-- AUTO_SECTION_END -->\n")
@@ -0,0 +1,110 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import update_readme_rest
+from update_readme_cache import CommitInfoCache
+
+
+COMMITS = [
+    {"commit": {"author": {"date": "2025-05-05T05:05:05Z"}, "message": "Ship it"}},
+]
+
+
+class FakeGitHub(BaseHTTPRequestHandler):
+    """Local stand-in for the commits endpoint that honours If-None-Match."""
+
+    etag = '"v1"'
+    seen = []
+
+    def do_GET(self):
+        FakeGitHub.seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == FakeGitHub.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(COMMITS).encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", FakeGitHub.etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def github(monkeypatch):
+    """Serve FakeGitHub on a local port and point the REST fetcher at it."""
+    FakeGitHub.seen = []
+    server = HTTPServer(("127.0.0.1", 0), FakeGitHub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(update_readme_rest, "GITHUB_API", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("GITHUB_TOKEN", "dummy")
+    yield FakeGitHub
+    server.shutdown()
+    server.server_close()
+
+
+def _fetch(mode, cache):
+    if mode == "sync":
+        return update_readme_rest.fetch_latest_user_commit_info("owner", "repo", cache=cache)
+    results, errors = update_readme_rest.fetch_many_latest_user_commit_info([("owner", "repo")], cache=cache)
+    assert not errors
+    return results[("owner", "repo", "main")]
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_conditional_request_reuses_cached_result(github, tmp_path, mode):
+    """The second run sends the stored ETag and reuses the cached result on a 304."""
+    cache_path = tmp_path / "commits.json"
+    cache = CommitInfoCache(cache_path)
+    first = _fetch(mode, cache)
+    cache.save()
+
+    # A fresh process loads the cache from disk
+    cache = CommitInfoCache(cache_path)
+    second = _fetch(mode, cache)
+
+    assert first == second == ("2025-05-05 05:05:05", "Ship it")
+    assert github.seen == [None, '"v1"']
+
+
+def test_changed_etag_refreshes_entry(github, tmp_path):
+    """When the server's ETag changes, the new response replaces the cached entry."""
+    cache = CommitInfoCache(tmp_path / "commits.json")
+    update_readme_rest.fetch_latest_user_commit_info("owner", "repo", cache=cache)
+
+    github.etag = '"v2"'
+    try:
+        update_readme_rest.fetch_latest_user_commit_info("owner", "repo", cache=cache)
+    finally:
+        github.etag = '"v1"'
+    assert cache.get("owner", "repo", "main")["etag"] == '"v2"'
+
+
+def test_ttl_and_size_eviction(tmp_path, monkeypatch):
+    """Expired entries are not returned and the cache never grows beyond max_entries."""
+    clock = [1000.0]
+    monkeypatch.setattr("update_readme_cache.time.time", lambda: clock[0])
+
+    cache = CommitInfoCache(tmp_path / "commits.json", ttl=60, max_entries=2)
+    for i, repo in enumerate(["a", "b", "c"]):
+        clock[0] += 1
+        cache.put("owner", repo, "main", f'"{i}"', ("ts", "msg"))
+
+    assert cache.get("owner", "a", "main") is None
+    assert cache.get("owner", "c", "main")["etag"] == '"2"'
+
+    clock[0] += 61
+    assert cache.get("owner", "c", "main") is None
+    cache.save()
+    assert CommitInfoCache(tmp_path / "commits.json", ttl=60).get("owner", "b", "main") is None
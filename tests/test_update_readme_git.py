@@ -0,0 +1,95 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import subprocess
+
+import pytest
+
+from update_readme import CommitInfoError
+from update_readme_git import CI_PREFIX, fetch_latest_user_commit_info_git, update_file_with_git_info
+
+
+def commit(repo, message, epoch):
+    """Create an empty commit with a fixed committer date."""
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME="dev", GIT_AUTHOR_EMAIL="dev@example.com",
+        GIT_COMMITTER_NAME="dev", GIT_COMMITTER_EMAIL="dev@example.com",
+        GIT_AUTHOR_DATE=f"{epoch} +0200", GIT_COMMITTER_DATE=f"{epoch} +0200",
+    )
+    subprocess.run(
+        ["git", "-C", str(repo), "commit", "-q", "--allow-empty", "-m", message],
+        check=True, env=env,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A local repository whose newest commits are CI auto-updates."""
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    commit(tmp_path, "Initial commit", 1700000000)
+    commit(tmp_path, "Add feature\n\nLonger description", 1735732800)
+    for i in range(15):
+        commit(tmp_path, f"{CI_PREFIX} section", 1735732900 + i)
+    return tmp_path
+
+
+def test_fetch_skips_ci_commits(repo):
+    """The newest non-CI commit is returned with its UTC timestamp and first line."""
+    assert fetch_latest_user_commit_info_git(repo_path=repo) == ("2025-01-01 12:00:00", "Add feature")
+
+
+def test_fetch_falls_back_to_latest_within_cap(repo):
+    """If only CI commits fall within max_commits, the very latest commit is returned."""
+    ts, msg = fetch_latest_user_commit_info_git(repo_path=repo, max_commits=5)
+    assert (ts, msg) == ("2025-01-01 12:01:54", f"{CI_PREFIX} section")
+
+
+def test_unknown_branch_raises(repo):
+    with pytest.raises(CommitInfoError):
+        fetch_latest_user_commit_info_git("no-such-branch", repo_path=repo)
+
+
+def test_update_file_with_git_info(repo):
+    readme = repo / "README.md"
+    readme.write_text(
+        "Header\n<!-- AUTO_SECTION_START -->\nold\n<!-- AUTO_SECTION_END -->\n",
+        encoding="utf-8",
+    )
+
+    update_file_with_git_info(readme, repo_path=repo)
+
+    updated = readme.read_text(encoding="utf-8")
+    assert "- Last updated: 2025-01-01 12:00:00" in updated
+    assert "- Commit message: Add feature" in updated
+
+
+def test_update_file_with_git_info_dry_run(repo, capsys):
+    """A dry run prints the section diff and leaves README.md as it was."""
+    readme = repo / "README.md"
+    content = "Header\n<!-- AUTO_SECTION_START -->\nold\n<!-- AUTO_SECTION_END -->\n"
+    readme.write_text(content, encoding="utf-8")
+
+    update_file_with_git_info(readme, repo_path=repo, dry_run=True)
+
+    assert readme.read_text(encoding="utf-8") == content
+    assert not (repo / "README.md.bak").exists()
+    out = capsys.readouterr().out
+    assert "@@ -2,3 +2,5 @@ AUTO_SECTION\n" in out
+    assert "-old\n" in out and "+- Commit message: Add feature\n" in out
+
+
+@pytest.mark.parametrize("template", ["{env}", "{env[GITHUB_TOKEN]}", "{unknown}"])
+def test_embedded_template_cannot_read_environment(repo, monkeypatch, capsys, template):
+    """Templates see no environment variables; bad fields fail with an error, not a traceback."""
+    monkeypatch.setenv("GITHUB_TOKEN", "secret-token")
+    readme = repo / "README.md"
+    content = f'<!-- AUTO_SECTION_START template="{template}" -->\nold\n<!-- AUTO_SECTION_END -->\n'
+    readme.write_text(content, encoding="utf-8")
+
+    with pytest.raises(SystemExit):
+        update_file_with_git_info(readme, repo_path=repo)
+
+    assert readme.read_text(encoding="utf-8") == content
+    out = capsys.readouterr().out
+    assert out.startswith("Error: ") and "secret-token" not in out
@@ -15,6 +15,7 @@ class DummyResponse:
     def __init__(self, json_data, status=200):
         self._json = json_data
         self.status_code = status
+        self.headers = {}
 
     def raise_for_status(self):
         """Raise an HTTPError if the status indicates failure."""
@@ -46,7 +47,7 @@ def test_fetch_latest_user_commit_info_skips_ci(monkeypatch):
     monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
 
     # Stub requests.post
-    def fake_post(url, json, headers):
+    def fake_post(url, json, headers, **kwargs):
         assert url == GITHUB_GRAPHQL
         assert headers['Authorization'].startswith('bearer ')
         # Ensure variables included
@@ -67,7 +68,7 @@ def test_fetch_latest_user_commit_info_all_ci(monkeypatch):
     fake_json = {'data': {'repository': {'ref': {'target': {'history': {'nodes': nodes}}}}}}
 
     monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
-    monkeypatch.setattr(requests, 'post', lambda url, json, headers: DummyResponse(fake_json))
+    monkeypatch.setattr(requests, 'post', lambda url, json, headers, **kwargs: DummyResponse(fake_json))
 
     ts, msg = fetch_latest_user_commit_info_graphql('owner', 'repo')
     assert ts == '2025-04-04 11:11:11'
@@ -89,7 +90,7 @@ def test_update_file_with_github_info_graphql(monkeypatch, tmp_path):
 
     # Stub fetch_latest_user_commit_info_graphql
     monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
-    def fake_fetch(owner, repo):
+    def fake_fetch(owner, repo, **kwargs):
         return '1999-09-09 09:09:09', 'Test commit message'
     monkeypatch.setattr('update_readme_graphql.fetch_latest_user_commit_info_graphql', fake_fetch)
 
@@ -103,4 +104,228 @@ def test_update_file_with_github_info_graphql(monkeypatch, tmp_path):
     # Backup file exists
     bak = tmp_path / 'README.md.bak'
     assert bak.exists()
-    assert 'old content' in bak.read_text(encoding='utf-8')
\ No newline at end of file
+    assert 'old content' in bak.read_text(encoding='utf-8')
+
+def test_batch_fetch_single_request_with_per_repo_errors(monkeypatch):
+    """Many repositories are resolved in one aliased request; failures are reported per repository."""
+    from update_readme_graphql import fetch_latest_user_commit_info_graphql_batch
+
+    monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
+    calls = []
+    def fake_post(url, json, headers, **kwargs):
+        calls.append(json)
+        assert 'r2: repository(owner: $o2, name: $n2)' in json['query']
+        assert json['variables']['b1'] == 'refs/heads/dev'
+        assert json['variables']['b3'] == 'refs/pull/12/head'
+        data = {
+            'r0': {'ref': {'target': {'history': {'nodes': [
+                {'committedDate': '2025-01-01T00:00:00Z', 'message': CI_PREFIX + ' x'},
+                {'committedDate': '2025-01-02T03:04:05Z', 'message': 'Real work\n\nbody'},
+            ]}}}},
+            'r1': {'ref': None},
+            'r2': None,
+            'r3': {'ref': {'target': {'history': {'nodes': [
+                {'committedDate': '2025-01-03T00:00:00Z', 'message': 'PR work'},
+            ]}}}},
+        }
+        errors = [{'path': ['r2'], 'message': "Could not resolve to a Repository with the name 'o/missing'."}]
+        return DummyResponse({'data': data, 'errors': errors})
+    monkeypatch.setattr(requests, 'post', fake_post)
+
+    results, errors = fetch_latest_user_commit_info_graphql_batch(
+        [('o', 'a'), ('o', 'b', 'dev'), ('o', 'missing'), ('o', 'a', 'refs/pull/12/head')]
+    )
+
+    assert len(calls) == 1
+    assert results == {
+        ('o', 'a', 'main'): ('2025-01-02 03:04:05', 'Real work'),
+        ('o', 'a', 'refs/pull/12/head'): ('2025-01-03 00:00:00', 'PR work'),
+    }
+    assert "branch 'dev' not found" in str(errors[('o', 'b', 'dev')])
+    assert 'Could not resolve' in str(errors[('o', 'missing', 'main')])
+
+
+def test_batch_fetch_chunks_by_node_budget(monkeypatch):
+    """Large target lists are split so no request exceeds the repository or node budget."""
+    import update_readme_graphql
+
+    monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
+    monkeypatch.setattr(update_readme_graphql, 'MAX_NODES_PER_QUERY', 50)
+    sizes = []
+    def fake_post(url, json, headers, **kwargs):
+        aliases = [k[1:] for k in json['variables'] if k.startswith('o')]
+        sizes.append(len(aliases))
+        return DummyResponse({'data': {f'r{i}': {'ref': {'target': {'history': {'nodes': [
+            {'committedDate': '2025-01-01T00:00:00Z', 'message': 'm'}]}}}} for i in aliases}})
+    monkeypatch.setattr(requests, 'post', fake_post)
+
+    targets = [('o', f'repo{i}') for i in range(12)]
+    results, errors = update_readme_graphql.fetch_latest_user_commit_info_graphql_batch(targets, lookback=10)
+
+    assert sizes == [5, 5, 2]
+    assert len(results) == 12 and not errors
+
+
+@pytest.mark.parametrize('mode', ['sync', 'async'])
+def test_batch_fetch_pages_past_long_ci_runs(monkeypatch, mode):
+    """Aliases whose page holds only CI commits are followed by cursor in later, larger rounds."""
+    import update_readme_graphql
+
+    histories = {
+        'busy': [CI_PREFIX] * 25 + ['Human change'],
+        'quiet': ['Quiet work'],
+        'bot': [CI_PREFIX] * 40,
+    }
+    rounds = []
+    def serve(variables):
+        first = variables['first']
+        aliases = [k[1:] for k in variables if k.startswith('o')]
+        rounds.append((first, sorted(variables[f'n{i}'] for i in aliases)))
+        data = {}
+        for i in aliases:
+            start = int(variables[f'a{i}'] or 0)
+            messages = histories[variables[f'n{i}']][start:start + first]
+            nodes = [{'oid': f'{start + j}', 'committedDate': '2025-05-05T10:00:00Z', 'message': m}
+                     for j, m in enumerate(messages)]
+            end = start + len(messages)
+            page_info = {'hasNextPage': end < len(histories[variables[f'n{i}']]), 'endCursor': str(end)}
+            data[f'r{i}'] = {'ref': {'target': {'history': {'nodes': nodes, 'pageInfo': page_info}}}}
+        return DummyResponse({'data': data})
+
+    monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
+    targets = [('o', 'busy'), ('o', 'quiet'), ('o', 'bot')]
+    if mode == 'sync':
+        monkeypatch.setattr(requests, 'post', lambda url, json, headers, **kwargs: serve(json['variables']))
+        results, errors = update_readme_graphql.fetch_latest_user_commit_info_graphql_batch(targets, max_commits=30)
+    else:
+        monkeypatch.setattr(requests.Session, 'request', lambda self, method, url, json, **kwargs: serve(json['variables']))
+        results, errors = update_readme_graphql.fetch_many_latest_user_commit_info_graphql(targets, max_commits=30)
+
+    assert not errors
+    assert results[('o', 'busy', 'main')][1] == 'Human change'
+    assert results[('o', 'quiet', 'main')][1] == 'Quiet work'
+    # All-CI histories give up at max_commits and report the latest commit
+    assert results[('o', 'bot', 'main')][1] == CI_PREFIX
+    assert rounds == [(10, ['bot', 'busy', 'quiet']), (20, ['bot', 'busy'])]
+
+
+def test_fetch_pages_past_long_ci_runs(monkeypatch):
+    """A run of CI commits longer than the first page is followed by cursor with growing pages."""
+    def page(messages, has_next, cursor):
+        nodes = [{'committedDate': '2025-05-05T10:00:00Z', 'message': m} for m in messages]
+        history = {'nodes': nodes, 'pageInfo': {'hasNextPage': has_next, 'endCursor': cursor}}
+        return {'data': {'repository': {'ref': {'target': {'history': history}}}}}
+
+    pages = [
+        page([CI_PREFIX] * 10, True, 'c1'),
+        page([CI_PREFIX] * 20, True, 'c2'),
+        page([CI_PREFIX, 'Human change'], True, 'c3'),
+    ]
+    requested = []
+    monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
+    def fake_post(url, json, headers, **kwargs):
+        requested.append((json['variables']['first'], json['variables'].get('after')))
+        return DummyResponse(pages[len(requested) - 1])
+    monkeypatch.setattr(requests, 'post', fake_post)
+
+    ts, msg = fetch_latest_user_commit_info_graphql('owner', 'repo')
+    assert msg == 'Human change'
+    assert requested == [(10, None), (20, 'c1'), (40, 'c2')]
+
+
+def test_fetch_paging_stops_at_cap(monkeypatch):
+    """The search gives up after max_commits and falls back to the latest commit."""
+    history = {
+        'nodes': [{'committedDate': '2025-05-05T10:00:00Z', 'message': CI_PREFIX}] * 10,
+        'pageInfo': {'hasNextPage': True, 'endCursor': 'more'},
+    }
+    calls = []
+    monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
+    def fake_post(url, json, headers, **kwargs):
+        calls.append(1)
+        return DummyResponse({'data': {'repository': {'ref': {'target': {'history': history}}}}})
+    monkeypatch.setattr(requests, 'post', fake_post)
+
+    ts, msg = fetch_latest_user_commit_info_graphql('owner', 'repo', max_commits=30)
+    assert msg == CI_PREFIX
+    assert len(calls) == 3
+
+
+def _fake_repository(graph, refs, calls):
+    """
+    Serve ref-head and history queries from `graph` (oid -> (message, parent))
+    and `refs` (qualified ref -> head oid); history cursors are plain oids.
+    """
+    def commit(oid):
+        return {'oid': oid, 'committedDate': '2025-06-06T06:06:06Z', 'message': graph[oid][0]}
+
+    def fake_post(url, json, headers, **kwargs):
+        calls.append(json)
+        variables = json['variables']
+        repository = {}
+        for key, value in variables.items():
+            alias = key[1:]
+            if key.startswith('q'):
+                repository[f'h{alias}'] = {'target': {'oid': refs[value]}} if value in refs else None
+            elif key.startswith('o') and key != 'owner':
+                oid = variables[f'a{alias}'] or value
+                nodes = []
+                while oid and len(nodes) < variables[f'f{alias}']:
+                    nodes.append(commit(oid))
+                    oid = graph[oid][1]
+                page_info = {'hasNextPage': oid is not None, 'endCursor': oid}
+                repository[f'c{alias}'] = {'history': {'nodes': nodes, 'pageInfo': page_info}}
+        return DummyResponse({'data': {'repository': repository}})
+    return fake_post
+
+
+def test_refs_fetch_fans_out_in_two_requests(monkeypatch):
+    """Fifty PR refs cost one head lookup and one history request; shared heads are walked once."""
+    from update_readme_graphql import fetch_latest_user_commit_info_graphql_refs
+
+    graph = {'m1': ('Base work', None)}
+    refs = {'refs/heads/main': 'm1'}
+    for i in range(50):
+        graph[f'p{i}'] = (f'PR {i} change', 'm1')
+        refs[f'refs/pull/{i}/head'] = f'p{i}'
+    refs['refs/heads/alias'] = 'p0'
+    calls = []
+    monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
+    monkeypatch.setattr(requests, 'post', _fake_repository(graph, refs, calls))
+
+    wanted = [f'refs/pull/{i}/head' for i in range(50)] + ['alias', 'gone']
+    results, errors = fetch_latest_user_commit_info_graphql_refs('o', 'r', wanted)
+
+    assert len(calls) == 2
+    assert sum(k.startswith('o') and k != 'owner' for k in calls[1]['variables']) == 50
+    assert results['refs/pull/7/head'] == ('2025-06-06 06:06:06', 'PR 7 change')
+    assert results['alias'] == results['refs/pull/0/head']
+    assert "'gone' not found" in str(errors['gone'])
+
+
+def test_refs_fetch_reuses_shared_history(monkeypatch):
+    """CI-only PR heads page into the base history, which is only walked as far as needed."""
+    from update_readme_graphql import fetch_latest_user_commit_info_graphql_refs
+
+    graph = {'m0': ('Human change', None)}
+    parent = 'm0'
+    for i in range(1, 30):
+        graph[f'm{i}'] = (CI_PREFIX, parent)
+        parent = f'm{i}'
+    graph.update({'p1': (CI_PREFIX, 'm29'), 'p2': ('Own work', 'm29')})
+    refs = {'refs/heads/main': 'm29', 'refs/heads/p1': 'p1', 'refs/heads/p2': 'p2'}
+    calls = []
+    monkeypatch.setenv('GITHUB_TOKEN', 'dummy')
+    monkeypatch.setattr(requests, 'post', _fake_repository(graph, refs, calls))
+
+    memo = {}
+    results, errors = fetch_latest_user_commit_info_graphql_refs('o', 'r', ['main', 'p1', 'p2'], memo=memo)
+    assert not errors
+    assert results['main'] == results['p1'] == ('2025-06-06 06:06:06', 'Human change')
+    assert results['p2'][1] == 'Own work'
+    first_run = len(calls)
+    assert first_run <= 4
+
+    # Later runs only look up the heads
+    fetch_latest_user_commit_info_graphql_refs('o', 'r', ['main', 'p1'], memo=memo)
+    assert len(calls) == first_run + 1
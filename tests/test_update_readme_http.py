@@ -0,0 +1,223 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import update_readme
+import update_readme_rest
+from update_readme import RunContext
+from update_readme_cache import CommitInfoCache
+from update_readme_http import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    TokenBucket,
+    TransportError,
+    reset_breakers,
+    send_request,
+)
+
+
+class SlowGitHub(BaseHTTPRequestHandler):
+    """Commits endpoint with injected latency that records peak concurrency."""
+
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        with SlowGitHub.lock:
+            SlowGitHub.active += 1
+            SlowGitHub.peak = max(SlowGitHub.peak, SlowGitHub.active)
+        time.sleep(0.05)
+        with SlowGitHub.lock:
+            SlowGitHub.active -= 1
+
+        if "/missing/" in self.path:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        repo = self.path.split("/")[3]
+        body = json.dumps([
+            {"commit": {"author": {"date": "2025-06-01T00:00:00Z"}, "message": f"work on {repo}"}}
+        ]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def github(monkeypatch):
+    SlowGitHub.active = SlowGitHub.peak = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowGitHub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(update_readme_rest, "GITHUB_API", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("GITHUB_TOKEN", "dummy")
+    yield SlowGitHub
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_many_runs_concurrently_within_limit(github):
+    """Requests overlap, never exceed the concurrency limit, and failures stay per repository."""
+    targets = [("owner", f"repo{i}") for i in range(12)] + [("owner", "missing")]
+
+    results, errors = update_readme_rest.fetch_many_latest_user_commit_info(targets, concurrency=4)
+
+    assert len(results) == 12
+    assert results[("owner", "repo3", "main")] == ("2025-06-01 00:00:00", "work on repo3")
+    assert list(errors) == [("owner", "missing", "main")]
+    assert 1 < github.peak <= 4
+
+
+def test_token_bucket_honours_rate_limit_headers():
+    """Retry-After and an exhausted budget pause the bucket; a low budget slows it down."""
+    now = [100.0]
+    bucket = TokenBucket(rate=10, capacity=1, clock=lambda: now[0])
+    assert bucket.delay() == 0
+
+    bucket.note_response({"Retry-After": "3"})
+    assert bucket.delay() == pytest.approx(3)
+
+    now[0] += 3
+    bucket.note_response({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1060"}, wall_clock=lambda: 1000.0)
+    assert bucket.delay() == pytest.approx(60)
+
+    now[0] += 60
+    bucket.note_response({"X-RateLimit-Remaining": "30", "X-RateLimit-Reset": "1060"}, wall_clock=lambda: 1000.0)
+    assert bucket.rate == pytest.approx(0.5)
+
+
+class FakeResp:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    reset_breakers()
+    yield
+    reset_breakers()
+
+
+def test_send_request_retries_transient_failures(monkeypatch):
+    """502s and timeouts are retried with jittered backoff; Retry-After sets the minimum wait."""
+    replies = [requests.Timeout("read timed out"), FakeResp(502), FakeResp(429, {"Retry-After": "2"}), FakeResp(200)]
+    seen = []
+
+    def fake_get(url, **kwargs):
+        seen.append(kwargs["timeout"])
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    sleeps = []
+    policy = RetryPolicy(attempts=5, base_delay=1, rand=lambda: 0.5)
+
+    resp = send_request("GET", "https://api.example/x", retry=policy, sleep=sleeps.append)
+    assert resp.status_code == 200
+    assert sleeps == [0.5, 1.0, 2.0]
+    assert seen == [(5, 30)] * 4
+
+
+def test_send_request_gives_up_within_bounds(monkeypatch):
+    """Exhausted attempts and oversized Retry-After raise TransportError; 404s are returned as-is."""
+    monkeypatch.setattr(requests, "get", lambda url, **kwargs: FakeResp(503))
+    with pytest.raises(TransportError, match="after 3 attempt"):
+        send_request("GET", "https://a.example/x", retry=RetryPolicy(attempts=3), sleep=lambda s: None)
+
+    monkeypatch.setattr(requests, "get", lambda url, **kwargs: FakeResp(403, {"Retry-After": "3600"}))
+    with pytest.raises(TransportError, match="after 1 attempt"):
+        send_request("GET", "https://b.example/x", sleep=lambda s: None)
+
+    monkeypatch.setattr(requests, "get", lambda url, **kwargs: FakeResp(404))
+    assert send_request("GET", "https://c.example/x").status_code == 404
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Consecutive failures open the circuit; after the reset timeout one trial may close it."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.before_request()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    now[0] += 10
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # only one trial while half-open
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_github_outage_falls_back_to_cache_then_git(tmp_path, monkeypatch):
+    """With GitHub down, the REST fetcher serves the cached value and the pipeline can fall back to git."""
+    def down(*args, **kwargs):
+        raise TransportError("giving up after 4 attempt(s): HTTP 502")
+
+    monkeypatch.setenv("GITHUB_TOKEN", "dummy")
+    monkeypatch.setattr(update_readme_rest, "send_request", down)
+
+    cache = CommitInfoCache(tmp_path / "cache.json")
+    cache.put("owner", "repo", "main", '"etag"', ("2025-01-01 00:00:00", "Cached change"))
+    assert update_readme_rest.fetch_latest_user_commit_info("owner", "repo", cache=cache) == (
+        "2025-01-01 00:00:00",
+        "Cached change",
+    )
+
+    monkeypatch.setitem(
+        update_readme.PROVIDERS,
+        "git",
+        (("timestamp", "message"), lambda values: {"timestamp": "2025-02-02 00:00:00", "message": "Local change"}),
+    )
+    context = RunContext(["rest", "git"], {"owner": "owner", "repo": "repo"})
+    assert context.resolve(["message"])["message"] == "Local change"
+
+
+@pytest.mark.parametrize("source", ["rest", "graphql"])
+@pytest.mark.parametrize("failure", ["no token", "401"])
+def test_fallback_covers_missing_token_and_error_responses(monkeypatch, source, failure):
+    """A missing GITHUB_TOKEN or a non-retried error response falls back to git like an outage does."""
+    import update_readme_graphql
+
+    def unauthorized(method, url, **kwargs):
+        resp = requests.Response()
+        resp.status_code, resp.reason, resp.url = 401, "Unauthorized", url
+        return resp
+
+    if failure == "no token":
+        monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    else:
+        monkeypatch.setenv("GITHUB_TOKEN", "revoked")
+    monkeypatch.setattr(update_readme_rest, "send_request", unauthorized)
+    monkeypatch.setattr(update_readme_graphql, "send_request", unauthorized)
+    monkeypatch.setitem(
+        update_readme.PROVIDERS,
+        "git",
+        (("timestamp", "message"), lambda values: {"timestamp": "2025-02-02 00:00:00", "message": "Local change"}),
+    )
+
+    with pytest.raises(update_readme.CommitInfoError, match="GITHUB_TOKEN" if failure == "no token" else "401"):
+        RunContext([source], {"owner": "owner", "repo": "repo"}).resolve(["message"])
+    context = RunContext([source, "git"], {"owner": "owner", "repo": "repo"})
+    assert context.resolve(["message"])["message"] == "Local change"
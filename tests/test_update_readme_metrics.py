@@ -0,0 +1,63 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import json
+import subprocess
+
+import update_readme_metrics as metrics
+from update_readme import RunContext, update_path
+
+SECTION = "intro\n<!-- AUTO_SECTION_START -->\nold\n<!-- AUTO_SECTION_END -->\n"
+
+
+def test_recording_collects_phases_and_counters(tmp_path):
+    """
+    An update recorded to a JSON file reports every phase plus the bytes and
+    markers it handled.
+    """
+    readme = tmp_path / "README.md"
+    readme.write_text(SECTION, encoding="utf-8")
+    out = tmp_path / "metrics.json"
+
+    with metrics.recording(out) as recorder:
+        update_path(readme, {"AUTO_SECTION": "status"}, RunContext(values={"status": "OK"}), backup="off")
+    assert metrics.enabled() is False
+
+    data = json.loads(out.read_text(encoding="utf-8"))
+    assert data == recorder.to_dict()
+    assert {"read", "match", "resolve", "render", "write"} <= set(data["phases"])
+    assert data["counters"]["bytes_read"] == len(SECTION.encode("utf-8"))
+    assert data["counters"]["bytes_written"] == readme.stat().st_size
+    assert data["counters"]["markers_matched"] == 1
+
+
+def test_disabled_metrics_are_no_ops(tmp_path):
+    """
+    Without a path nothing is recorded and phases share one no-op context.
+    """
+    with metrics.recording(None) as recorder:
+        assert recorder is None
+        assert metrics.phase("read") is metrics.phase("write")
+        metrics.incr("http_requests")
+    assert not metrics.enabled()
+
+
+def test_cli_writes_prometheus_textfile(tmp_path):
+    """
+    --metrics with a .prom path writes a textfile-collector file.
+    """
+    readme = tmp_path / "README.md"
+    readme.write_text(SECTION, encoding="utf-8")
+    script = os.path.join(os.path.dirname(__file__), os.pardir, "update_readme.py")
+    result = subprocess.run(
+        [sys.executable, script, "--metrics", "update_readme.prom"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stdout
+
+    text = (tmp_path / "update_readme.prom").read_text(encoding="utf-8")
+    assert "# TYPE update_readme_phase_seconds gauge" in text
+    assert 'update_readme_phase_seconds{phase="write"}' in text
+    assert "update_readme_files_updated_total 1" in text
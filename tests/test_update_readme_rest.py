@@ -11,9 +11,11 @@ from update_readme_rest import (
 
 class DummyResp:
     """A dummy response object for simulating requests.get responses."""
-    def __init__(self, json_data, status=200):
+    def __init__(self, json_data, status=200, links=None):
         self._json = json_data
         self.status_code = status
+        self.headers = {}
+        self.links = links or {}
 
     def raise_for_status(self):
         """Raise an HTTPError if the status code indicates a failure."""
@@ -41,7 +43,7 @@ def test_fetch_latest_user_commit_info_skips_ci_commits(monkeypatch):
     ]
     # Stub environment and requests.get
     monkeypatch.setenv("GITHUB_TOKEN", "dummy_token")
-    def fake_get(url, headers, params):
+    def fake_get(url, headers, params, **kwargs):
         # Expect per_page=10, sha=main
         assert params["sha"] == "main" and params["per_page"] == 10
         return DummyResp(fake_commits)
@@ -58,7 +60,7 @@ def test_fetch_latest_user_commit_info_all_ci(monkeypatch):
         {"commit": {"author": {"date": "2025-04-04T12:00:00Z"}, "message": "ci: auto-update README section"}}
     ]
     monkeypatch.setenv("GITHUB_TOKEN", "dummy_token")
-    def fake_get(url, headers, params):
+    def fake_get(url, headers, params, **kwargs):
         return DummyResp(fake_commits)
     monkeypatch.setattr(requests, "get", fake_get)
 
@@ -81,7 +83,7 @@ def test_integration_with_rest(monkeypatch, tmp_path):
 
     # 2. Stub fetch_latest_user_commit_info to return known timestamp/message
     monkeypatch.setenv("GITHUB_TOKEN", "dummy_token")
-    def fake_user_info(owner, repo):
+    def fake_user_info(owner, repo, **kwargs):
         return "1999-12-31 23:59:59", "Final commit"
     monkeypatch.setattr("update_readme_rest.fetch_latest_user_commit_info", fake_user_info)
 
@@ -94,4 +96,76 @@ def test_integration_with_rest(monkeypatch, tmp_path):
     assert "- Last updated: 1999-12-31 23:59:59" in updated
     assert "- Commit message: Final commit" in updated
     bak = tmp_path / "README.md.bak"
-    assert bak.exists() and "old" in bak.read_text(encoding="utf-8")
\ No newline at end of file
+    assert bak.exists() and "old" in bak.read_text(encoding="utf-8")
+
+def test_streaming_update_fetches_lazily(monkeypatch, tmp_path):
+    """The streaming mode fetches commit info only once a section is found."""
+    readme = tmp_path / "README.md"
+    readme.write_text(
+        "Intro\n"
+        "<!-- AUTO_SECTION_START -->\n"
+        "old\n"
+        "<!-- AUTO_SECTION_END -->\n",
+        encoding="utf-8"
+    )
+    calls = []
+    def fake_user_info(owner, repo, **kwargs):
+        calls.append((owner, repo))
+        return "1999-12-31 23:59:59", "Final commit"
+    monkeypatch.setattr("update_readme_rest.fetch_latest_user_commit_info", fake_user_info)
+
+    update_file_with_github_info(readme, "owner", "repo", stream=True)
+
+    assert calls == [("owner", "repo")]
+    updated = readme.read_text(encoding="utf-8")
+    assert "- Commit message: Final commit" in updated
+    assert updated.startswith("Intro\n") and updated.endswith("<!-- AUTO_SECTION_END -->\n")
+
+    # Without markers, nothing is fetched and the run fails
+    readme.write_text("No markers", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        update_file_with_github_info(readme, "owner", "repo", stream=True)
+    assert len(calls) == 1
+
+
+def test_fetch_follows_link_pages_with_growing_size(monkeypatch):
+    """When the first page is all CI commits, later pages are requested with aligned, growing sizes."""
+    ci = {"commit": {"author": {"date": "2025-01-01T00:00:00Z"}, "message": "ci: auto-update README section"}}
+    user = {"commit": {"author": {"date": "2025-01-01T01:02:03Z"}, "message": "Human change"}}
+    next_link = {"next": {"url": "https://api.github.com/next"}}
+    responses = [
+        DummyResp([ci] * 10, links=next_link),
+        DummyResp([ci] * 10, links=next_link),
+        DummyResp([ci] * 19 + [user], links=next_link),
+    ]
+    requested = []
+    monkeypatch.setenv("GITHUB_TOKEN", "dummy_token")
+    def fake_get(url, headers, params, **kwargs):
+        requested.append((params["per_page"], params.get("page", 1)))
+        return responses[len(requested) - 1]
+    monkeypatch.setattr(requests, "get", fake_get)
+
+    ts, msg = fetch_latest_user_commit_info("owner", "repo")
+    assert (ts, msg) == ("2025-01-01 01:02:03", "Human change")
+    # 10 seen -> page 2 of 10; 20 seen -> page 2 of 20
+    assert requested == [(10, 1), (10, 2), (20, 2)]
+
+
+def test_fresh_section_is_not_fetched(monkeypatch, tmp_path, capsys):
+    """While a section's refresh interval runs, the updater neither fetches nor writes."""
+    from datetime import datetime
+
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    content = f'<!-- AUTO_SECTION_START refresh="6h" stamp="{stamp}" -->\nold\n<!-- AUTO_SECTION_END -->\n'
+    readme = tmp_path / "README.md"
+    readme.write_text(content, encoding="utf-8")
+
+    def fail(owner, repo, **kwargs):
+        raise AssertionError("commit info should not be fetched")
+    monkeypatch.setattr("update_readme_rest.fetch_latest_user_commit_info", fail)
+
+    update_file_with_github_info(readme, "owner", "repo")
+
+    assert readme.read_text(encoding="utf-8") == content
+    assert not (tmp_path / "README.md.bak").exists()
+    assert capsys.readouterr().out == "README.md is already up to date.\n"
@@ -0,0 +1,158 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import pytest
+import requests
+
+from update_readme_snapshot import (
+    CommitRecord,
+    Snapshot,
+    SnapshotError,
+    SnapshotRecorder,
+    write_snapshot,
+)
+
+
+def test_snapshot_round_trip(tmp_path):
+    """Thousands of records are written sorted and found again by binary search."""
+    path = tmp_path / "commits.snap"
+    records = [
+        CommitRecord(f"org/repo{i}", branch, f"{i:040x}", 1_700_000_000 + i, f"Change {i} ✅")
+        for i in range(2000)
+        for branch in ("main", "refs/pull/1/head")
+    ]
+    records.append(CommitRecord("org/repo0", "main", "", 0, "newest wins"))
+    assert write_snapshot(path, records) == 4000
+
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 4000
+        assert snapshot.get("org/repo1234", "refs/pull/1/head") == records[2 * 1234 + 1]
+        assert snapshot.get("org/repo0", "main").message == "newest wins"
+        assert snapshot.get("org/repo0", "main").sha == ""
+        assert snapshot.get("org/missing", "main") is None
+        assert snapshot.get("org/repo7", "main").formatted() == ("2023-11-14 22:13:27", "Change 7 ✅")
+        keys = [(r.repo, r.branch) for r in snapshot]
+        assert keys == sorted(keys, key=lambda k: f"{k[0]}\0{k[1]}".encode("utf-8"))
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "commits.snap"
+    write_snapshot(path, [CommitRecord("o/r", "main", "", 0, "m")])
+    data = bytearray(path.read_bytes())
+    data[4] = 99
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match="version 99"):
+        Snapshot(path)
+    path.write_bytes(b"{}")
+    with pytest.raises(SnapshotError):
+        Snapshot(path)
+
+
+def test_snapshot_rejects_truncated_or_corrupt_strings(tmp_path):
+    """A cut-off string area fails at open; a record pointing past it fails on lookup."""
+    from update_readme_snapshot import _HEADER, _RECORD
+
+    path = tmp_path / "commits.snap"
+    write_snapshot(path, [CommitRecord("o/r", "main", "", 0, "msg1"), CommitRecord("o/s", "main", "", 0, "msg2 ✅")])
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+    with pytest.raises(SnapshotError, match="truncated"):
+        Snapshot(path)
+
+    # Grow the last message length while the file keeps its size
+    corrupt = bytearray(data)
+    fields = list(_RECORD.unpack_from(corrupt, _HEADER.size + _RECORD.size))
+    fields[3] = 200
+    _RECORD.pack_into(corrupt, _HEADER.size + _RECORD.size, *fields)
+    path.write_bytes(bytes(corrupt))
+    with Snapshot(path) as snapshot:
+        assert snapshot.get("o/r", "main").message == "msg1"
+        with pytest.raises(SnapshotError, match="corrupt"):
+            snapshot.get("o/s", "main")
+
+
+def test_fetchers_emit_and_consume_snapshots(tmp_path, monkeypatch):
+    """A recorded result is served from the snapshot later without any request."""
+    from update_readme_graphql import fetch_latest_user_commit_info_graphql
+    from update_readme_rest import fetch_latest_user_commit_info
+
+    class Resp:
+        status_code = 200
+        headers = {}
+        links = {}
+
+        def __init__(self, payload):
+            self.payload = payload
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.payload
+
+    commits = [{"sha": "ab" * 20, "commit": {"author": {"date": "2025-01-02T03:04:05Z"}, "message": "REST work"}}]
+    nodes = [{"oid": "cd" * 20, "committedDate": "2025-02-03T04:05:06Z", "message": "GraphQL work\n\nbody"}]
+    monkeypatch.setenv("GITHUB_TOKEN", "dummy")
+    monkeypatch.setattr(requests, "get", lambda *a, **kw: Resp(commits))
+    monkeypatch.setattr(
+        requests, "post",
+        lambda *a, **kw: Resp({"data": {"repository": {"ref": {"target": {"history": {"nodes": nodes}}}}}}),
+    )
+
+    path = tmp_path / "commits.snap"
+    write_snapshot(path, [CommitRecord("o/kept", "main", "", 0, "from an earlier job")])
+    recorder = SnapshotRecorder(path)
+    assert fetch_latest_user_commit_info("o", "r", recorder=recorder) == ("2025-01-02 03:04:05", "REST work")
+    fetch_latest_user_commit_info_graphql("o", "g", branch="dev", recorder=recorder)
+    assert recorder.save() == 3
+
+    def offline(*args, **kwargs):
+        raise AssertionError("no request expected")
+
+    monkeypatch.setattr(requests, "get", offline)
+    monkeypatch.setattr(requests, "post", offline)
+    with Snapshot(path) as snapshot:
+        assert snapshot.get("o/r", "main").sha == "ab" * 20
+        assert snapshot.get("o/g", "dev").sha == "cd" * 20
+        assert snapshot.get("o/kept", "main").message == "from an earlier job"
+        assert fetch_latest_user_commit_info("o", "r", snapshot=snapshot) == ("2025-01-02 03:04:05", "REST work")
+        assert fetch_latest_user_commit_info_graphql("o", "g", branch="dev", snapshot=snapshot) == (
+            "2025-02-03 04:05:06",
+            "GraphQL work",
+        )
+
+
+def test_graphql_batch_and_refs_consult_snapshot(tmp_path, monkeypatch, capsys):
+    """--batch and --refs serve recorded branches from the snapshot and only fetch the others."""
+    import update_readme_graphql
+
+    path = tmp_path / "commits.snap"
+    write_snapshot(path, [
+        CommitRecord("o/a", "main", "", 1735732800, "Recorded a"),
+        CommitRecord("o/b", "refs/pull/1/head", "", 1735732800, "Recorded PR"),
+    ])
+    requested = []
+
+    def fetch_many(targets, concurrency):
+        requested.append(list(targets))
+        return {t: ("2025-02-02 00:00:00", "Fetched") for t in targets}, {}
+
+    def fetch_refs(owner, repo, refs):
+        requested.append(list(refs))
+        return {ref: ("2025-02-02 00:00:00", "Fetched") for ref in refs}, {}
+
+    monkeypatch.setattr(update_readme_graphql, "fetch_many_latest_user_commit_info_graphql", fetch_many)
+    monkeypatch.setattr(update_readme_graphql, "fetch_latest_user_commit_info_graphql_refs", fetch_refs)
+    with Snapshot(path) as snapshot:
+        assert update_readme_graphql._print_batch([("o", "a", "main"), ("o", "c", "main")], 4, snapshot=snapshot) == 0
+        assert update_readme_graphql._print_refs("o", "b", ["refs/pull/1/head", "main"], snapshot=snapshot) == 0
+        update_readme_graphql._print_refs("o", "a", ["main"], snapshot=snapshot)
+
+    assert requested == [[("o", "c", "main")], ["main"]]
+    out = capsys.readouterr().out.splitlines()
+    assert out[:4] == [
+        "o/a@main: 2025-01-01 12:00:00 Recorded a",
+        "o/c@main: 2025-02-02 00:00:00 Fetched",
+        "o/b@refs/pull/1/head: 2025-01-01 12:00:00 Recorded PR",
+        "o/b@main: 2025-02-02 00:00:00 Fetched",
+    ]
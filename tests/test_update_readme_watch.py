@@ -0,0 +1,150 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import time
+import pytest
+from pathlib import Path
+
+from update_readme_watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    WatchDaemon,
+    make_watcher,
+    send_status,
+)
+
+SECTION = "<!-- AUTO_SECTION_START --><!-- AUTO_SECTION_END -->\n"
+
+
+def _run_until(daemon, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "daemon did not apply the update in time"
+        daemon.run_once(0.05)
+
+
+def test_socket_updates_are_debounced_into_one_batch(tmp_path):
+    """
+    A burst of status updates over the socket is applied as one batch, with
+    the latest status winning.
+    """
+    readme = tmp_path / "README.md"
+    readme.write_text(SECTION, encoding="utf-8")
+    sock = str(tmp_path / "daemon.sock")
+    daemon = WatchDaemon([readme], status="START", debounce=0.2, socket_path=sock, backup="off", output=lambda msg: None)
+    try:
+        daemon.run_once(0)
+        assert daemon.batches == 1
+        assert "- Deployment status: START" in readme.read_text(encoding="utf-8")
+
+        for status in ("one", "two", "three"):
+            send_status(sock, status)
+        _run_until(daemon, lambda: daemon.batches == 2)
+        assert "- Deployment status: three" in readme.read_text(encoding="utf-8")
+    finally:
+        daemon.close()
+    assert not os.path.exists(sock)
+
+
+def test_stdin_updates_and_external_edits(tmp_path):
+    """
+    Lines read from an input descriptor update the files, and a file rewritten
+    by someone else gets its section restored; EOF stops the daemon.
+    """
+    readme = tmp_path / "README.md"
+    readme.write_text(SECTION, encoding="utf-8")
+    read_fd, write_fd = os.pipe()
+    daemon = WatchDaemon([readme], status="OK", debounce=0.01, input_fd=read_fd, backup="off", output=lambda msg: None)
+    try:
+        os.write(write_fd, b"deploying\n")
+        _run_until(daemon, lambda: "- Deployment status: deploying" in readme.read_text(encoding="utf-8"))
+
+        readme.write_text("edited\n" + SECTION, encoding="utf-8")
+        _run_until(daemon, lambda: "- Deployment status: deploying" in readme.read_text(encoding="utf-8"))
+        assert readme.read_text(encoding="utf-8").startswith("edited\n")
+
+        os.write(write_fd, b"done")
+        os.close(write_fd)
+        daemon.serve_forever()
+        assert "- Deployment status: done" in readme.read_text(encoding="utf-8")
+    finally:
+        os.close(read_fd)
+
+
+@pytest.mark.parametrize("kind", ["inotify", "polling"])
+def test_watchers_report_atomic_replacements(tmp_path, kind):
+    """
+    Both watchers notice a watched file being replaced and ignore others.
+    """
+    watched = tmp_path / "README.md"
+    watched.write_text("a", encoding="utf-8")
+    if kind == "inotify":
+        if not sys.platform.startswith("linux"):
+            pytest.skip("inotify is Linux only")
+        watcher = InotifyWatcher([watched])
+    else:
+        watcher = PollingWatcher([watched], interval=0.01)
+    try:
+        (tmp_path / "other.md").write_text("x", encoding="utf-8")
+        tmp = tmp_path / "tmp"
+        tmp.write_text("bb", encoding="utf-8")
+        os.replace(tmp, watched)
+        assert watcher.changes() == {Path(os.path.abspath(watched))}
+        assert watcher.changes() == set()
+    finally:
+        watcher.close()
+
+
+def test_make_watcher_falls_back_to_polling(tmp_path, monkeypatch):
+    """
+    inotify is used on Linux; other platforms, or a failing inotify setup,
+    get the polling watcher.
+    """
+    import update_readme_watch
+
+    watched = tmp_path / "README.md"
+    watched.write_text("a", encoding="utf-8")
+
+    if sys.platform.startswith("linux"):
+        watcher = make_watcher([watched])
+        watcher.close()
+        assert isinstance(watcher, InotifyWatcher)
+
+    def no_inotify(paths):
+        raise OSError("inotify watch limit reached")
+
+    monkeypatch.setattr(update_readme_watch, "InotifyWatcher", no_inotify)
+    watcher = make_watcher([watched], poll_interval=0.01)
+    watcher.close()
+    assert isinstance(watcher, PollingWatcher)
+
+    monkeypatch.setattr(sys, "platform", "darwin")
+    watcher = make_watcher([watched])
+    watcher.close()
+    assert isinstance(watcher, PollingWatcher)
+
+
+def test_cli_writes_metrics_on_exit(tmp_path):
+    """
+    --metrics is accepted like in the other scripts; the file is written
+    when the daemon exits.
+    """
+    import json
+    import subprocess
+
+    readme = tmp_path / "README.md"
+    readme.write_text(SECTION, encoding="utf-8")
+    script = os.path.join(os.path.dirname(__file__), os.pardir, "update_readme_watch.py")
+    result = subprocess.run(
+        [sys.executable, script, "--stdin", "--metrics", "metrics.json", "--backup", "off"],
+        cwd=tmp_path,
+        input="OK\n",
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 0, result.stderr
+
+    data = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert data["counters"]["files_updated"] == 1
+    assert "- Deployment status: OK" in readme.read_text(encoding="utf-8")
@@ -1,69 +1,1820 @@
 import argparse
+import glob
+import hashlib
+import importlib
+import json
+import mmap
 import re
+import shutil
+import string
 import sys
 import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache, partial
+
+import update_readme_metrics as metrics
 
 
 class MarkerNotFoundError(Exception):
     """Raised when the specified marker is not found in the file."""
 
+    def __init__(self, message: str, markers: list = None):
+        super().__init__(message)
+        self.markers = list(markers or [])
+
+    @classmethod
+    def for_markers(cls, markers: list, path) -> "MarkerNotFoundError":
+        """Build a single error naming every missing marker."""
+        names = ", ".join(f"'{m}'" for m in markers)
+        return cls(f"No markers found for {names} in {path}", markers)
+
+
+class CommitInfoError(Exception):
+    """Raised (or returned per repository) when commit info cannot be resolved."""
+
     pass
 
 
+@lru_cache(maxsize=64)
+def _marker_token_pattern(markers: tuple, binary: bool = False) -> "re.Pattern":
+    """
+    Compile a single tokenizer matching the START/END comment of every marker.
+    Compiled patterns are cached per marker set so repeated calls are free.
+    With `binary`, the pattern matches UTF-8 encoded bytes instead of text.
+    A comment may carry attributes on its line (e.g. an embedded template),
+    captured as the third group.
+    """
+    # Longest names first so that e.g. "A_B" wins over "A" in the alternation
+    names = "|".join(re.escape(m) for m in sorted(set(markers), key=len, reverse=True))
+    pattern = rf"<!-- ({names})_(START|END)(?: ((?:(?!-->)[^\n])*?))? -->"
+    return re.compile(pattern.encode("utf-8") if binary else pattern)
+
+
+def find_marker_regions(content: str, markers: list):
+    """
+    Locate every `<!-- X_START -->` ... `<!-- X_END -->` pair for the given markers
+    in a single left-to-right pass over `content`.
+
+    A START opens a region that is closed by the first matching END after it.
+    Tokens that appear inside an open region (duplicate STARTs, other markers)
+    belong to that region and are replaced along with it; unmatched ENDs and
+    unterminated STARTs (with no matching END anywhere after them) are left
+    untouched and do not hide the sections that follow them.
+
+    :param content: Document text to scan, or its UTF-8 bytes (any buffer,
+                    e.g. an mmap), in which case offsets are byte offsets
+    :param markers: List of marker prefixes to look for
+    :return: (regions, missing) where regions is a list of (marker, start, end)
+             spans covering the START token through the END token, in document
+             order, and missing lists the markers that have no complete pair
+    """
+    if not markers:
+        return [], []
+
+    binary = not isinstance(content, str)
+    token = _marker_token_pattern(tuple(markers), binary)
+    tokens = []
+    for m in token.finditer(content):
+        marker, kind = m.group(1, 2)
+        if binary:
+            marker, kind = marker.decode("utf-8"), kind.decode("ascii")
+        tokens.append((m.start(), m.end(), marker, kind))
+    last_end = {}
+    for start, _, marker, kind in tokens:
+        if kind == "END":
+            last_end[marker] = start
+
+    regions = []
+    open_marker = None
+    open_at = 0
+
+    for start, end, marker, kind in tokens:
+        if open_marker is None:
+            if kind == "START" and last_end.get(marker, -1) > start:
+                open_marker, open_at = marker, start
+        elif marker == open_marker and kind == "END":
+            regions.append((marker, open_at, end))
+            open_marker = None
+
+    found = {marker for marker, _, _ in regions}
+    missing = [m for m in dict.fromkeys(markers) if m not in found]
+    return regions, missing
+
+
+def replace_marker_regions(content: str, regions: list, render) -> str:
+    """
+    Splice new sections into `content` for every region returned by
+    `find_marker_regions`, building the result in one pass.
+
+    :param content: Original document text, or its UTF-8 bytes (any buffer);
+                    bytes are sliced without copying and only the rendered
+                    sections are encoded
+    :param regions: List of (marker, start, end) spans in document order
+    :param render: Callable taking a marker prefix and returning the full
+                   replacement text, including the START and END comments
+    :return: The updated document, as text or bytes like `content`
+    """
+    binary = not isinstance(content, str)
+    if binary:
+        content = memoryview(content)
+    parts = []
+    pos = 0
+    for marker, start, end in regions:
+        parts.append(content[pos:start])
+        text = render(marker)
+        parts.append(text.encode("utf-8") if binary else text)
+        pos = end
+    parts.append(content[pos:])
+    return (b"" if binary else "").join(parts)
+
+
+def _newline_style(content) -> str:
+    """The first line ending of `content` (text or bytes): CRLF, or LF if it has none."""
+    newline = "\n" if isinstance(content, str) else b"\n"
+    at = content.find(newline)
+    return "\r\n" if at > 0 and content[at - 1:at] in ("\r", b"\r") else "\n"
+
+
+def _with_newlines(text: str, newline: str) -> str:
+    if newline == "\n":
+        return text
+    return text.replace("\r\n", "\n").replace("\n", newline)
+
+
+TEMPLATE_PREFIX = "template:"
+_TEMPLATE_ATTR = re.compile(r'template="((?:[^"\\\n]|\\.)*)"')
+_CONVERSIONS = {None: lambda v: v, "s": str, "r": repr, "a": ascii}
+
+
+@lru_cache(maxsize=256)
+def compile_template(text: str):
+    """
+    Compile a section template into a renderer entry (fields used, callable).
+
+    Templates use `str.format` syntax for the section body, e.g.
+    "- Last updated: {now}\\n- Deployment status: {status}", and may reference
+    any provider field. Parsing happens once per distinct template per
+    process; rendering only joins the pre-split parts.
+
+    :raises ValueError: if the template is malformed or uses indexing or
+             attribute access in a field
+    """
+    parts = []
+    for literal, name, spec, conversion in string.Formatter().parse(text):
+        if name is not None and not name.isidentifier():
+            raise ValueError(f"Unsupported template field '{{{name}}}' (use plain field names)")
+        parts.append((literal, name, spec or "", _CONVERSIONS[conversion]))
+    fields = tuple(dict.fromkeys(name for _, name, _, _ in parts if name))
+
+    def render(marker: str, values: dict) -> str:
+        body = "".join(
+            literal + (format(convert(values[name]), spec) if name else "")
+            for literal, name, spec, convert in parts
+        )
+        return f"<!-- {marker}_START -->\n{body}\n<!-- {marker}_END -->"
+
+    return fields, render
+
+
+def _embedded_template(attrs):
+    """Return the renderer name for a `template="..."` START attribute, if any."""
+    if not attrs:
+        return None
+    if isinstance(attrs, bytes):
+        attrs = attrs.decode("utf-8")
+    match = _TEMPLATE_ATTR.search(attrs)
+    if match is None:
+        return None
+    text = re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), match.group(1))
+    return TEMPLATE_PREFIX + text
+
+
+_ATTRIBUTE = re.compile(r'([\w-]+)="((?:[^"\\\n]|\\.)*)"')
+_REFRESH_TERM = re.compile(r"(\d+)([smhd])")
+_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# Length of the section fingerprints written into START comments
+FINGERPRINT_LENGTH = 16
+NOW_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _attributes(attrs) -> dict:
+    """Parse the `name="value"` attributes of a START comment (values stay escaped)."""
+    if not attrs:
+        return {}
+    if isinstance(attrs, bytes):
+        attrs = attrs.decode("utf-8")
+    return dict(_ATTRIBUTE.findall(attrs))
+
+
+@lru_cache(maxsize=64)
+def parse_refresh(policy: str):
+    """
+    Parse a `refresh="..."` policy into (minimum interval in seconds or None,
+    only-when-changed flag). A policy lists an interval such as "90s", "15m",
+    "6h" or "1d", the word "changed", or both (e.g. "changed 1h").
+
+    :raises ValueError: if the policy is not of that form
+    """
+    interval = None
+    changed = False
+    for term in policy.replace(",", " ").split():
+        match = _REFRESH_TERM.fullmatch(term)
+        if term == "changed" and not changed:
+            changed = True
+        elif match and interval is None:
+            interval = int(match.group(1)) * _SECONDS[match.group(2)]
+        else:
+            raise ValueError(f"Invalid refresh policy '{policy}'")
+    if interval is None and not changed:
+        raise ValueError(f"Invalid refresh policy '{policy}'")
+    return interval, changed
+
+
+def _set_attributes(start_token: str, marker: str, values: dict) -> str:
+    """Return `start_token` with the given attributes added or replaced."""
+    attrs = _marker_token_pattern((marker,)).match(start_token).group(3) or ""
+    for name, value in values.items():
+        attr = f'{name}="{value}"'
+        pattern = re.compile(rf'(?<![\w-]){name}="(?:[^"\\\n]|\\.)*"')
+        attrs, count = pattern.subn(lambda m: attr, attrs, count=1)
+        if not count:
+            attrs = f"{attrs} {attr}" if attrs else attr
+    return f"<!-- {marker}_START {attrs} -->"
+
+
+def _section_fingerprint(name: str, context) -> str:
+    """Hash of a renderer and the fields it renders, leaving out volatile ones (the clock)."""
+    volatile = {f for provider in VOLATILE_PROVIDERS for f in PROVIDERS[provider][0]}
+    fields = sorted(f for f in _renderer(name)[0] if f not in volatile)
+    resolved = context.resolve(fields)
+    payload = json.dumps(
+        {"renderer": name, "fields": {f: resolved[f] for f in fields}}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def _refresh_plan(name: str, marker: str, start_token: str, context) -> tuple:
+    """
+    Apply the `refresh` policy of a section's START comment.
+
+    A section whose `stamp` (the time it was last rendered) is younger than
+    the policy's interval is fresh, and so is a "changed" section whose
+    `fingerprint` still matches the fields it renders, leaving out the clock;
+    only the latter resolves any fields. Returns (fresh, start_token), where
+    the START comment of a section to rewrite carries its new stamp and
+    fingerprint. Sections without a policy are never fresh and keep their
+    START comment as it is.
+
+    :raises ValueError: if the policy is malformed
+    """
+    attrs = _attributes(_marker_token_pattern((marker,)).match(start_token).group(3))
+    if "refresh" not in attrs:
+        return False, start_token
+    interval, changed = parse_refresh(attrs["refresh"])
+    now = context.resolve(("now",))["now"]
+    if interval is not None and "stamp" in attrs:
+        try:
+            stamp = datetime.strptime(attrs["stamp"], NOW_FORMAT)
+            age = (datetime.strptime(now, NOW_FORMAT) - stamp).total_seconds()
+        except ValueError:
+            age = None
+        if age is not None and 0 <= age < interval:
+            return True, start_token
+    updates = {"stamp": now}
+    if changed:
+        fingerprint = _section_fingerprint(name, context)
+        if attrs.get("fingerprint") == fingerprint:
+            return True, start_token
+        updates["fingerprint"] = fingerprint
+    return False, _set_attributes(start_token, marker, updates)
+
+
+STATUS_TEMPLATE = "- Last updated: {now}\n- Deployment status: {status}"
+COMMIT_TEMPLATE = (
+    "- Last updated: {timestamp}\n- Commit message: {message}\n- Deployment status: {status}"
+)
+
+
+def render_section(marker: str, status: str, now: str) -> str:
+    """Build the replacement snippet for one marker section."""
+    return compile_template(STATUS_TEMPLATE)[1](marker, {"status": status, "now": now})
+
+
+def render_commit_section(marker: str, timestamp: str, message: str, status: str = "✅") -> str:
+    """Build the replacement snippet for a section describing the latest commit."""
+    fields = {"timestamp": timestamp, "message": message, "status": status}
+    return compile_template(COMMIT_TEMPLATE)[1](marker, fields)
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime(NOW_FORMAT)
+
+
+def clock_provider(values: dict) -> dict:
+    return {"now": _timestamp()}
+
+
+def env_values(names) -> dict:
+    """
+    Return the environment variables `names` as `env_<NAME>` fields. Templates
+    can be embedded in any README, so only variables listed explicitly (e.g.
+    with --env) are ever exposed to them.
+
+    :raises ValueError: if a variable is not set
+    """
+    values = {}
+    for name in names:
+        if name not in os.environ:
+            raise ValueError(f"Environment variable {name} is not set")
+        values[f"env_{name}"] = os.environ[name]
+    return values
+
+
+COMMIT_FIELDS = ("timestamp", "message")
+
+# Data providers: name -> (fields provided, callable or "module:function").
+# Network-backed providers live in their backend modules and are only
+# imported when a run actually needs them.
+PROVIDERS = {
+    "clock": (("now",), clock_provider),
+    "rest": (COMMIT_FIELDS, "update_readme_rest:commit_info_provider"),
+    "graphql": (COMMIT_FIELDS, "update_readme_graphql:commit_info_provider"),
+    "git": (COMMIT_FIELDS, "update_readme_git:commit_info_provider"),
+}
+
+# Local providers any RunContext may use, after its configured sources
+IMPLICIT_SOURCES = ("clock",)
+
+# Providers whose output changes on every run; they are left out of
+# RunContext.fingerprint so incremental runs can skip otherwise unchanged files.
+VOLATILE_PROVIDERS = frozenset({"clock"})
+
+# Section renderers: name -> (fields used, callable(marker, fields) -> section).
+# Sections may also name a "template:<text>" renderer, see `compile_template`.
+RENDERERS = {
+    "status": compile_template(STATUS_TEMPLATE),
+    "commit": compile_template(COMMIT_TEMPLATE),
+}
+
+
+def _load_provider(target):
+    if callable(target):
+        return target
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class RunContext:
+    """
+    Resolves the data fields needed by section renderers for one run.
+
+    Static `values` (e.g. the deployment status, owner/repo) are available as
+    fields and are passed to every provider. Each of the `sources` providers
+    runs at most once per context, only when one of its fields is first
+    needed; providers needed together run concurrently. Results are shared
+    by every marker and file rendered with the same context.
+
+    A field comes from the first source providing it, or else from one of the
+    local `IMPLICIT_SOURCES` (so templates can always use e.g. `now`). If that provider fails
+    with CommitInfoError, the later sources providing the same fields are
+    tried in order (e.g. ["rest", "git"] falls back to the local history).
+    """
+
+    def __init__(self, sources=("clock",), values: dict = None):
+        self.sources = list(sources)
+        self.values = dict(values or {})
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Only resolved data crosses process boundaries
+        results = {
+            name: future.result()
+            for name, future in self._results.items()
+            if future.done() and future.exception() is None
+        }
+        return {"sources": self.sources, "values": self.values, "_results": results}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        for name, result in list(self._results.items()):
+            self._results[name] = Future()
+            self._results[name].set_result(result)
+
+    def _provider_for(self, field_name: str) -> str:
+        for name in self.sources + [n for n in IMPLICIT_SOURCES if n not in self.sources]:
+            if field_name in PROVIDERS[name][0]:
+                return name
+        raise ValueError(f"No provider configured for field '{field_name}'")
+
+    def resolve(self, fields) -> dict:
+        """Return a mapping with at least `fields`, running providers as needed."""
+        needed = {
+            self._provider_for(f) for f in fields if f not in self.values
+        }
+        with self._lock:
+            pending = {}
+            for name in needed:
+                if name not in self._results:
+                    future = Future()
+                    self._results[name] = future
+                    pending[name] = future
+
+        if len(pending) == 1:
+            name, future = next(iter(pending.items()))
+            self._run(name, future)
+        elif pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                for name, future in pending.items():
+                    executor.submit(self._run, name, future)
+
+        resolved = {}
+        for name in needed:
+            resolved.update(self._results[name].result())
+        resolved.update(self.values)
+        return resolved
+
+    def fingerprint(self, sections: dict) -> str:
+        """
+        Hash of everything except volatile providers that `sections` renders
+        from: the marker/renderer mapping, static values and provider results.
+        """
+        fields = sorted(
+            f for f in _section_fields(sections, sections)
+            if f in self.values or self._provider_for(f) not in VOLATILE_PROVIDERS
+        )
+        resolved = self.resolve(fields)
+        payload = json.dumps(
+            {"sections": sections, "fields": {f: resolved[f] for f in fields}},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _run(self, name: str, future: Future):
+        try:
+            future.set_result(self._call(name))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _call(self, name: str) -> dict:
+        try:
+            return _load_provider(PROVIDERS[name][1])(self.values)
+        except CommitInfoError:
+            fields = PROVIDERS[name][0]
+            later = self.sources[self.sources.index(name) + 1:]
+            fallback = next((n for n in later if PROVIDERS[n][0] == fields), None)
+            if fallback is None:
+                raise
+            metrics.incr("fallbacks")
+            return self._call(fallback)
+
+
+def _renderer(name: str):
+    """Look up a renderer by name, or compile a "template:<text>" one."""
+    if name.startswith(TEMPLATE_PREFIX):
+        return compile_template(name[len(TEMPLATE_PREFIX):])
+    try:
+        return RENDERERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown section renderer '{name}'")
+
+
+def _render_region(name: str, marker: str, fields: dict, start_token: str, newline: str = "\n") -> str:
+    """
+    Render one section, keeping its original START comment (and attributes)
+    and ending its lines with `newline`.
+    """
+    section = _renderer(name)[1](marker, fields)
+    default_start = f"<!-- {marker}_START -->"
+    if start_token != default_start and section.startswith(default_start):
+        section = start_token + section[len(default_start):]
+    return _with_newlines(section, newline)
+
+
+def _section_fields(sections: dict, markers) -> set:
+    return {f for m in markers for f in _renderer(sections[m])[0]}
+
+
+def render_sections(content: str, path: Path, sections: dict, context: RunContext) -> str:
+    """
+    Return `content` with every marker section replaced, without touching the disk.
+
+    :param content: Document text, or its UTF-8 bytes (any buffer, e.g. an
+                    mmap), in which case the result is bytes too and the
+                    document itself is never decoded. The new sections use
+                    the document's line endings (CRLF or LF).
+    :param sections: Mapping of marker prefix to renderer name
+    :param context: RunContext supplying the fields the renderers use; only
+                    the fields the rendered templates reference are resolved
+    :raises MarkerNotFoundError: if any marker pair is not found (nothing is
+             fetched in that case)
+    """
+    regions, rendered = _render_regions(content, path, sections, context)
+    rendered = iter(rendered)
+    return replace_marker_regions(content, regions, lambda marker: next(rendered))
+
+
+def _render_regions(content: str, path: Path, sections: dict, context: RunContext):
+    """Return the marker regions of `content` (text or bytes) and the rendered text of each."""
+    with metrics.phase("match"):
+        regions, missing = find_marker_regions(content, list(sections))
+    if missing:
+        raise MarkerNotFoundError.for_markers(missing, path)
+    metrics.incr("markers_matched", len(regions))
+    return regions, _render_found(content, regions, sections, context)
+
+
+def _render_found(content: str, regions: list, sections: dict, context: RunContext) -> list:
+    """
+    Render the `regions` of `content` (text or bytes). Sections that their
+    refresh policy reports as fresh keep their current text, and only the
+    fields of the other sections are resolved.
+    """
+    binary = not isinstance(content, str)
+    token = _marker_token_pattern(tuple(sections), binary)
+    starts = [token.match(content, start).group(0) for _, start, _ in regions]
+    if binary:
+        starts = [start.decode("utf-8") for start in starts]
+    names = [
+        _embedded_template(_marker_token_pattern((marker,)).match(start).group(3)) or sections[marker]
+        for (marker, _, _), start in zip(regions, starts)
+    ]
+    with metrics.phase("resolve"):
+        plans = [
+            _refresh_plan(name, marker, start, context)
+            for name, (marker, _, _), start in zip(names, regions, starts)
+        ]
+        fields = context.resolve(
+            {f for name, (fresh, _) in zip(names, plans) if not fresh for f in _renderer(name)[0]}
+        )
+    newline = _newline_style(content)
+    rendered = []
+    with metrics.phase("render"):
+        for name, (marker, start, end), (fresh, start_token) in zip(names, regions, plans):
+            if fresh:
+                section = content[start:end]
+                rendered.append(bytes(section).decode("utf-8") if binary else section)
+            else:
+                rendered.append(_render_region(name, marker, fields, start_token, newline))
+    metrics.incr("sections_fresh", sum(fresh for fresh, _ in plans))
+    return rendered
+
+
+@dataclass
+class SectionChange:
+    """
+    A marker section that a dry run would rewrite. `old_line` and `new_line`
+    are the 1-based lines its START comment is on before and after the update.
+    """
+
+    marker: str
+    old_line: int
+    new_line: int
+    old: str
+    new: str
+
+    def hunks(self, context: int = 1) -> list:
+        """Unified diff hunks (lines) between the old and new section text."""
+        # Only dry runs diff anything; keep difflib off the startup path
+        import difflib
+
+        # Hunks always end lines in "\n", whatever the file uses (e.g. CRLF)
+        old = self.old.splitlines()
+        new = self.new.splitlines()
+        lines = []
+        for group in difflib.SequenceMatcher(None, old, new).get_grouped_opcodes(context):
+            i1, i2, j1, j2 = group[0][1], group[-1][2], group[0][3], group[-1][4]
+            lines.append(
+                f"@@ -{_hunk_range(self.old_line - 1 + i1, i2 - i1)} "
+                f"+{_hunk_range(self.new_line - 1 + j1, j2 - j1)} @@ {self.marker}\n"
+            )
+            for tag, a1, a2, b1, b2 in group:
+                if tag == "equal":
+                    lines.extend(f" {line}\n" for line in old[a1:a2])
+                    continue
+                lines.extend(f"-{line}\n" for line in old[a1:a2])
+                lines.extend(f"+{line}\n" for line in new[b1:b2])
+        return lines
+
+
+def _hunk_range(start: int, length: int) -> str:
+    # An empty range names the line before it, as in `diff -u`
+    if length == 1:
+        return str(start + 1)
+    if not length:
+        return f"{start},0"
+    return f"{start + 1},{length}"
+
+
+def _section_changes(content: str, regions: list, rendered: list) -> list:
+    """SectionChanges for the regions of `content` (text or bytes) whose rendered text differs."""
+    binary = not isinstance(content, str)
+    newline = b"\n" if binary else "\n"
+    changes = []
+    line = 1
+    pos = 0
+    shift = 0
+    for (marker, start, end), new in zip(regions, rendered):
+        line += content.count(newline, pos, start)
+        pos = start
+        old = content[start:end]
+        if binary:
+            old = old.decode("utf-8")
+        if new != old:
+            changes.append(SectionChange(marker, line, line + shift, old, new))
+            shift += new.count("\n") - old.count("\n")
+    return changes
+
+
+def load_sections(path) -> dict:
+    """
+    Read a JSON section config mapping marker prefixes to a renderer name or
+    a template, e.g. {"sections": {"AUTO_SECTION": {"template": "- Built {now}"},
+    "CHANGES": "commit"}}. Templates are compiled (and validated) up front.
+
+    :raises ValueError: if the file is not a valid section config
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    sections = {}
+    for marker, spec in (config.get("sections") or {}).items():
+        if isinstance(spec, dict):
+            if "template" not in spec:
+                raise ValueError(f"{path}: section '{marker}' needs a renderer name or a template")
+            spec = TEMPLATE_PREFIX + spec["template"]
+        _renderer(spec)
+        sections[marker] = spec
+    if not sections:
+        raise ValueError(f"{path}: no sections configured")
+    return sections
+
+
+def _status_run(status: str, markers: list, now: str = None):
+    values = {"status": status}
+    if now:
+        values["now"] = now
+    return {m: "status" for m in markers}, RunContext(["clock"], values)
+
+
+def render_file(
+    content: str, status: str, markers: list, path: Path, now: str = None
+) -> str:
+    """
+    Return `content` with every marker section replaced, without touching the disk.
+    `content` may be text or UTF-8 bytes; the result has the same type.
+
+    :raises MarkerNotFoundError: if any marker pair is not found
+    """
+    sections, context = _status_run(status, markers, now)
+    return render_sections(content, path, sections, context)
+
+
+BACKUP_MODES = ("off", "copy", "hardlink")
+
+
+def _temp_file(path: Path):
+    return tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    )
+
+
+def _fsync_dir(directory: Path):
+    # Directory fsync makes the rename itself durable; not supported everywhere
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _backup(path: Path, mode: str):
+    """Preserve the current contents of `path` as <filename>.bak before replacing it."""
+    if mode not in BACKUP_MODES:
+        raise ValueError(f"Unknown backup mode '{mode}' (expected one of {BACKUP_MODES})")
+    if mode == "off":
+        return
+    backup_path = path.with_suffix(path.suffix + ".bak")
+    if mode == "hardlink":
+        # The link keeps the old inode alive once os.replace swaps in the new one
+        try:
+            if backup_path.exists():
+                backup_path.unlink()
+            os.link(path, backup_path)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(path, backup_path)
+
+
+def _write_temp(path: Path, data: bytes, sync: bool = True) -> str:
+    """Write `data` to a new temp file next to `path` and return its name."""
+    tmp = _temp_file(path)
+    try:
+        with tmp:
+            tmp.write(data)
+            if sync:
+                tmp.flush()
+                os.fsync(tmp.fileno())
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    return tmp.name
+
+
+def replace_atomic(path, data):
+    """
+    Write `data` (text or bytes) to `path` through a synced temp file and
+    `os.replace`, creating its directory if needed. This is how the tool's
+    own state files (manifest, journal, cache, snapshot, metrics) are saved;
+    unlike `write_atomic` the old contents are neither compared nor backed up.
+
+    :param path: Path of the file to write
+    :param data: New contents, as text (written as UTF-8) or bytes
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_name = _write_temp(path, data.encode("utf-8") if isinstance(data, str) else data)
+    try:
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    _fsync_dir(path.parent)
+
+
+def _publish(tmp_name: str, path: Path, backup: str):
+    """Atomically move a fully written and synced temp file over `path`."""
+    shutil.copymode(path, tmp_name)
+    _backup(path, backup)
+    os.replace(tmp_name, path)
+    _fsync_dir(path.parent)
+
+
+def write_atomic(
+    path: Path, data: str, original: str = None, backup: str = "copy", transaction=None
+) -> bool:
+    """
+    Replace the contents of `path` with `data` atomically.
+
+    If the file already holds `data` nothing is written at all, so unchanged runs
+    keep their mtime and inode. Otherwise the data is written to a temp file in
+    the same directory, fsynced and moved into place with `os.replace`, so
+    `path` always exists with either the old or the new contents.
+
+    :param path: Path to the file to replace
+    :param data: New file contents, as text or as bytes written verbatim
+    :param original: Current contents (text or bytes, like `data`) if the
+                     caller already read them
+    :param backup: "off", "copy" (copy the old file to <filename>.bak when it
+                   changes) or "hardlink" (hard-link the old inode instead)
+    :param transaction: Transaction to stage the temp file in; it is then
+                        synced and moved into place by `Transaction.commit`
+    :return: True if the file was written (or staged), False if it was
+             already up to date
+    """
+    binary = not isinstance(data, str)
+    if original is None:
+        original = path.read_bytes() if binary else path.read_text(encoding="utf-8")
+    if data == original:
+        return False
+
+    encoded = data if binary else data.encode("utf-8")
+    with metrics.phase("write"):
+        # A transaction syncs every staged file in one pass at commit
+        tmp_name = _write_temp(path, encoded, sync=transaction is None)
+        try:
+            if transaction is None:
+                _publish(tmp_name, path, backup)
+            else:
+                transaction.stage(tmp_name, path, backup)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+    metrics.incr("bytes_written", len(encoded))
+    return True
+
+
+JOURNAL_VERSION = 1
+DEFAULT_JOURNAL = ".update_readme.journal"
+
+
+def _fsync_file(name: str):
+    fd = os.open(name, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _preserve(path: Path, target: str):
+    """Keep the current contents of `path` as `target` (hard link, else copy)."""
+    if os.path.lexists(target):
+        os.unlink(target)
+    try:
+        os.link(path, target)
+    except OSError:
+        shutil.copy2(path, target)
+
+
+class Transaction:
+    """
+    Publishes a batch of rewritten files together.
+
+    Writers stage their temp files with `stage` instead of replacing their
+    targets. `commit` syncs every staged file in one concurrent pass, records
+    the batch in a journal, moves each file into place with `os.replace` and
+    syncs each directory once, then removes the journal. The original of each
+    file is kept (as a hard link, or a copy) until the journal is gone, so
+    `recover_transaction` can roll an interrupted commit forward or back.
+    Temp files staged before `commit` started are never visible under the
+    target names; `abort` deletes them.
+    """
+
+    def __init__(self, journal=DEFAULT_JOURNAL):
+        self.journal = Path(journal)
+        if self.journal.exists():
+            raise FileExistsError(
+                f"Unfinished transaction in {self.journal}; recover it first"
+            )
+        self._staged = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._staged)
+
+    def stage(self, tmp_name: str, path: Path, backup: str = "copy"):
+        """Take over the written (not yet synced) temp file for `path`."""
+        if backup not in BACKUP_MODES:
+            raise ValueError(f"Unknown backup mode '{backup}' (expected one of {BACKUP_MODES})")
+        path = Path(os.path.abspath(path))
+        entry = {
+            "path": str(path),
+            "tmp": os.path.abspath(tmp_name),
+            "undo": str(path.with_name(f".{path.name}.undo")),
+            "backup": backup,
+        }
+        with self._lock:
+            previous = self._staged.pop(entry["path"], None)
+            self._staged[entry["path"]] = entry
+        if previous is not None:
+            os.unlink(previous["tmp"])
+
+    def _write_journal(self, entries: list):
+        replace_atomic(self.journal, json.dumps({"version": JOURNAL_VERSION, "files": entries}))
+
+    def commit(self) -> int:
+        """
+        Publish every staged file; return how many were published.
+
+        If this raises after the journal was written, the journal is left in
+        place for `recover_transaction`.
+        """
+        with self._lock:
+            entries = list(self._staged.values())
+            self._staged = {}
+        if not entries:
+            return 0
+        directories = sorted({os.path.dirname(e["path"]) for e in entries})
+        try:
+            with metrics.phase("write"):
+                for e in entries:
+                    shutil.copymode(e["path"], e["tmp"])
+                    _preserve(e["path"], e["undo"])
+                with ThreadPoolExecutor(max_workers=min(32, len(entries))) as executor:
+                    list(executor.map(_fsync_file, [e["tmp"] for e in entries]))
+                for directory in directories:
+                    _fsync_dir(directory)
+                self._write_journal(entries)
+        except BaseException:
+            for e in entries:
+                for name in (e["tmp"], e["undo"]):
+                    if os.path.lexists(name):
+                        os.unlink(name)
+            raise
+
+        with metrics.phase("write"):
+            for e in entries:
+                _backup(Path(e["path"]), e["backup"])
+                os.replace(e["tmp"], e["path"])
+            for directory in directories:
+                _fsync_dir(directory)
+            _finish_journal(self.journal, entries)
+        return len(entries)
+
+    def abort(self):
+        """Discard every staged file; the targets are left untouched."""
+        with self._lock:
+            entries = list(self._staged.values())
+            self._staged = {}
+        for e in entries:
+            if os.path.exists(e["tmp"]):
+                os.unlink(e["tmp"])
+
+
+def _finish_journal(journal: Path, entries: list):
+    # The journal goes first: once it is gone the originals are no longer needed
+    journal.unlink()
+    _fsync_dir(journal.resolve().parent)
+    for e in entries:
+        if os.path.lexists(e["undo"]):
+            os.unlink(e["undo"])
+
+
+def recover_transaction(journal=DEFAULT_JOURNAL, direction: str = "forward") -> int:
+    """
+    Complete ("forward") or undo ("back") a commit interrupted after its
+    journal was written, then remove the journal.
+
+    :param journal: Journal path given to the interrupted Transaction
+    :param direction: "forward" publishes every file not yet replaced;
+                      "back" restores the original of every file already
+                      replaced and discards the rest
+    :return: Number of files changed by the recovery (0 without a journal)
+    :raises ValueError: for an unknown direction or an unreadable journal
+    """
+    if direction not in ("forward", "back"):
+        raise ValueError(f"Unknown recovery direction '{direction}' (expected forward or back)")
+    journal = Path(journal)
+    try:
+        data = json.loads(journal.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return 0
+    except ValueError as e:
+        raise ValueError(f"Corrupt transaction journal {journal}: {e}")
+    if not isinstance(data, dict) or data.get("version") != JOURNAL_VERSION:
+        raise ValueError(f"Unsupported transaction journal {journal}")
+
+    entries = data["files"]
+    changed = 0
+    for e in entries:
+        staged = os.path.exists(e["tmp"])
+        if direction == "forward" and staged:
+            os.replace(e["tmp"], e["path"])
+            changed += 1
+        elif direction == "back":
+            if staged:
+                os.unlink(e["tmp"])
+            elif os.path.exists(e["undo"]):
+                os.replace(e["undo"], e["path"])
+                changed += 1
+    for directory in sorted({os.path.dirname(e["path"]) for e in entries}):
+        _fsync_dir(directory)
+    _finish_journal(journal, entries)
+    return changed
+
+
+STREAM_CHUNK_SIZE = 1 << 20
+# Longest START comment (with its attributes) the streaming engine waits for
+# when its line spans chunks; an opening "<!--" further back is copied as text
+MAX_COMMENT_LENGTH = 1 << 16
+
+
+def stream_update_file(
+    path: Path,
+    markers: list,
+    render,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    backup: str = "copy",
+    transaction=None,
+    changes: list = None,
+) -> bool:
+    """
+    Rewrite the marker sections of `path` without loading the whole file.
+
+    The file is read in chunks of `chunk_size` bytes; everything outside a marker
+    section is copied straight to a temporary file next to `path`, and only the
+    section currently being replaced is held in memory, up to `SPOOL_SIZE` (or
+    the chunk size) beyond which it is spilled to a temporary file. A START
+    comment on a line longer than a chunk is only waited for up to
+    `MAX_COMMENT_LENGTH` bytes. Peak memory is therefore bounded by a few
+    chunks, however large the file, its lines or its sections. An
+    unterminated START is only discovered at the end of the file, so the text
+    after it is spooled and rescanned once for every marker left without an
+    END.
+
+    :param path: Path to the file to update
+    :param markers: List of marker prefixes
+    :param render: Callable taking a marker prefix and the text of its START
+                   comment, and returning the full replacement text including
+                   the START and END comments. It is only called once a
+                   complete section has been found; its lines are ended like
+                   the file's first line (CRLF or LF). It may return None
+                   to leave the section as it is.
+    :param chunk_size: Number of bytes to read at a time
+    :param backup: Backup mode, see `write_atomic`
+    :param transaction: Transaction to stage the rewritten file in, see
+                        `write_atomic`
+    :param changes: Dry run: append a SectionChange to this list for every
+                    section that would change, and write nothing at all
+    :return: True if the file was rewritten, False if every section already
+             had the rendered content (the file is then left untouched)
+    :raises MarkerNotFoundError: if any marker pair is not found; the file is
+             left untouched
+    """
+    if not markers:
+        return False
+
+    token = _marker_token_pattern(tuple(markers), binary=True)
+    # A plain token split across two chunks is at most this long minus one
+    # byte; tokens with attributes end by their line's end at the latest
+    max_token = max(len(f"<!-- {m}_START -->".encode("utf-8")) for m in markers)
+    max_comment = max(max_token, MAX_COMMENT_LENGTH)
+    found = set()
+    # Markers with no END left in the file; their STARTs no longer open sections
+    dead = set()
+    changed = False
+    matched = 0
+    # Lines added so far by the changed sections (dry run)
+    shift = 0
+
+    tmp = _temp_file(path) if changes is None else _LineCounter()
+    try:
+        with open(path, "rb") as src, tmp as dst:
+            line_ending = _stream_newline(src, chunk_size)
+            source = iter(lambda: src.read(chunk_size), b"")
+            while True:
+                open_marker = None
+                section = None
+                start_len = 0
+                carry = b""
+                while True:
+                    chunk = next(source, b"")
+                    eof = not chunk
+                    buf = carry + chunk
+                    # Tokens starting before `limit` are guaranteed to be complete
+                    if eof:
+                        limit = len(buf)
+                    else:
+                        newline = buf.rfind(b"\n")
+                        if newline >= 0:
+                            limit = newline + 1
+                        else:
+                            limit = max(0, len(buf) - (max_token - 1))
+                            # A comment opened after the last "-->" may be a START
+                            # whose attributes continue in the next chunk, unless
+                            # it is already longer than any START comment waited for
+                            since = max(0, buf.rfind(b"-->"), len(buf) - max_comment)
+                            opening = buf.find(b"<!--", since)
+                            if opening >= 0:
+                                limit = min(limit, opening)
+                    pos = 0
+                    # Never cut through a token, even one that is not acted on
+                    scanned = 0
+
+                    for match in token.finditer(buf):
+                        if match.start() >= limit:
+                            break
+                        scanned = match.end()
+                        marker = match.group(1).decode("utf-8")
+                        kind = match.group(2)
+                        if open_marker is None:
+                            if kind == b"START" and marker not in dead:
+                                dst.write(buf[pos:match.start()])
+                                section = _SectionSpool(max(chunk_size, SPOOL_SIZE))
+                                section.write(buf[match.start():match.end()])
+                                start_len = match.end() - match.start()
+                                open_marker = marker
+                                pos = match.end()
+                        elif marker == open_marker and kind == b"END":
+                            section.write(buf[pos:match.end()])
+                            start_token = section.read(0, start_len).decode("utf-8")
+                            text = render(marker, start_token)
+                            if text is None:
+                                section.copy_to(dst)
+                            else:
+                                new_section = _with_newlines(text, line_ending).encode("utf-8")
+                                if not section.equals(new_section):
+                                    if changes is not None:
+                                        old, new = section.read().decode("utf-8"), new_section.decode("utf-8")
+                                        line = dst.lines + 1
+                                        changes.append(SectionChange(marker, line - shift, line, old, new))
+                                        shift += new.count("\n") - old.count("\n")
+                                    changed = True
+                                dst.write(new_section)
+                            section.close()
+                            found.add(marker)
+                            matched += 1
+                            open_marker = None
+                            section = None
+                            pos = match.end()
+
+                    cut = max(pos, limit, scanned)
+                    if open_marker is None:
+                        dst.write(buf[pos:cut])
+                    else:
+                        section.write(buf[pos:cut])
+                    carry = buf[cut:]
+                    if eof:
+                        break
+
+                if open_marker is None:
+                    break
+                # An unterminated START is left as it was; rescan what followed it
+                dead.add(open_marker)
+                dst.write(section.read(0, start_len))
+                source = section.drain(start_len, chunk_size)
+
+            dst.flush()
+            if transaction is None and changes is None:
+                os.fsync(dst.fileno())
+            metrics.incr("bytes_read", src.tell())
+
+        missing = [m for m in dict.fromkeys(markers) if m not in found]
+        if missing:
+            raise MarkerNotFoundError.for_markers(missing, path)
+        metrics.incr("markers_matched", matched)
+        if changes is not None:
+            return changed
+        if not changed:
+            os.unlink(tmp.name)
+            return False
+
+        metrics.incr("bytes_written", os.path.getsize(tmp.name))
+        if transaction is not None:
+            transaction.stage(tmp.name, path, backup)
+            return True
+        with metrics.phase("write"):
+            _publish(tmp.name, path, backup)
+        return True
+    except BaseException:
+        if changes is None and os.path.exists(tmp.name):
+            os.unlink(tmp.name)
+        raise
+
+
+def _stream_newline(src, chunk_size: int) -> str:
+    """Newline style of the open file `src`, read up to its first line ending (then rewound)."""
+    last = b""
+    for chunk in iter(lambda: src.read(chunk_size), b""):
+        at = chunk.find(b"\n")
+        if at >= 0:
+            src.seek(0)
+            return "\r\n" if (chunk[at - 1:at] if at else last) == b"\r" else "\n"
+        last = chunk[-1:]
+    src.seek(0)
+    return "\n"
+
+
+# Open sections larger than this (or than the chunk size) are spilled to disk
+SPOOL_SIZE = 1 << 16
+
+
+class _SectionSpool:
+    """
+    The bytes of the section being streamed: held in memory while small and
+    spilled to a temporary file beyond `max_size`, so neither a huge section
+    nor a START without an END makes memory grow with the file.
+    """
+
+    def __init__(self, max_size: int):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.size = 0
+
+    def write(self, data):
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(data)
+        self.size += len(data)
+
+    def read(self, start: int = 0, length: int = -1) -> bytes:
+        self._file.seek(start)
+        return self._file.read(length)
+
+    def _chunks(self, start: int, chunk_size: int):
+        offset = start
+        while offset < self.size:
+            chunk = self.read(offset, chunk_size)
+            offset += len(chunk)
+            yield chunk
+
+    def equals(self, data: bytes) -> bool:
+        if len(data) != self.size:
+            return False
+        offset = 0
+        for chunk in self._chunks(0, STREAM_CHUNK_SIZE):
+            if data[offset:offset + len(chunk)] != chunk:
+                return False
+            offset += len(chunk)
+        return True
+
+    def copy_to(self, dst):
+        for chunk in self._chunks(0, STREAM_CHUNK_SIZE):
+            dst.write(chunk)
+
+    def drain(self, start: int, chunk_size: int):
+        """Yield the bytes from `start` in chunks, then close the spool."""
+        try:
+            yield from self._chunks(start, chunk_size)
+        finally:
+            self.close()
+
+    def close(self):
+        self._file.close()
+
+
+class _LineCounter:
+    """Output of a streaming dry run: counts the lines written and drops them."""
+
+    def __init__(self):
+        self.lines = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def write(self, data):
+        self.lines += data.count(b"\n")
+
+    def flush(self):
+        pass
+
+
+class MarkerIndex:
+    """
+    Byte offsets of the marker regions of files that are updated repeatedly
+    (e.g. re-stamped by a long-running process), so later updates skip the scan.
+
+    An entry is trusted while the file's size and mtime are unchanged and the
+    SHA-256 of every indexed region still matches the bytes at its offsets;
+    otherwise the file is rescanned. Entries live in memory only.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    @staticmethod
+    def _digest(mapped, regions: list) -> list:
+        return [hashlib.sha256(mapped[start:end]).hexdigest() for _, start, end in regions]
+
+    def lookup(self, path: Path, markers: list, st: os.stat_result, mapped):
+        """Return the indexed regions of `path` if still valid, else None."""
+        entry = self._entries.get(os.path.abspath(path))
+        if (
+            entry is None
+            or entry["markers"] != sorted(markers)
+            or entry["size"] != st.st_size
+            or entry["mtime_ns"] != st.st_mtime_ns
+            or entry["digests"] != self._digest(mapped, entry["regions"])
+        ):
+            return None
+        return entry["regions"]
+
+    def store(self, path: Path, markers: list, st: os.stat_result, mapped, regions: list):
+        self._entries[os.path.abspath(path)] = {
+            "markers": sorted(markers),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "regions": regions,
+            "digests": self._digest(mapped, regions),
+        }
+
+    def forget(self, path: Path):
+        self._entries.pop(os.path.abspath(path), None)
+
+
+def _update_in_place(
+    path: Path, sections: dict, context: RunContext, index: MarkerIndex, backup: str
+):
+    """
+    Update `path` using (and refreshing) its `index` entry. When every changed
+    section keeps its byte length, only those bytes are rewritten through mmap;
+    otherwise None is returned and the caller rewrites the whole file.
+    """
+    markers = list(sections)
+    with open(path, "r+b") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            raise MarkerNotFoundError.for_markers(markers, path)
+        with mmap.mmap(f.fileno(), 0) as mapped:
+            regions = index.lookup(path, markers, st, mapped)
+            if regions is None:
+                with metrics.phase("match"):
+                    regions, missing = find_marker_regions(mapped, markers)
+                if missing:
+                    index.forget(path)
+                    raise MarkerNotFoundError.for_markers(missing, path)
+            else:
+                metrics.incr("index_hits")
+            metrics.incr("markers_matched", len(regions))
+
+            changes = []
+            rendered = _render_found(mapped, regions, sections, context)
+            for (marker, start, end), section in zip(regions, rendered):
+                data = section.encode("utf-8")
+                if mapped[start:end] != data:
+                    changes.append((start, end, data))
+            # A hard-linked backup would share the inode being modified
+            if any(len(data) != end - start for start, end, data in changes) or (
+                changes and backup == "hardlink"
+            ):
+                index.forget(path)
+                return None
+
+            if changes:
+                with metrics.phase("write"):
+                    _backup(path, backup)
+                    for start, end, data in changes:
+                        mapped[start:end] = data
+                    mapped.flush()
+                metrics.incr("bytes_written", sum(len(data) for _, _, data in changes))
+            index.store(path, markers, os.fstat(f.fileno()), mapped, regions)
+            return bool(changes)
+
+
+def update_path(
+    path: Path,
+    sections: dict,
+    context: RunContext,
+    stream: bool = False,
+    backup: str = "copy",
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    index: MarkerIndex = None,
+    transaction=None,
+    changes: list = None,
+) -> bool:
+    """
+    Render every section of `path` through the pipeline and write the result.
+
+    :param sections: Mapping of marker prefix to renderer name
+    :param context: RunContext shared by all files of the run
+    :param stream: Rewrite the file in bounded memory with `stream_update_file`
+    :param backup: Backup mode, see `write_atomic`
+    :param index: MarkerIndex of previously seen files. Sections are then found
+                  from the index, and rewritten in place when their length is
+                  unchanged (this is not atomic); other changes still replace
+                  the whole file atomically. Ignored with `stream` or
+                  `transaction`.
+    :param transaction: Transaction to stage the new contents in instead of
+                        replacing the file right away, see `Transaction`
+    :param changes: Dry run: append a SectionChange to this list for every
+                    section that would change and write nothing (`backup`,
+                    `index` and `transaction` are then ignored)
+    :return: True if the file was written (or staged, or would be written
+             in a dry run), False if it was already up to date
+    :raises MarkerNotFoundError: if any marker pair is not found
+    """
+    if changes is not None:
+        index = transaction = None
+    if index is not None and not stream and transaction is None:
+        changed = _update_in_place(path, sections, context, index, backup)
+        if changed is not None:
+            return changed
+
+    if stream:
+        def render(marker, start_token):
+            attrs = _marker_token_pattern((marker,)).match(start_token).group(3)
+            name = _embedded_template(attrs) or sections[marker]
+            fresh, start_token = _refresh_plan(name, marker, start_token, context)
+            if fresh:
+                metrics.incr("sections_fresh")
+                return None
+            fields = context.resolve(_renderer(name)[0])
+            return _render_region(name, marker, fields, start_token)
+
+        with metrics.phase("stream"):
+            return stream_update_file(
+                path,
+                list(sections),
+                render,
+                chunk_size,
+                backup=backup,
+                transaction=transaction,
+                changes=changes,
+            )
+
+    with metrics.phase("read"):
+        content = path.read_bytes()
+    metrics.incr("bytes_read", len(content))
+    if changes is not None:
+        found = _section_changes(content, *_render_regions(content, path, sections, context))
+        changes.extend(found)
+        return bool(found)
+    updated = render_sections(content, path, sections, context)
+    return write_atomic(path, updated, original=content, backup=backup, transaction=transaction)
+
+
+def update_file_streaming(
+    path: Path,
+    status: str = "✅",
+    markers: list = ["AUTO_SECTION"],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    now: str = None,
+    backup: str = "copy",
+) -> bool:
+    """
+    Streaming counterpart of `update_file` for files too large to hold in memory.
+    Returns True if the file was rewritten, False if it was already up to date.
+
+    :raises MarkerNotFoundError: if any marker pair is not found
+    """
+    sections, context = _status_run(status, markers, now)
+    return update_path(path, sections, context, stream=True, backup=backup, chunk_size=chunk_size)
+
+
 def update_file(
-    path: Path, status: str = "✅", markers: list = ["AUTO_SECTION"]
+    path: Path,
+    status: str = "✅",
+    markers: list = ["AUTO_SECTION"],
+    backup: str = "copy",
 ) -> str:
     """
     Read the file at `path`, replace each marker section with a new timestamp and status,
-    back up the original file as <filename>.bak, then overwrite the original file.
+    back up the original file as <filename>.bak, then atomically replace the original file.
     Returns the updated content as a string.
 
+    All marker sections are located in a single pass and every missing marker is
+    reported together before anything is written. If nothing changed, the file
+    is not touched at all. The file is processed as bytes: only the new sections
+    are encoded, and its BOM and line endings (CRLF or LF) are kept.
+
     :param path: Path to the file to update
     :param status: Deployment status string to insert (e.g., "✅", "❌")
     :param markers: List of marker prefixes (e.g., ["AUTO_SECTION", "ANOTHER_MARKER"])
+    :param backup: "off", "copy" or "hardlink" (see `write_atomic`)
     :raises MarkerNotFoundError: if any marker pair is not found
     :raises Exception: for other I/O or regex errors
     """
-    content = path.read_text(encoding="utf-8")
-    updated = content
-
-    for marker in markers:
-        start_marker = f"<!-- {marker}_START -->"
-        end_marker = f"<!-- {marker}_END -->"
-        # Escape markers to avoid regex injection
-        pattern = rf"({re.escape(start_marker)})(.*?)({re.escape(end_marker)})"
-
-        # Check if this marker exists
-        if not re.search(pattern, updated, flags=re.DOTALL):
-            raise MarkerNotFoundError(f"No markers found for '{marker}' in {path}")
-
-        # Build replacement snippet
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        new_section = (
-            f"{start_marker}\n"
-            f"- Last updated: {now}\n"
-            f"- Deployment status: {status}\n"
-            f"{end_marker}"
-        )
+    content = path.read_bytes()
+    updated = render_file(content, status, markers, path)
+    write_atomic(path, updated, original=content, backup=backup)
+    return updated.decode("utf-8")
 
-        # Perform replacement (DOTALL so '.' matches newlines)
-        updated = re.sub(pattern, new_section, updated, flags=re.DOTALL)
 
-    # Backup original file
-    backup_path = path.with_suffix(path.suffix + ".bak")
-    path.rename(backup_path)
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+MISSING = "missing"
+ERROR = "error"
+
+
+@dataclass
+class FileResult:
+    """Outcome of updating one file in a batch run."""
+
+    path: Path
+    outcome: str
+    missing: list = field(default_factory=list)
+    error: str = ""
+    # SectionChanges found by a dry run
+    changes: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome in (UPDATED, UNCHANGED)
+
+
+CHANGE_FORMATS = ("unified", "json")
+
+
+def format_changes(results: list, fmt: str = "unified") -> str:
+    """
+    Render the `changes` of dry-run FileResults as one unified diff with a
+    hunk per changed section, or as a JSON change set.
+    """
+    if fmt == "json":
+        files = [
+            {
+                "path": str(r.path),
+                "outcome": r.outcome,
+                "error": r.error,
+                "changes": [asdict(c) for c in r.changes],
+            }
+            for r in results
+        ]
+        return json.dumps({"files": files}, ensure_ascii=False, indent=2) + "\n"
+    lines = []
+    for result in results:
+        if not result.changes:
+            continue
+        lines.append(f"--- a/{result.path.as_posix()}\n")
+        lines.append(f"+++ b/{result.path.as_posix()}\n")
+        for change in result.changes:
+            lines.extend(change.hunks())
+    return "".join(lines)
+
+
+def expand_paths(patterns: list) -> list:
+    """
+    Expand glob patterns (``**`` is recursive) and plain paths into a list of
+    unique paths, keeping the order in which they were first given.
+    """
+    paths = {}
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for match in matches:
+            paths.setdefault(Path(match), None)
+    return list(paths)
+
+
+MANIFEST_VERSION = 1
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    On-disk record of the last incremental run: for each file its size,
+    mtime, content hash, marker set and inputs fingerprint.
+
+    A file is fresh when its markers and inputs are unchanged and either its
+    size and mtime still match (checked with a single stat, without reading
+    the file) or, if only the stat changed, its content hash still matches.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries = self._load()
+        self._dirty = False
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("files", {})
+
+    @staticmethod
+    def key(path: Path) -> str:
+        return os.path.abspath(path)
+
+    def is_fresh(self, path: Path, markers: list, inputs: str) -> bool:
+        entry = self._entries.get(self.key(path))
+        if entry is None or entry["markers"] != sorted(markers) or entry["inputs"] != inputs:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        if st.st_size != entry["size"] or _hash_file(path) != entry["hash"]:
+            return False
+        # Touched but not modified: remember the new mtime
+        entry["mtime_ns"] = st.st_mtime_ns
+        self._dirty = True
+        return True
+
+    def record(self, path: Path, markers: list, inputs: str):
+        st = os.stat(path)
+        self._entries[self.key(path)] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "hash": _hash_file(path),
+            "markers": sorted(markers),
+            "inputs": inputs,
+        }
+        self._dirty = True
+
+    def save(self):
+        """Write the manifest back to disk (atomically) if it changed."""
+        if not self._dirty:
+            return
+        replace_atomic(self.path, json.dumps({"version": MANIFEST_VERSION, "files": self._entries}))
+        self._dirty = False
+
+
+def _update_one(
+    path: Path,
+    sections: dict,
+    context: RunContext,
+    stream: bool = False,
+    backup: str = "copy",
+    index: MarkerIndex = None,
+    transaction: Transaction = None,
+    dry_run: bool = False,
+) -> FileResult:
+    changes = [] if dry_run else None
+    try:
+        if update_path(
+            path,
+            sections,
+            context,
+            stream=stream,
+            backup=backup,
+            index=index,
+            transaction=transaction,
+            changes=changes,
+        ):
+            return FileResult(path, UPDATED, changes=changes or [])
+        return FileResult(path, UNCHANGED)
+    except MarkerNotFoundError as e:
+        return FileResult(path, MISSING, missing=e.markers, error=str(e))
+    except Exception as e:
+        return FileResult(path, ERROR, error=str(e))
+
+
+def update_files(
+    paths: list,
+    status: str = "✅",
+    markers: list = ["AUTO_SECTION"],
+    workers: int = None,
+    processes: bool = False,
+    stream: bool = False,
+    backup: str = "copy",
+    sections: dict = None,
+    context: RunContext = None,
+    manifest: Manifest = None,
+    index: MarkerIndex = None,
+    transaction: Transaction = None,
+    dry_run: bool = False,
+) -> list:
+    """
+    Update many files in one process, fanning out across a worker pool.
+    All files share one RunContext, so the timestamp and any fetched data are
+    computed once per run. Failures never abort the batch; they are reported
+    per file instead.
+
+    :param paths: Paths of the files to update
+    :param status: Deployment status string to insert
+    :param markers: List of marker prefixes
+    :param workers: Maximum number of workers (default: the executor's default)
+    :param processes: Use a process pool instead of a thread pool
+    :param stream: Rewrite files in constant memory with `update_file_streaming`
+    :param backup: Backup mode, see `write_atomic`
+    :param sections: Mapping of marker prefix to renderer name; overrides
+                     `markers` (default: the "status" renderer for each marker)
+    :param context: RunContext to use (default: clock plus `status`)
+    :param manifest: Manifest for incremental runs; files it reports as fresh
+                     are skipped (reported UNCHANGED) and every file processed
+                     successfully is recorded. The caller saves it.
+    :param index: MarkerIndex shared across runs, see `update_path` (with
+                  `processes`, workers use a copy and their updates are lost)
+    :param transaction: Stage every rewritten file in this Transaction and
+                        commit it once all files succeeded; if any file
+                        failed, it is aborted and nothing is written (the
+                        files that would have changed are reported as
+                        errors). Implies threads rather than processes.
+    :param dry_run: Render every file without writing anything: UPDATED
+                    then means the file would be rewritten, and its result
+                    lists the sections that would change in `changes` (see
+                    `format_changes`). `transaction` is ignored and
+                    `manifest` is consulted but not updated.
+    :return: List of FileResult, in the same order as `paths`
+    """
+    paths = [Path(p) for p in paths]
+    if sections is None or context is None:
+        default_sections, default_context = _status_run(status, markers)
+        sections = sections or default_sections
+        context = context or default_context
+
+    results = {}
+    inputs = None
+    if manifest is not None:
+        try:
+            inputs = context.fingerprint(sections)
+        except CommitInfoError:
+            # The context keeps the failure; every file reports it as an error below
+            pass
+        for p in paths:
+            if inputs is not None and manifest.is_fresh(p, list(sections), inputs):
+                results[p] = FileResult(p, UNCHANGED)
+    stale = [p for p in paths if p not in results]
+
+    if dry_run:
+        transaction = None
+    if transaction is not None:
+        # Staged temp files are tracked in this process
+        processes = False
+    parallel = len(stale) > 1 and workers != 1
+    if parallel and processes:
+        # Workers get a pickled copy of the context, so resolve everything up front
+        try:
+            context.resolve(_section_fields(sections, sections))
+        except CommitInfoError:
+            # Failures are not pickled; threads report the kept one per file
+            processes = False
+
+    work = partial(
+        _update_one,
+        sections=sections,
+        context=context,
+        stream=stream,
+        backup=backup,
+        index=index,
+        transaction=transaction,
+        dry_run=dry_run,
+    )
+    if not parallel:
+        processed = [work(p) for p in stale]
+    else:
+        if processes:
+            # multiprocessing is only loaded when a process pool is requested
+            from concurrent.futures import ProcessPoolExecutor as executor_cls
+        else:
+            executor_cls = ThreadPoolExecutor
+        with executor_cls(max_workers=workers) as executor:
+            processed = list(executor.map(work, stale))
+
+    if transaction is not None:
+        if all(r.ok for r in processed):
+            transaction.commit()
+        else:
+            transaction.abort()
+            processed = [
+                FileResult(r.path, ERROR, error="not written: the transaction was aborted")
+                if r.outcome == UPDATED
+                else r
+                for r in processed
+            ]
+
+    metrics.incr("files_skipped", len(results))
+    for result in processed:
+        metrics.incr(f"files_{result.outcome}")
+        results[result.path] = result
+        if manifest is not None and inputs is not None and result.ok and not dry_run:
+            manifest.record(result.path, list(sections), inputs)
+    return [results[p] for p in paths]
+
+
+def run_single(
+    path: Path,
+    sections: dict,
+    context: RunContext,
+    stream: bool = False,
+    backup: str = "copy",
+    dry_run: bool = False,
+    diff_format: str = "unified",
+) -> bool:
+    """
+    Update one file for a single-file CLI, reporting on stdout. A dry run
+    prints the changes in `diff_format`; a file whose sections are all fresh
+    is reported as already up to date.
+
+    :param path: Path of the file to update
+    :param sections: Mapping of marker prefix to renderer name
+    :param context: RunContext the sections are rendered from
+    :param stream: Rewrite the file with `update_file_streaming`
+    :param backup: Backup mode, see `write_atomic`
+    :param dry_run: Print the changes instead of writing anything
+    :param diff_format: One of CHANGE_FORMATS, see `format_changes`
+    :return: True if the file was rewritten; the caller reports what changed
+    """
+    changes = [] if dry_run else None
+    try:
+        changed = update_path(path, sections, context, stream=stream, backup=backup, changes=changes)
+    except MarkerNotFoundError:
+        print(f"Warning: No {', '.join(sections)} markers found.")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        # An unreadable file, or an embedded template that is malformed or uses an unknown field
+        print(f"Error: {e}")
+        sys.exit(1)
+    if dry_run:
+        result = FileResult(path, UPDATED if changed else UNCHANGED, changes=changes)
+        print(format_changes([result], diff_format), end="")
+        return False
+    if not changed:
+        # Fresh sections are kept without fetching; do not fetch just to report
+        print(f"{Path(path).name} is already up to date.")
+    return changed
+
+
+def batch_exit_code(results: list) -> int:
+    """Return 0 if every file was updated or already up to date, 1 otherwise."""
+    return 0 if all(r.ok for r in results) else 1
+
 
-    # Write updated content back
-    path.write_text(updated, encoding="utf-8")
-    return updated
+def _read_file_list(source: str) -> list:
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    with stream:
+        return [line.strip() for line in stream if line.strip()]
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="Auto-update sections in README.md with timestamp and status"
     )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="Files or glob patterns to update (default: README.md)",
+    )
     parser.add_argument(
         "--status",
         default="✅",
@@ -74,25 +1825,231 @@ def main():
         default="AUTO_SECTION",
         help="Comma-separated list of marker prefixes (e.g., 'AUTO_SECTION,OTHER_MARKER')",
     )
+    parser.add_argument(
+        "--files-from",
+        metavar="FILE",
+        help="Read additional paths, one per line, from FILE ('-' for stdin)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of parallel workers for batch updates",
+    )
+    parser.add_argument(
+        "--processes",
+        action="store_true",
+        help="Use worker processes instead of threads",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Rewrite files in chunks with bounded memory (for very large files)",
+    )
+    parser.add_argument(
+        "--backup",
+        choices=BACKUP_MODES,
+        default="copy",
+        help="Keep the previous contents as <file>.bak: off, copy or hardlink (default: copy)",
+    )
+    parser.add_argument(
+        "--config",
+        metavar="PATH",
+        help="JSON file mapping markers to renderers or templates (overrides --markers)",
+    )
+    parser.add_argument(
+        "--source",
+        choices=("clock", "rest", "graphql", "git"),
+        default="clock",
+        help="Section contents: the status and current time (clock, default), "
+        "or the latest commit from the REST API, GraphQL API or local git history",
+    )
+    parser.add_argument(
+        "--fallback",
+        choices=("git",),
+        help="Source used when --source rest or graphql fails (e.g. GitHub is down)",
+    )
+    parser.add_argument(
+        "--env",
+        metavar="NAME",
+        action="append",
+        default=[],
+        help="Make environment variable NAME available to templates as {env_NAME} "
+        "(repeatable; no other variables are exposed)",
+    )
+    parser.add_argument("--owner", help="Repository owner (rest and graphql sources)")
+    parser.add_argument("--repo", help="Repository name (rest and graphql sources)")
+    parser.add_argument(
+        "--branch",
+        help="Branch to read commits from (default: main, or HEAD for the git source)",
+    )
+    parser.add_argument(
+        "--repo-path",
+        help="Path to the git checkout (git source, default: current directory)",
+    )
+    parser.add_argument(
+        "--snapshot",
+        metavar="PATH",
+        help="Use the commit info recorded in this snapshot file (rest and graphql sources)",
+    )
+    parser.add_argument(
+        "--emit-snapshot",
+        metavar="PATH",
+        help="Record the fetched commit info in this snapshot file (rest and graphql sources)",
+    )
+    parser.add_argument(
+        "--incremental",
+        metavar="MANIFEST",
+        help="Skip files unchanged since the run recorded in MANIFEST (created if missing)",
+    )
+    parser.add_argument(
+        "--transaction",
+        metavar="JOURNAL",
+        nargs="?",
+        const=DEFAULT_JOURNAL,
+        help="Publish all files together or not at all, journaling the commit in "
+        f"JOURNAL (default: {DEFAULT_JOURNAL})",
+    )
+    parser.add_argument(
+        "--recover",
+        choices=("forward", "back"),
+        help="Finish (forward) or undo (back) an interrupted --transaction run and exit",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the changes instead of writing anything (no backups, manifest or snapshot)",
+    )
+    parser.add_argument(
+        "--diff-format",
+        choices=CHANGE_FORMATS,
+        default="unified",
+        help="How --dry-run prints the changes: a unified diff per section or a JSON change set",
+    )
+    metrics.add_argument(parser)
     args = parser.parse_args()
+    with metrics.recording(args.metrics):
 
-    markers = [m.strip() for m in args.markers.split(",") if m.strip()]
-    readme_path = Path("README.md")
+        if args.recover:
+            journal = args.transaction or DEFAULT_JOURNAL
+            try:
+                count = recover_transaction(journal, args.recover)
+            except (OSError, ValueError) as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            print(f"Recovered {journal}: {count} file(s) rolled {args.recover}.")
+            sys.exit(0)
 
-    if not readme_path.is_file():
-        print(f"Error: {readme_path} does not exist.")
-        sys.exit(1)
+        markers = [m.strip() for m in args.markers.split(",") if m.strip()]
+        sections = context = None
+        if args.source in ("rest", "graphql") and not (args.owner and args.repo):
+            parser.error(f"--owner and --repo are required with --source {args.source}")
+        if args.config:
+            try:
+                sections = load_sections(args.config)
+            except (OSError, ValueError) as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            markers = list(sections)
+        elif args.source != "clock":
+            sections = {m: "commit" for m in markers}
+        if sections is not None or args.env:
+            values = {"status": args.status}
+            try:
+                values.update(env_values(args.env))
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            for name in ("owner", "repo", "branch", "repo_path"):
+                if getattr(args, name) is not None:
+                    values[name] = getattr(args, name)
+            if args.snapshot or args.emit_snapshot:
+                import update_readme_snapshot as snapshots
 
-    try:
-        update_file(readme_path, status=args.status, markers=markers)
-        print(f"README.md has been updated with markers {markers}.")
-    except MarkerNotFoundError as e:
-        print(f"Warning: {e}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Error: {e}")
-        sys.exit(1)
+                if args.snapshot:
+                    try:
+                        values["snapshot"] = snapshots.open_snapshot(args.snapshot)
+                    except snapshots.SnapshotError as e:
+                        print(f"Warning: ignoring snapshot: {e}")
+                if args.emit_snapshot:
+                    values["recorder"] = snapshots.SnapshotRecorder(args.emit_snapshot)
+            sources = [args.source] + ([args.fallback] if args.fallback else [])
+            context = RunContext(sources, values)
+        patterns = list(args.paths)
+        if args.files_from:
+            patterns.extend(_read_file_list(args.files_from))
+        if not patterns:
+            patterns = ["README.md"]
+
+        paths = expand_paths(patterns)
+        if not paths:
+            print("Error: no files matched.")
+            sys.exit(1)
+        missing_files = [p for p in paths if not p.is_file()]
+        for p in missing_files:
+            print(f"Error: {p} does not exist.")
+
+        manifest = Manifest(args.incremental) if args.incremental else None
+        transaction = None
+        if args.transaction and not args.dry_run:
+            try:
+                transaction = Transaction(args.transaction)
+            except FileExistsError as e:
+                print(f"Error: {e} with --recover forward or --recover back.")
+                sys.exit(1)
+        try:
+            results = update_files(
+                [p for p in paths if p.is_file()],
+                status=args.status,
+                markers=markers,
+                workers=args.workers,
+                processes=args.processes,
+                stream=args.stream,
+                backup=args.backup,
+                sections=sections,
+                context=context,
+                manifest=manifest,
+                transaction=transaction,
+                dry_run=args.dry_run,
+            )
+        except OSError as e:
+            if transaction is None:
+                print(f"Error: {e}")
+                sys.exit(1)
+            # Only a transaction commit can fail as a whole
+            print(f"Error: committing the transaction failed: {e}")
+            if transaction.journal.exists():
+                print(f"Run again with --recover forward or back to finish {transaction.journal}.")
+            sys.exit(1)
+        if args.dry_run:
+            output = format_changes(results, args.diff_format)
+            if output:
+                print(output, end="")
+        else:
+            if manifest is not None:
+                manifest.save()
+            if context is not None and "recorder" in context.values:
+                context.values["recorder"].save()
+        for result in results:
+            # A dry run's JSON change set already reports every outcome
+            if args.dry_run and (result.ok or args.diff_format == "json"):
+                continue
+            if result.outcome == UPDATED:
+                print(f"{result.path} has been updated with markers {markers}.")
+            elif result.outcome == UNCHANGED:
+                print(f"{result.path} is already up to date.")
+            elif result.outcome == MISSING:
+                print(f"Warning: {result.error}")
+            else:
+                print(f"Error: {result.path}: {result.error}")
+
+        if missing_files:
+            sys.exit(1)
+        sys.exit(batch_exit_code(results))
 
 
 if __name__ == "__main__":
+    # Provider modules import update_readme; share this module with them so
+    # their CommitInfoError is the one caught here
+    sys.modules.setdefault("update_readme", sys.modules[__name__])
     main()
@@ -0,0 +1,85 @@
+import json
+import time
+from pathlib import Path
+
+from update_readme import replace_atomic
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "update_readme" / "commits.json"
+CACHE_VERSION = 1
+
+
+class CommitInfoCache:
+    """
+    Small on-disk cache of commit info keyed by (owner, repo, branch).
+
+    Each entry stores the ETag of the GitHub response it was parsed from, so the
+    next run can send `If-None-Match` and reuse the cached result on a 304 (which
+    GitHub does not count against the rate limit). Entries older than `ttl`
+    seconds are dropped, and the least recently used entries are evicted once
+    more than `max_entries` are stored.
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 256,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = self._load()
+        self._dirty = False
+
+    @staticmethod
+    def key(owner: str, repo: str, branch: str) -> str:
+        return f"{owner}/{repo}@{branch}"
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return {}
+        now = time.time()
+        return {
+            key: entry
+            for key, entry in data.get("entries", {}).items()
+            if now - entry.get("stored_at", 0) <= self.ttl
+        }
+
+    def get(self, owner: str, repo: str, branch: str):
+        """Return the cached entry ({"etag", "result", ...}) or None."""
+        entry = self._entries.get(self.key(owner, repo, branch))
+        if entry is None or time.time() - entry["stored_at"] > self.ttl:
+            return None
+        return entry
+
+    def touch(self, owner: str, repo: str, branch: str):
+        """Mark an entry as revalidated (e.g. after a 304) so it stays fresh."""
+        entry = self._entries.get(self.key(owner, repo, branch))
+        if entry is not None:
+            entry["stored_at"] = entry["used_at"] = time.time()
+            self._dirty = True
+
+    def put(self, owner: str, repo: str, branch: str, etag: str, result):
+        now = time.time()
+        self._entries[self.key(owner, repo, branch)] = {
+            "etag": etag,
+            "result": list(result),
+            "stored_at": now,
+            "used_at": now,
+        }
+        if len(self._entries) > self.max_entries:
+            by_age = sorted(self._entries, key=lambda k: self._entries[k]["used_at"])
+            for key in by_age[: len(self._entries) - self.max_entries]:
+                del self._entries[key]
+        self._dirty = True
+
+    def save(self):
+        """Write the cache back to disk (atomically) if it changed."""
+        if not self._dirty:
+            return
+        replace_atomic(self.path, json.dumps({"version": CACHE_VERSION, "entries": self._entries}))
+        self._dirty = False
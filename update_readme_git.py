@@ -0,0 +1,157 @@
+import argparse
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from update_readme import (
+    BACKUP_MODES,
+    CHANGE_FORMATS,
+    COMMIT_FIELDS,
+    CommitInfoError,
+    RunContext,
+    run_single,
+)
+import update_readme_metrics as metrics
+
+CI_PREFIX = "ci: auto-update README"
+DEFAULT_MAX_COMMITS = 300
+# Commit timestamp, NUL, raw message, record separator
+LOG_FORMAT = "--format=%ct%x00%B%x1e"
+
+def _iter_commits(branch: str, repo_path, max_commits: int):
+    """
+    Yield (unix_timestamp, message) pairs from one `git log` pipe, newest first.
+    Reading stops (and git is terminated) as soon as the caller stops iterating.
+    """
+    cmd = ["git", "-C", str(repo_path), "log", f"--max-count={max_commits}", LOG_FORMAT, branch, "--"]
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise CommitInfoError(f"cannot run git: {e}")
+
+    finished = False
+    try:
+        pending = b""
+        for chunk in iter(lambda: proc.stdout.read(64 * 1024), b""):
+            pending += chunk
+            *records, pending = pending.split(b"\x1e")
+            for record in records:
+                ts, _, message = record.lstrip(b"\n").partition(b"\x00")
+                yield int(ts), message.decode("utf-8", errors="replace")
+        finished = True
+    finally:
+        if not finished:
+            proc.kill()
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode("utf-8", errors="replace").strip()
+        proc.stderr.close()
+        if proc.wait() != 0 and finished:
+            raise CommitInfoError(f"git log failed: {stderr}")
+
+def _format(ts: int, message: str):
+    # GitHub reports committedDate in UTC; match the API backends' formatting
+    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%d %H:%M:%S"), message.splitlines()[0] if message else ""
+
+@metrics.timed("fetch_git")
+def fetch_latest_user_commit_info_git(branch: str = "HEAD", repo_path=".", max_commits: int = DEFAULT_MAX_COMMITS):
+    """
+    Read the most recent commit on `branch` NOT starting with CI_PREFIX straight
+    from the local checkout, without any API call.
+    Returns a tuple: (formatted_timestamp, commit_message_first_line).
+    """
+    latest = None
+    for ts, message in _iter_commits(branch, repo_path, max_commits):
+        if latest is None:
+            latest = (ts, message)
+        if not message.startswith(CI_PREFIX):
+            return _format(ts, message)
+
+    # Fallback to the very latest if all are CI commits
+    if latest is None:
+        raise CommitInfoError(f"no commits found on '{branch}'")
+    return _format(*latest)
+
+MARKER = "AUTO_SECTION"
+
+def commit_info_provider(values: dict) -> dict:
+    """Pipeline provider for the "git" source (see update_readme.PROVIDERS)."""
+    timestamp, message = fetch_latest_user_commit_info_git(
+        values.get("branch", "HEAD"), values.get("repo_path", ".")
+    )
+    return {"timestamp": timestamp, "message": message}
+
+def update_file_with_git_info(
+    path: Path,
+    branch: str = "HEAD",
+    repo_path=".",
+    stream: bool = False,
+    backup: str = "copy",
+    dry_run: bool = False,
+    diff_format: str = "unified",
+):
+    context = RunContext(["git"], {"branch": branch, "repo_path": repo_path, "status": "✅"})
+    if not run_single(
+        path, {MARKER: "commit"}, context, stream=stream, backup=backup, dry_run=dry_run, diff_format=diff_format
+    ):
+        return
+
+    info = context.resolve(COMMIT_FIELDS)
+    print(f"README.md updated with timestamp {info['timestamp']} and message '{info['message']}'")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Update the AUTO_SECTION of README.md with the latest commit info from the local git history"
+    )
+    parser.add_argument(
+        "--branch",
+        default="HEAD",
+        help="Branch or revision whose history is read (default: HEAD)",
+    )
+    parser.add_argument(
+        "--repo-path",
+        default=".",
+        help="Path to the git checkout (default: current directory)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Rewrite README.md in chunks with bounded memory",
+    )
+    parser.add_argument(
+        "--backup",
+        choices=BACKUP_MODES,
+        default="copy",
+        help="Keep the previous README.md as README.md.bak: off, copy or hardlink",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the changes to README.md instead of writing anything",
+    )
+    parser.add_argument(
+        "--diff-format",
+        choices=CHANGE_FORMATS,
+        default="unified",
+        help="How --dry-run prints the changes: a unified diff per section or a JSON change set",
+    )
+    metrics.add_argument(parser)
+    args = parser.parse_args()
+    with metrics.recording(args.metrics):
+        try:
+            update_file_with_git_info(
+                Path("README.md"),
+                args.branch,
+                args.repo_path,
+                stream=args.stream,
+                backup=args.backup,
+                dry_run=args.dry_run,
+                diff_format=args.diff_format,
+            )
+        except CommitInfoError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
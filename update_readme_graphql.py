@@ -1,31 +1,75 @@
-import os
+import argparse
 import sys
-import re
-import requests
 from datetime import datetime
 from pathlib import Path
 
+from update_readme import (
+    BACKUP_MODES,
+    CHANGE_FORMATS,
+    COMMIT_FIELDS,
+    CommitInfoError,
+    RunContext,
+    run_single,
+)
+from update_readme_http import DEFAULT_CONCURRENCY, AsyncGitHubClient, github_token, raise_for_status, send_request
+from update_readme_snapshot import SnapshotError, SnapshotRecorder, open_snapshot, snapshot_result
+import update_readme_metrics as metrics
+
 GITHUB_GRAPHQL = "https://api.github.com/graphql"
 CI_PREFIX = "ci: auto-update README"
 
-def fetch_latest_user_commit_info_graphql(owner: str, repo: str, branch: str = "main", lookback: int = 10):
+# GitHub caps connection page sizes at 100 nodes
+MAX_PAGE_SIZE = 100
+DEFAULT_MAX_COMMITS = 300
+
+@metrics.timed("fetch_graphql")
+def fetch_latest_user_commit_info_graphql(
+    owner: str,
+    repo: str,
+    branch: str = "main",
+    lookback: int = 10,
+    max_commits: int = DEFAULT_MAX_COMMITS,
+    snapshot=None,
+    recorder=None,
+):
     """
     Call GitHub GraphQL API to fetch the most recent commit NOT starting with CI_PREFIX.
     Returns a tuple: (formatted_timestamp, commit_message_first_line).
+
+    The first page holds `lookback` commits; while every commit seen is a CI
+    commit, the search continues from the page's end cursor with doubling page
+    sizes, up to `max_commits` commits in total.
+
+    With a `Snapshot` that has a record for the branch, that record is
+    returned without any request; a `SnapshotRecorder` receives every result.
     """
-    token = os.getenv("GITHUB_TOKEN")
-    if not token:
-        print("Error: GITHUB_TOKEN not set.")
-        sys.exit(1)
+    found = snapshot_result(snapshot, owner, repo, branch)
+    if found:
+        metrics.incr("snapshot_hits")
+        return found
+    node = _fetch_latest_user_commit_node(owner, repo, branch, lookback, max_commits)
+    result = _pick_user_commit([node])
+    if recorder is not None:
+        recorder.add(f"{owner}/{repo}", branch, node.get("oid", ""), *result)
+    return result
+
+def _fetch_latest_user_commit_node(owner: str, repo: str, branch: str, lookback: int, max_commits: int):
+    """Return the history node of the latest non-CI commit (else of the latest commit)."""
+    token = github_token()
 
     query = """
-    query($owner:String!, $repo:String!, $branch:String!, $first:Int!) {
+    query($owner:String!, $repo:String!, $branch:String!, $first:Int!, $after:String) {
       repository(owner: $owner, name: $repo) {
         ref(qualifiedName: $branch) {
           target {
             ... on Commit {
-              history(first: $first) {
+              history(first: $first, after: $after) {
+                pageInfo {
+                  hasNextPage
+                  endCursor
+                }
                 nodes {
+                  oid
                   committedDate
                   message
                 }
@@ -39,14 +83,43 @@ def fetch_latest_user_commit_info_graphql(owner: str, repo: str, branch: str = "
     variables = {
         "owner": owner,
         "repo": repo,
-        "branch": f"refs/heads/{branch}",
+        "branch": _qualified(branch),
         "first": lookback
     }
     headers = {"Authorization": f"bearer {token}"}
-    resp = requests.post(GITHUB_GRAPHQL, json={"query": query, "variables": variables}, headers=headers)
-    resp.raise_for_status()
-    nodes = resp.json()["data"]["repository"]["ref"]["target"]["history"]["nodes"]
+    latest = None
+    seen = 0
+    while True:
+        resp = send_request("POST", GITHUB_GRAPHQL, json={"query": query, "variables": variables}, headers=headers)
+        raise_for_status(resp)
+        history = resp.json()["data"]["repository"]["ref"]["target"]["history"]
+        nodes = history["nodes"]
+        found = _user_commit_node(nodes)
+        if found:
+            return found
+
+        latest = latest or (nodes[0] if nodes else None)
+        seen += len(nodes)
+        page_info = history.get("pageInfo") or {}
+        if not nodes or not page_info.get("hasNextPage") or seen >= max_commits:
+            break
+        variables["after"] = page_info["endCursor"]
+        variables["first"] = min(variables["first"] * 2, MAX_PAGE_SIZE)
+
+    if latest is None:
+        raise CommitInfoError("branch has no commits")
+    return latest
+
+def _qualified(ref: str) -> str:
+    """Branch names map to refs/heads/; full refs (e.g. refs/pull/1/head) are kept."""
+    return ref if ref.startswith("refs/") else f"refs/heads/{ref}"
+
+def _user_commit_node(nodes: list):
+    """Return the first non-CI node, or None."""
+    return next((node for node in nodes if _find_user_commit([node])), None)
 
+def _find_user_commit(nodes: list):
+    """Return (timestamp, message) of the first non-CI node, or None."""
     # Iterate and skip CI commits
     for node in nodes:
         msg = node["message"].splitlines()[0]
@@ -54,6 +127,13 @@ def fetch_latest_user_commit_info_graphql(owner: str, repo: str, branch: str = "
             ts_iso = node["committedDate"]
             dt = datetime.fromisoformat(ts_iso.rstrip("Z"))
             return dt.strftime("%Y-%m-%d %H:%M:%S"), msg
+    return None
+
+def _pick_user_commit(nodes: list):
+    """Return (timestamp, message) of the first non-CI node, else of the latest one."""
+    found = _find_user_commit(nodes)
+    if found:
+        return found
 
     # Fallback to the very first one if all are CI commits
     node = nodes[0]
@@ -62,31 +142,540 @@ def fetch_latest_user_commit_info_graphql(owner: str, repo: str, branch: str = "
     msg = node["message"].splitlines()[0]
     return dt.strftime("%Y-%m-%d %H:%M:%S"), msg
 
-def update_file_with_github_info(path: Path, owner: str, repo: str):
-    content = path.read_text(encoding="utf-8")
-    pattern = r"(<!-- AUTO_SECTION_START -->)(.*?)(<!-- AUTO_SECTION_END -->)"
-    if not re.search(pattern, content, flags=re.DOTALL):
-        print("Warning: No AUTO_SECTION markers found.")
-        sys.exit(1)
-
-    timestamp, message = fetch_latest_user_commit_info_graphql(owner, repo)
-    new_section = (
-        "<!-- AUTO_SECTION_START -->\n"
-        f"- Last updated: {timestamp}\n"
-        f"- Commit message: {message}\n"
-        "- Deployment status: ✅\n"
-        "<!-- AUTO_SECTION_END -->"
+# GitHub rejects queries requesting more than 500,000 nodes in total; keep a
+# practical cap on aliases per document so a single failure stays contained.
+MAX_NODES_PER_QUERY = 500_000
+MAX_REPOS_PER_QUERY = 100
+
+def _normalize_target(target):
+    if len(target) == 2:
+        return target[0], target[1], "main"
+    owner, repo, branch = target
+    return owner, repo, branch
+
+def _build_batch_query(targets: list, first: int, cursors: dict = None):
+    """Build one aliased GraphQL document (and its variables) for `targets`."""
+    cursors = cursors or {}
+    declarations = ["$first:Int!"]
+    fields = []
+    variables = {"first": first}
+    for i, (owner, repo, branch) in enumerate(targets):
+        declarations.append(f"$o{i}:String!, $n{i}:String!, $b{i}:String!, $a{i}:String")
+        fields.append(
+            f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ ref(qualifiedName: $b{i}) "
+            f"{{ target {{ ... on Commit {{ history(first: $first, after: $a{i}) {{ ...page }} }} }} }} }}"
+        )
+        variables.update({
+            f"o{i}": owner,
+            f"n{i}": repo,
+            f"b{i}": _qualified(branch),
+            f"a{i}": cursors.get((owner, repo, branch)),
+        })
+
+    query = (
+        f"query({', '.join(declarations)}) {{\n  "
+        + "\n  ".join(fields)
+        + "\n}\n"
+        "fragment page on CommitHistoryConnection {\n"
+        "  pageInfo { hasNextPage endCursor }\n"
+        "  nodes { oid committedDate message }\n"
+        "}\n"
     )
-    updated = re.sub(pattern, new_section, content, flags=re.DOTALL)
+    return query, variables
+
+def _chunk_targets(targets: list, lookback: int, max_repos: int) -> list:
+    targets = list(dict.fromkeys(_normalize_target(t) for t in targets))
+    chunk_size = max(1, min(max_repos, MAX_NODES_PER_QUERY // max(1, lookback)))
+    return [targets[i:i + chunk_size] for i in range(0, len(targets), chunk_size)]
+
+def _collect_batch(chunk: list, payload: dict, results: dict, errors: dict, walks: dict, max_commits: int):
+    """
+    Split one aliased response into per-repository results and errors.
+
+    Targets whose page held only CI commits keep their walk (cursor, commits
+    seen, latest commit) in `walks` while more history is left to search.
+    """
+    data = payload.get("data") or {}
+    # GraphQL reports per-alias failures with the alias as the first path element
+    messages = {}
+    for error in payload.get("errors") or []:
+        path = error.get("path") or [None]
+        messages.setdefault(path[0], error.get("message", "unknown error"))
+
+    for i, target in enumerate(chunk):
+        alias = f"r{i}"
+        repository = data.get(alias)
+        walk = walks.pop(target, {"after": None, "seen": 0, "latest": None})
+        if alias in messages or repository is None:
+            errors[target] = CommitInfoError(messages.get(alias, messages.get(None, "repository not found")))
+        elif repository.get("ref") is None:
+            errors[target] = CommitInfoError(f"branch '{target[2]}' not found")
+        else:
+            history = repository["ref"]["target"]["history"]
+            nodes = history["nodes"]
+            found = _find_user_commit(nodes)
+            if found:
+                results[target] = found
+                continue
+            walk["latest"] = walk["latest"] or (nodes[0] if nodes else None)
+            walk["seen"] += len(nodes)
+            page_info = history.get("pageInfo") or {}
+            if nodes and page_info.get("hasNextPage") and walk["seen"] < max_commits:
+                walk["after"] = page_info["endCursor"]
+                walks[target] = walk
+            elif walk["latest"] is not None:
+                results[target] = _pick_user_commit([walk["latest"]])
+            else:
+                errors[target] = CommitInfoError("branch has no commits")
+
+@metrics.timed("fetch_graphql")
+def fetch_latest_user_commit_info_graphql_batch(
+    targets: list, lookback: int = 10, max_repos: int = MAX_REPOS_PER_QUERY, max_commits: int = DEFAULT_MAX_COMMITS
+):
+    """
+    Fetch the latest non-CI commit for many repositories with as few GraphQL
+    requests as possible. Each request is a single aliased document covering up
+    to `max_repos` repositories, further limited so that the requested nodes
+    stay below GitHub's per-query node limit.
+
+    Repositories whose page holds only CI commits are searched further in
+    later rounds, from their own end cursor with doubling page sizes, up to
+    `max_commits` commits each.
+
+    :param targets: Iterable of (owner, repo) or (owner, repo, branch) tuples
+    :param lookback: Number of commits inspected per repository in the first round
+    :param max_repos: Maximum number of repositories per request
+    :param max_commits: Maximum number of commits searched per repository
+    :return: (results, errors) where results maps (owner, repo, branch) to
+             (timestamp, message) and errors maps it to a CommitInfoError
+    """
+    headers = {"Authorization": f"bearer {github_token()}"}
+
+    def post(body):
+        try:
+            resp = send_request("POST", GITHUB_GRAPHQL, json=body, headers=headers)
+            raise_for_status(resp)
+            return resp.json()
+        except Exception as e:
+            return e
+
+    rounds = _batch_rounds(targets, lookback, max_repos, max_commits)
+    try:
+        bodies = next(rounds)
+        while True:
+            bodies = rounds.send([post(body) for body in bodies])
+    except StopIteration as done:
+        return done.value
+
+async def fetch_latest_user_commit_info_graphql_batch_async(
+    client: AsyncGitHubClient,
+    targets: list,
+    lookback: int = 10,
+    max_repos: int = MAX_REPOS_PER_QUERY,
+    max_commits: int = DEFAULT_MAX_COMMITS,
+):
+    """
+    Like `fetch_latest_user_commit_info_graphql_batch`, but sends the chunks of
+    each round concurrently through a shared `AsyncGitHubClient`.
+    """
+    import asyncio
+
+    async def post(body):
+        try:
+            resp = await client.post(GITHUB_GRAPHQL, json=body)
+            raise_for_status(resp)
+            return resp.json()
+        except Exception as e:
+            return e
+
+    rounds = _batch_rounds(targets, lookback, max_repos, max_commits)
+    try:
+        bodies = next(rounds)
+        while True:
+            bodies = rounds.send(await asyncio.gather(*(post(body) for body in bodies)))
+    except StopIteration as done:
+        return done.value
+
+def _batch_rounds(targets: list, lookback: int, max_repos: int, max_commits: int):
+    """
+    The batch search without its transport, shared by the sync and async
+    fetchers: yields the request bodies of each round and is sent, in the same
+    order, their payloads or the exceptions the requests failed with; returns
+    (results, errors).
+    """
+    results, errors, walks = {}, {}, {}
+
+    first, pending = lookback, targets
+    while pending:
+        cursors = {target: walk["after"] for target, walk in walks.items()}
+        chunks = _chunk_targets(pending, first, max_repos)
+        bodies = []
+        for chunk in chunks:
+            query, variables = _build_batch_query(chunk, first, cursors)
+            bodies.append({"query": query, "variables": variables})
+        outcomes = yield bodies
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, Exception):
+                for target in chunk:
+                    walks.pop(target, None)
+                    errors[target] = CommitInfoError(f"request failed: {outcome}")
+            else:
+                _collect_batch(chunk, outcome, results, errors, walks, max_commits)
+        first, pending = min(first * 2, MAX_PAGE_SIZE), list(walks)
+
+    return results, errors
+
+def fetch_many_latest_user_commit_info_graphql(
+    targets: list, lookback: int = 10, concurrency: int = DEFAULT_CONCURRENCY, max_commits: int = DEFAULT_MAX_COMMITS
+):
+    """
+    Synchronous entry point for the async batch fetcher: resolves every target
+    with batched queries sent `concurrency` at a time. Returns (results, errors).
+    """
+    token = github_token()
 
-    backup = path.with_suffix(path.suffix + ".bak")
-    path.rename(backup)
-    path.write_text(updated, encoding="utf-8")
+    import asyncio
+
+    async def run():
+        async with AsyncGitHubClient(token, concurrency=concurrency) as client:
+            return await fetch_latest_user_commit_info_graphql_batch_async(
+                client, targets, lookback, max_commits=max_commits
+            )
+
+    return asyncio.run(run())
+
+def _post_graphql(query: str, variables: dict, headers: dict) -> dict:
+    resp = send_request("POST", GITHUB_GRAPHQL, json={"query": query, "variables": variables}, headers=headers)
+    raise_for_status(resp)
+    payload = resp.json()
+    if not (payload.get("data") or {}).get("repository"):
+        messages = [e.get("message", "unknown error") for e in payload.get("errors") or []]
+        raise CommitInfoError("; ".join(messages) or "repository not found")
+    return payload["data"]["repository"]
+
+def _resolve_heads(owner: str, repo: str, refs: list, headers: dict, heads: dict, errors: dict):
+    """Map every ref to the oid of its head commit, MAX_REPOS_PER_QUERY refs per request."""
+    for start in range(0, len(refs), MAX_REPOS_PER_QUERY):
+        chunk = refs[start:start + MAX_REPOS_PER_QUERY]
+        declarations = ["$owner:String!", "$repo:String!"]
+        fields = []
+        variables = {"owner": owner, "repo": repo}
+        for i, ref in enumerate(chunk):
+            declarations.append(f"$q{i}:String!")
+            fields.append(f"h{i}: ref(qualifiedName: $q{i}) {{ target {{ oid }} }}")
+            variables[f"q{i}"] = _qualified(ref)
+        query = (
+            f"query({', '.join(declarations)}) {{\n"
+            "  repository(owner: $owner, name: $repo) {\n    "
+            + "\n    ".join(fields)
+            + "\n  }\n}\n"
+        )
+        try:
+            repository = _post_graphql(query, variables, headers)
+        except Exception as e:
+            for ref in chunk:
+                errors[ref] = CommitInfoError(f"request failed: {e}")
+            continue
+        for i, ref in enumerate(chunk):
+            found = repository.get(f"h{i}")
+            if found is None:
+                errors[ref] = CommitInfoError(f"ref '{ref}' not found")
+            else:
+                heads[ref] = found["target"]["oid"]
+
+def _scan_history(nodes: list, memo: dict):
+    """
+    Walk one page of history, newest first, and return (timestamp, message) of
+    the latest non-CI commit, or None. A commit already in `memo` ends the walk
+    with its answer; every commit walked is memoized once the answer is known.
+    """
+    walked = []
+    answer = None
+    for node in nodes:
+        answer = memo.get(node["oid"]) or _find_user_commit([node])
+        walked.append(node["oid"])
+        if answer:
+            break
+    if answer:
+        for oid in walked:
+            memo[oid] = answer
+    return answer
+
+@metrics.timed("fetch_graphql")
+def fetch_latest_user_commit_info_graphql_refs(
+    owner: str, repo: str, refs: list, lookback: int = 10, max_commits: int = DEFAULT_MAX_COMMITS, memo: dict = None
+):
+    """
+    Resolve the latest non-CI commit for many refs of one repository (e.g. the
+    head branches of every open PR) with a handful of requests.
+
+    One aliased query maps all refs to their head commits; refs sharing a head
+    are walked once. The histories of the distinct heads are then fetched
+    together, one aliased page per head and request, and only heads whose page
+    held nothing but CI commits are paged further. Since PR branches share most
+    of their history with their base, the walk stops at the first commit whose
+    answer is already known from another ref.
+
+    :param refs: Branch names or full refs (refs/heads/..., refs/pull/N/head)
+    :param lookback: Size of each head's first page (doubling on later pages)
+    :param max_commits: Commits inspected per head before falling back to its
+                        latest commit, as in `fetch_latest_user_commit_info_graphql`
+    :param memo: Optional dict of commit oid -> (timestamp, message), shared
+                 across calls so that repeated runs skip known histories
+    :return: (results, errors) where results maps each ref to
+             (timestamp, message) and errors maps it to a CommitInfoError
+    """
+    token = github_token()
+
+    headers = {"Authorization": f"bearer {token}"}
+    memo = {} if memo is None else memo
+    refs = list(dict.fromkeys(refs))
+    heads, errors = {}, {}
+    _resolve_heads(owner, repo, refs, headers, heads, errors)
+
+    failed = {}
+    walks = {oid: {"first": lookback, "after": None, "seen": 0, "latest": None} for oid in dict.fromkeys(heads.values())}
+    while True:
+        pending = [oid for oid in walks if oid not in memo and oid not in failed]
+        if not pending:
+            break
+        for start in range(0, len(pending), MAX_REPOS_PER_QUERY):
+            chunk = pending[start:start + MAX_REPOS_PER_QUERY]
+            declarations = ["$owner:String!", "$repo:String!"]
+            fields = []
+            variables = {"owner": owner, "repo": repo}
+            for i, oid in enumerate(chunk):
+                declarations.append(f"$o{i}:GitObjectID!, $f{i}:Int!, $a{i}:String")
+                fields.append(
+                    f"c{i}: object(oid: $o{i}) {{ ... on Commit {{ history(first: $f{i}, after: $a{i}) {{ "
+                    "pageInfo { hasNextPage endCursor } nodes { oid committedDate message } } } }"
+                )
+                variables.update({f"o{i}": oid, f"f{i}": walks[oid]["first"], f"a{i}": walks[oid]["after"]})
+            query = (
+                f"query({', '.join(declarations)}) {{\n"
+                "  repository(owner: $owner, name: $repo) {\n    "
+                + "\n    ".join(fields)
+                + "\n  }\n}\n"
+            )
+            try:
+                repository = _post_graphql(query, variables, headers)
+            except Exception as e:
+                for oid in chunk:
+                    failed[oid] = CommitInfoError(f"request failed: {e}")
+                continue
+
+            for i, oid in enumerate(chunk):
+                walk = walks[oid]
+                history = (repository.get(f"c{i}") or {}).get("history") or {"nodes": []}
+                nodes = history["nodes"]
+                answer = _scan_history(nodes, memo)
+                if answer:
+                    memo[oid] = answer
+                    continue
+                walk["latest"] = walk["latest"] or (nodes[0] if nodes else None)
+                walk["seen"] += len(nodes)
+                page_info = history.get("pageInfo") or {}
+                if nodes and page_info.get("hasNextPage") and walk["seen"] < max_commits:
+                    walk["after"] = page_info["endCursor"]
+                    walk["first"] = min(walk["first"] * 2, MAX_PAGE_SIZE)
+                elif walk["latest"] is None:
+                    failed[oid] = CommitInfoError("branch has no commits")
+                else:
+                    # Fallback to the very latest if all are CI commits
+                    memo[oid] = _pick_user_commit([walk["latest"]])
+
+    results = {}
+    for ref, oid in heads.items():
+        if oid in memo:
+            results[ref] = memo[oid]
+        else:
+            errors[ref] = failed[oid]
+    return results, errors
+
+MARKER = "AUTO_SECTION"
+
+def commit_info_provider(values: dict) -> dict:
+    """Pipeline provider for the "graphql" source (see update_readme.PROVIDERS)."""
+    timestamp, message = fetch_latest_user_commit_info_graphql(
+        values["owner"],
+        values["repo"],
+        branch=values.get("branch", "main"),
+        snapshot=values.get("snapshot"),
+        recorder=values.get("recorder"),
+    )
+    return {"timestamp": timestamp, "message": message}
+
+def update_file_with_github_info(
+    path: Path,
+    owner: str,
+    repo: str,
+    stream: bool = False,
+    backup: str = "copy",
+    fallback: str = None,
+    branch: str = "main",
+    snapshot=None,
+    recorder=None,
+    dry_run: bool = False,
+    diff_format: str = "unified",
+):
+    sources = ["graphql"] + ([fallback] if fallback else [])
+    values = {"owner": owner, "repo": repo, "branch": branch, "snapshot": snapshot, "recorder": recorder}
+    context = RunContext(sources, dict(values, status="✅"))
+    if not run_single(
+        path, {MARKER: "commit"}, context, stream=stream, backup=backup, dry_run=dry_run, diff_format=diff_format
+    ):
+        return
+
+    info = context.resolve(COMMIT_FIELDS)
+    timestamp, message = info["timestamp"], info["message"]
     print(f"README.md updated with timestamp {timestamp} and message '{message}'")
 
+def _parse_target(spec: str):
+    name, _, branch = spec.partition("@")
+    owner, _, repo = name.partition("/")
+    return owner, repo, branch or "main"
+
+def _print_batch(targets: list, concurrency: int, recorder=None, snapshot=None) -> int:
+    targets = list(dict.fromkeys(targets))
+    results = {t: snapshot_result(snapshot, *t) for t in targets}
+    results = {t: found for t, found in results.items() if found}
+    metrics.incr("snapshot_hits", len(results))
+    fetched, errors = {}, {}
+    missing = [t for t in targets if t not in results]
+    if missing:
+        fetched, errors = fetch_many_latest_user_commit_info_graphql(missing, concurrency=concurrency)
+    for owner, repo, branch in targets:
+        key = (owner, repo, branch)
+        if key in results or key in fetched:
+            timestamp, message = results.get(key) or fetched[key]
+            if recorder is not None and key in fetched:
+                recorder.add(f"{owner}/{repo}", branch, "", timestamp, message)
+            print(f"{owner}/{repo}@{branch}: {timestamp} {message}")
+        else:
+            print(f"Error: {owner}/{repo}@{branch}: {errors[key]}")
+    return 1 if errors else 0
+
+def _print_refs(owner: str, repo: str, refs: list, recorder=None, snapshot=None) -> int:
+    refs = list(dict.fromkeys(refs))
+    results = {ref: snapshot_result(snapshot, owner, repo, ref) for ref in refs}
+    results = {ref: found for ref, found in results.items() if found}
+    metrics.incr("snapshot_hits", len(results))
+    fetched, errors = {}, {}
+    missing = [ref for ref in refs if ref not in results]
+    if missing:
+        fetched, errors = fetch_latest_user_commit_info_graphql_refs(owner, repo, missing)
+    for ref in refs:
+        if ref in results or ref in fetched:
+            timestamp, message = results.get(ref) or fetched[ref]
+            if recorder is not None and ref in fetched:
+                recorder.add(f"{owner}/{repo}", ref, "", timestamp, message)
+            print(f"{owner}/{repo}@{ref}: {timestamp} {message}")
+        else:
+            print(f"Error: {owner}/{repo}@{ref}: {errors[ref]}")
+    return 1 if errors else 0
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Update the AUTO_SECTION of README.md with the latest commit info"
+    )
+    parser.add_argument("owner", nargs="?", help="Repository owner")
+    parser.add_argument("repo", nargs="?", help="Repository name")
+    parser.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="OWNER/REPO[@BRANCH]",
+        help="Print the latest commit info for many repositories using batched queries",
+    )
+    parser.add_argument(
+        "--branch",
+        default="main",
+        help="Branch or full ref (e.g. refs/pull/12/head) to read commits from (default: main)",
+    )
+    parser.add_argument(
+        "--refs",
+        nargs="+",
+        metavar="REF",
+        help="Print the latest commit info for many refs of owner/repo, sharing their history",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Maximum number of requests in flight in --batch mode",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Rewrite README.md in chunks with bounded memory",
+    )
+    parser.add_argument(
+        "--backup",
+        choices=BACKUP_MODES,
+        default="copy",
+        help="Keep the previous README.md as README.md.bak: off, copy or hardlink",
+    )
+    parser.add_argument(
+        "--fallback",
+        choices=("git",),
+        help="Fill the section from the local git history if GitHub cannot be reached",
+    )
+    parser.add_argument(
+        "--snapshot",
+        metavar="PATH",
+        help="Use the commit info recorded in this snapshot file instead of fetching it",
+    )
+    parser.add_argument(
+        "--emit-snapshot",
+        metavar="PATH",
+        help="Record the fetched commit info (also in --batch and --refs mode) in this snapshot file",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the changes to README.md instead of writing anything",
+    )
+    parser.add_argument(
+        "--diff-format",
+        choices=CHANGE_FORMATS,
+        default="unified",
+        help="How --dry-run prints the changes: a unified diff per section or a JSON change set",
+    )
+    metrics.add_argument(parser)
+    args = parser.parse_args()
+    with metrics.recording(args.metrics):
+        recorder = SnapshotRecorder(args.emit_snapshot) if args.emit_snapshot else None
+        try:
+            if not args.batch and not (args.owner and args.repo):
+                parser.error("owner and repo are required unless --batch is given")
+            try:
+                snapshot = open_snapshot(args.snapshot) if args.snapshot else None
+            except SnapshotError as e:
+                print(f"Warning: ignoring snapshot: {e}")
+                snapshot = None
+            if args.batch:
+                targets = [_parse_target(spec) for spec in args.batch]
+                sys.exit(_print_batch(targets, args.concurrency, recorder, snapshot))
+            if args.refs:
+                sys.exit(_print_refs(args.owner, args.repo, args.refs, recorder, snapshot))
+            update_file_with_github_info(
+                Path("README.md"),
+                args.owner,
+                args.repo,
+                stream=args.stream,
+                backup=args.backup,
+                fallback=args.fallback,
+                branch=args.branch,
+                snapshot=snapshot,
+                recorder=recorder,
+                dry_run=args.dry_run,
+                diff_format=args.diff_format,
+            )
+        except CommitInfoError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        finally:
+            if recorder is not None and not args.dry_run:
+                recorder.save()
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python update_readme_graphql.py <owner> <repo>")
-        sys.exit(1)
-    owner, repo = sys.argv[1], sys.argv[2]
-    update_file_with_github_info(Path("README.md"), owner, repo)
\ No newline at end of file
+    main()
@@ -0,0 +1,401 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import update_readme_metrics as metrics
+from update_readme import CommitInfoError
+
+# asyncio and requests are imported where they are used: importing this module
+# (e.g. for its constants) must not slow down CLIs that never hit the network.
+
+DEFAULT_CONCURRENCY = 16
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 30)
+
+
+# Responses worth retrying: rate limiting and transient server-side failures
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TransportError(CommitInfoError):
+    """Raised when a request still fails after every retry allowed."""
+
+    pass
+
+
+class CircuitOpenError(TransportError):
+    """Raised without sending anything while a host's circuit breaker is open."""
+
+    pass
+
+
+class HTTPStatusError(CommitInfoError):
+    """Raised for an error response not worth retrying (e.g. 401 or 404)."""
+
+    pass
+
+
+def github_token() -> str:
+    """Return $GITHUB_TOKEN, raising CommitInfoError when it is not set."""
+    token = os.getenv("GITHUB_TOKEN")
+    if not token:
+        raise CommitInfoError("GITHUB_TOKEN not set.")
+    return token
+
+
+def raise_for_status(resp):
+    """Like `resp.raise_for_status()`, but raises HTTPStatusError so fallbacks apply."""
+    import requests
+
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError as e:
+        raise HTTPStatusError(str(e)) from e
+
+
+def record_response(resp):
+    """Count one GitHub response and note its rate-limit headroom in the metrics."""
+    metrics.incr("http_requests")
+    remaining = resp.headers.get("X-RateLimit-Remaining")
+    if remaining is not None and remaining.isdigit():
+        metrics.gauge("github_ratelimit_remaining", int(remaining))
+
+
+class TokenBucket:
+    """
+    Token-bucket scheduler shared by every request of a client.
+
+    Requests take one token each; tokens refill at `rate` per second up to
+    `capacity`. GitHub's rate-limit headers feed back into the bucket: a
+    `Retry-After` or an exhausted `X-RateLimit-Remaining` pauses all requests
+    until the server allows more, and a low remaining budget slows the refill
+    rate so it lasts until `X-RateLimit-Reset`.
+    """
+
+    def __init__(self, rate: float = 50.0, capacity: float = 50.0, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._base_rate = rate
+        self._tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = None
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Seconds to wait before a token is available (0 if one can be taken now)."""
+        self._refill()
+        now = self._clock()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self):
+        import asyncio
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = self.delay()
+                if wait <= 0:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep(wait)
+
+    def note_response(self, headers, wall_clock=time.time):
+        """Adjust the schedule from `Retry-After` / `X-RateLimit-*` response headers."""
+        now = self._clock()
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                self._paused_until = max(self._paused_until, now + float(retry_after))
+            except ValueError:
+                pass
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining, reset_in = int(remaining), float(reset) - wall_clock()
+        except ValueError:
+            return
+        if remaining <= 0 and reset_in > 0:
+            self._paused_until = max(self._paused_until, now + reset_in)
+        elif reset_in > 0:
+            # Spread what is left of the budget over the rest of the window
+            self.rate = min(self._base_rate, max(remaining / reset_in, 0.1))
+        else:
+            self.rate = self._base_rate
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a request.
+
+    Connection errors, timeouts and the `RETRY_STATUSES` (plus a 403 carrying
+    `Retry-After` or an exhausted rate limit, i.e. a secondary rate limit) are
+    retried up to `attempts` times in total, with full-jitter exponential
+    backoff capped at `max_delay`. A `Retry-After` is honoured as the minimum
+    wait, unless it exceeds `max_retry_after`, and no retry starts that would
+    end after `deadline` seconds, so a GitHub incident costs a bounded time.
+    All requests sent by the fetchers are reads, so every one is idempotent.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 60.0,
+        deadline: float = 60.0,
+        rand=random.random,
+    ):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.deadline = deadline
+        self._rand = rand
+
+    def should_retry(self, resp) -> bool:
+        if resp.status_code in RETRY_STATUSES:
+            return True
+        return resp.status_code == 403 and (
+            "Retry-After" in resp.headers or resp.headers.get("X-RateLimit-Remaining") == "0"
+        )
+
+    def delay(self, attempt: int, resp=None):
+        """Seconds to wait before retry number `attempt + 1`, or None to give up."""
+        delay = self._rand() * min(self.max_delay, self.base_delay * 2 ** attempt)
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after is not None:
+            try:
+                retry_after = float(retry_after)
+            except ValueError:
+                return delay
+            if retry_after > self.max_retry_after:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+
+DEFAULT_RETRY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a failing host.
+
+    After `failure_threshold` consecutive failed attempts the circuit opens and
+    requests fail immediately with CircuitOpenError, letting callers fall back
+    to cached or local data instead of waiting on retries. After
+    `reset_timeout` seconds one trial request is let through; its success
+    closes the circuit again, its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_request(self):
+        with self._lock:
+            if self.state == "open":
+                metrics.incr("circuit_rejections")
+                raise CircuitOpenError("circuit breaker open after repeated failures")
+            if self.state == "half-open":
+                # Only one trial at a time: re-arm until it reports back
+                self._opened_at = self._clock()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(url: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker of the host serving `url`."""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def _next_delay(policy: RetryPolicy, breaker: CircuitBreaker, attempt: int, started: float, resp, error):
+    """
+    Classify one attempt: None if `resp` is final, else the seconds to wait
+    before the next attempt. Raises TransportError when giving up.
+    """
+    if error is None and not policy.should_retry(resp):
+        breaker.record_success()
+        return None
+    breaker.record_failure()
+    reason = error if error is not None else f"HTTP {resp.status_code}"
+    delay = policy.delay(attempt, resp)
+    if (
+        delay is None
+        or attempt + 1 >= policy.attempts
+        or time.monotonic() - started + delay > policy.deadline
+    ):
+        raise TransportError(f"giving up after {attempt + 1} attempt(s): {reason}")
+    metrics.incr("http_retries")
+    return delay
+
+
+def send_request(
+    method: str,
+    url: str,
+    retry: RetryPolicy = None,
+    breaker: CircuitBreaker = None,
+    sleep=time.sleep,
+    **kwargs,
+):
+    """
+    Send one synchronous request with timeouts, retries and the host's circuit
+    breaker. Returns the final response, which may still be an error that is
+    not worth retrying (e.g. 404); raises TransportError otherwise.
+    """
+    import requests
+
+    retry = retry or DEFAULT_RETRY
+    breaker = breaker or breaker_for(url)
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    # Going through requests.get/post keeps the fetchers easy to stub in tests
+    send = getattr(requests, method.lower())
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        breaker.before_request()
+        resp = error = None
+        try:
+            resp = send(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        else:
+            record_response(resp)
+        delay = _next_delay(retry, breaker, attempt, started, resp, error)
+        if delay is None:
+            return resp
+        sleep(delay)
+        attempt += 1
+
+
+class AsyncGitHubClient:
+    """
+    asyncio client for the GitHub REST and GraphQL APIs.
+
+    Requests go through one pooled, keep-alive `requests.Session` whose calls run
+    on a private thread pool, so no extra HTTP dependency is needed. At most
+    `concurrency` requests are in flight at once, each with its own timeout,
+    and every request first takes a token from the shared `TokenBucket`.
+    Failures are retried per `retry` (backoff happens outside the concurrency
+    limit) behind the host's circuit breaker, as in `send_request`.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout=DEFAULT_TIMEOUT,
+        bucket: TokenBucket = None,
+        session: "requests.Session" = None,
+        retry: RetryPolicy = None,
+    ):
+        import asyncio
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.retry = retry or DEFAULT_RETRY
+        self.bucket = bucket or TokenBucket()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="github")
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Authorization"] = f"bearer {token}"
+
+    async def request(self, method: str, url: str, **kwargs) -> "requests.Response":
+        import asyncio
+        import requests
+
+        kwargs.setdefault("timeout", self.timeout)
+        breaker = breaker_for(url)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            breaker.before_request()
+            resp = error = None
+            async with self._semaphore:
+                await self.bucket.acquire()
+                loop = asyncio.get_running_loop()
+                try:
+                    resp = await loop.run_in_executor(
+                        self._executor, lambda: self.session.request(method, url, **kwargs)
+                    )
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+            if resp is not None:
+                self.bucket.note_response(resp.headers)
+                record_response(resp)
+            delay = _next_delay(self.retry, breaker, attempt, started, resp, error)
+            if delay is None:
+                return resp
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url: str, **kwargs) -> "requests.Response":
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> "requests.Response":
+        return await self.request("POST", url, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
@@ -0,0 +1,154 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+PREFIX = "update_readme"
+
+# The recorder in use, or None. Instrumented code calls the module-level
+# helpers below, which do nothing but a global lookup while disabled.
+_active = None
+_NULL_PHASE = nullcontext()
+
+
+class Metrics:
+    """
+    Per-run phase timings, counters and gauges.
+
+    Phases accumulate wall-clock seconds (phases running on several threads
+    add up), counters only go up, and gauges keep the last value set.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "phases": dict(self.phases),
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+            }
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        data = self.to_dict()
+        lines = []
+        if data["phases"]:
+            lines.append(f"# TYPE {PREFIX}_phase_seconds gauge")
+            for name, seconds in sorted(data["phases"].items()):
+                lines.append(f'{PREFIX}_phase_seconds{{phase="{name}"}} {seconds:.6f}')
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {value}")
+        for name, value in sorted(data["gauges"].items()):
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.append(f"{PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Atomically write the metrics to `path`: a Prometheus textfile-collector
+        file if it ends in ".prom", JSON otherwise.
+        """
+        # update_readme imports this module, so its helper is looked up late
+        from update_readme import replace_atomic
+
+        path = os.fspath(path)
+        if path.endswith(".prom"):
+            payload = self.to_prometheus()
+        else:
+            payload = json.dumps(self.to_dict(), indent=2, sort_keys=True) + "\n"
+        replace_atomic(path, payload)
+
+
+def enabled() -> bool:
+    """True while recording; guards metrics that are costly to compute."""
+    return _active is not None
+
+
+def phase(name: str):
+    """Context manager timing `name` while recording, else a shared no-op."""
+    if _active is None:
+        return _NULL_PHASE
+    return _active.phase(name)
+
+
+def timed(name: str):
+    """Decorator recording every call of the function as phase `name`."""
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _active.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def incr(name: str, value: int = 1):
+    if _active is not None:
+        _active.incr(name, value)
+
+
+def gauge(name: str, value: float):
+    if _active is not None:
+        _active.gauge(name, value)
+
+
+@contextmanager
+def recording(path=None):
+    """
+    Record metrics for the duration of the block and write them to `path`
+    when it exits (also on errors and `sys.exit`). Without a path nothing is
+    recorded and the helpers stay no-ops.
+    """
+    global _active
+    if not path:
+        yield None
+        return
+    metrics, previous = Metrics(), _active
+    _active = metrics
+    try:
+        yield metrics
+    finally:
+        _active = previous
+        metrics.write(path)
+
+
+def add_argument(parser):
+    """Add the shared --metrics option to a CLI parser."""
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        default=os.getenv("UPDATE_README_METRICS"),
+        help="Write phase timings and counters to PATH: a Prometheus textfile if it "
+        "ends in .prom, JSON otherwise (default: $UPDATE_README_METRICS)",
+    )
@@ -1,30 +1,183 @@
+import argparse
 import os
-import re
 import sys
-import requests
 from datetime import datetime
 from pathlib import Path
 
+from update_readme import (
+    BACKUP_MODES,
+    CHANGE_FORMATS,
+    COMMIT_FIELDS,
+    CommitInfoError,
+    RunContext,
+    run_single,
+)
+from update_readme_cache import CommitInfoCache
+from update_readme_http import (
+    DEFAULT_CONCURRENCY,
+    AsyncGitHubClient,
+    TransportError,
+    github_token,
+    raise_for_status,
+    send_request,
+)
+from update_readme_snapshot import SnapshotError, SnapshotRecorder, open_snapshot, snapshot_result
+import update_readme_metrics as metrics
+
 GITHUB_API = "https://api.github.com"
 
-def fetch_latest_user_commit_info(owner: str, repo: str, branch: str = "main"):
+# GitHub caps per_page at 100; stop paging after this many commits by default
+MAX_PER_PAGE = 100
+DEFAULT_MAX_COMMITS = 300
+
+@metrics.timed("fetch_rest")
+def fetch_latest_user_commit_info(
+    owner: str,
+    repo: str,
+    branch: str = "main",
+    cache=None,
+    max_commits: int = DEFAULT_MAX_COMMITS,
+    snapshot=None,
+    recorder=None,
+):
     """
     Fetch the most recent commit on `branch` whose message does NOT
     start with 'ci: auto-update README'. Returns (timestamp, message).
+
+    The first request asks for 10 commits; if they are all CI commits, the
+    search follows the `Link: rel="next"` pages with growing page sizes until a
+    user commit is found or `max_commits` commits have been inspected.
+
+    With a `CommitInfoCache`, the request is made conditional on the cached
+    ETag and the cached result is reused when GitHub answers 304.
+
+    With a `Snapshot` that has a record for the branch, that record is
+    returned without any request; a `SnapshotRecorder` receives every result.
     """
-    token = os.getenv("GITHUB_TOKEN")
-    if not token:
-        print("Error: GITHUB_TOKEN not set.")
-        sys.exit(1)
+    found = snapshot_result(snapshot, owner, repo, branch)
+    if found:
+        metrics.incr("snapshot_hits")
+        return found
+    result, sha = _fetch_latest_user_commit_info(owner, repo, branch, cache, max_commits)
+    if recorder is not None:
+        recorder.add(f"{owner}/{repo}", branch, sha, *result)
+    return result
 
-    # Fetch the latest 10 commits on the branch
+def _fetch_latest_user_commit_info(owner: str, repo: str, branch: str, cache, max_commits: int):
+    """Return ((timestamp, message), sha); the sha is "" for cached results."""
+    headers = {"Authorization": f"token {github_token()}"}
+    steps = _search_steps(owner, repo, branch, cache, max_commits, headers)
+    try:
+        request = next(steps)
+        while True:
+            url, headers, params = request
+            try:
+                resp = send_request("GET", url, headers=headers, params=params)
+            except TransportError as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(resp)
+    except StopIteration as done:
+        return done.value
+
+def _search_steps(owner: str, repo: str, branch: str, cache, max_commits: int, headers: dict):
+    """
+    The commit search without its transport, shared by the sync and async
+    fetchers: yields (url, headers, params) for every page to request and is
+    sent the response (or thrown the TransportError); returns
+    ((timestamp, message), sha), the sha being "" for cached results.
+    """
     url = f"{GITHUB_API}/repos/{owner}/{repo}/commits"
-    params = {"sha": branch, "per_page": 10}
-    headers = {"Authorization": f"token {token}"}
-    resp = requests.get(url, headers=headers, params=params)
-    resp.raise_for_status()
-    commits = resp.json()
+    headers = dict(headers)
+    cached = cache.get(owner, repo, branch) if cache is not None else None
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+
+    search = _CommitSearch(branch, max_commits)
+    etag = None
+    while True:
+        try:
+            resp = yield url, dict(headers), search.params()
+        except TransportError:
+            if not cached:
+                raise
+            # GitHub is failing: serve the last known value rather than nothing
+            metrics.incr("fallbacks")
+            return tuple(cached["result"]), ""
+        if cached and resp.status_code == 304 and search.seen == 0:
+            cache.touch(owner, repo, branch)
+            metrics.incr("cache_hits")
+            return tuple(cached["result"]), ""
+        raise_for_status(resp)
+        if search.seen == 0:
+            etag = resp.headers.get("ETag")
+            headers.pop("If-None-Match", None)
+        if search.feed(resp.json(), "next" in resp.links):
+            break
+
+    result = search.result()
+    if cache is not None:
+        cache.put(owner, repo, branch, etag, result)
+    return result, search.sha()
 
+def _next_page_size(seen: int, per_page: int) -> int:
+    """
+    Grow the page size (at most doubling, capped at MAX_PER_PAGE) while keeping
+    `seen` a multiple of it, so the next page number lines up exactly with the
+    commits already inspected.
+    """
+    for size in range(min(per_page * 2, MAX_PER_PAGE), per_page, -1):
+        if seen % size == 0:
+            return size
+    return per_page
+
+class _CommitSearch:
+    """Paging state for the adaptive search for the latest non-CI commit."""
+
+    def __init__(self, branch: str, max_commits: int, per_page: int = 10):
+        self.branch = branch
+        self.max_commits = max_commits
+        self.per_page = per_page
+        self.seen = 0
+        self.latest = None
+        self.found = None
+        self.page = []
+
+    def params(self) -> dict:
+        params = {"sha": self.branch, "per_page": self.per_page}
+        if self.seen:
+            params["page"] = self.seen // self.per_page + 1
+        return params
+
+    def feed(self, commits: list, has_next: bool) -> bool:
+        """Consume one page; return True when the search is over."""
+        if self.latest is None and commits:
+            self.latest = commits[0]
+        self.found = _find_user_commit(commits)
+        self.page = commits
+        self.seen += len(commits)
+        if self.found or not commits or not has_next or self.seen >= self.max_commits:
+            return True
+        self.per_page = _next_page_size(self.seen, self.per_page)
+        return False
+
+    def result(self):
+        if self.found:
+            return self.found
+        if self.latest is None:
+            raise CommitInfoError("branch has no commits")
+        return _pick_user_commit([self.latest])
+
+    def sha(self) -> str:
+        """Sha of the commit `result` describes ("" if GitHub did not send it)."""
+        if self.found:
+            commit = next(c for c in self.page if _find_user_commit([c]))
+        else:
+            commit = self.latest or {}
+        return commit.get("sha", "")
+
+def _find_user_commit(commits: list):
+    """Return (timestamp, message) of the first non-CI commit, or None."""
     for commit in commits:
         msg = commit["commit"]["message"].splitlines()[0]
         # Skip CI auto-update commits
@@ -34,6 +187,13 @@ def fetch_latest_user_commit_info(owner: str, repo: str, branch: str = "main"):
             dt = datetime.fromisoformat(iso_ts.rstrip("Z"))
             ts = dt.strftime("%Y-%m-%d %H:%M:%S")
             return ts, msg
+    return None
+
+def _pick_user_commit(commits: list):
+    """Return (timestamp, message) of the first non-CI commit, else of the latest one."""
+    found = _find_user_commit(commits)
+    if found:
+        return found
 
     # Fallback to the very latest if all are CI commits
     latest = commits[0]
@@ -43,32 +203,175 @@ def fetch_latest_user_commit_info(owner: str, repo: str, branch: str = "main"):
     msg = latest["commit"]["message"].splitlines()[0]
     return ts, msg
 
-def update_file_with_github_info(path: Path, owner: str, repo: str):
-    content = path.read_text(encoding="utf-8")
-    pattern = r"(<!-- AUTO_SECTION_START -->)(.*?)(<!-- AUTO_SECTION_END -->)"
-    if not re.search(pattern, content, flags=re.DOTALL):
-        print("Warning: No AUTO_SECTION markers found.")
-        sys.exit(1)
-
-    timestamp, message = fetch_latest_user_commit_info(owner, repo)
-    new_section = (
-        "<!-- AUTO_SECTION_START -->\n"
-        f"- Last updated: {timestamp}\n"
-        f"- Commit message: {message}\n"
-        "- Deployment status: ✅\n"
-        "<!-- AUTO_SECTION_END -->"
+async def fetch_latest_user_commit_info_async(
+    client: AsyncGitHubClient,
+    owner: str,
+    repo: str,
+    branch: str = "main",
+    cache=None,
+    max_commits: int = DEFAULT_MAX_COMMITS,
+):
+    """Async counterpart of `fetch_latest_user_commit_info` using a shared client."""
+    steps = _search_steps(owner, repo, branch, cache, max_commits, {})
+    try:
+        request = next(steps)
+        while True:
+            url, headers, params = request
+            try:
+                resp = await client.get(url, headers=headers, params=params)
+            except TransportError as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(resp)
+    except StopIteration as done:
+        return done.value[0]
+
+def fetch_many_latest_user_commit_info(targets: list, concurrency: int = DEFAULT_CONCURRENCY, cache=None):
+    """
+    Fetch commit info for many (owner, repo[, branch]) targets in parallel over
+    one pooled connection set, at most `concurrency` requests at a time.
+    Returns (results, errors) keyed by (owner, repo, branch).
+    """
+    token = github_token()
+
+    import asyncio
+
+    targets = list(dict.fromkeys(t if len(t) == 3 else (t[0], t[1], "main") for t in targets))
+    results, errors = {}, {}
+
+    async def run():
+        async with AsyncGitHubClient(token, concurrency=concurrency) as client:
+            async def one(target):
+                try:
+                    results[target] = await fetch_latest_user_commit_info_async(client, *target, cache=cache)
+                except Exception as e:
+                    errors[target] = e if isinstance(e, CommitInfoError) else CommitInfoError(str(e))
+            await asyncio.gather(*(one(t) for t in targets))
+
+    asyncio.run(run())
+    return results, errors
+
+MARKER = "AUTO_SECTION"
+
+def commit_info_provider(values: dict) -> dict:
+    """Pipeline provider for the "rest" source (see update_readme.PROVIDERS)."""
+    timestamp, message = fetch_latest_user_commit_info(
+        values["owner"],
+        values["repo"],
+        branch=values.get("branch", "main"),
+        cache=values.get("cache"),
+        snapshot=values.get("snapshot"),
+        recorder=values.get("recorder"),
     )
-    updated = re.sub(pattern, new_section, content, flags=re.DOTALL)
+    return {"timestamp": timestamp, "message": message}
+
+def update_file_with_github_info(
+    path: Path,
+    owner: str,
+    repo: str,
+    stream: bool = False,
+    backup: str = "copy",
+    cache=None,
+    fallback: str = None,
+    snapshot=None,
+    recorder=None,
+    dry_run: bool = False,
+    diff_format: str = "unified",
+):
+    sources = ["rest"] + ([fallback] if fallback else [])
+    values = {"owner": owner, "repo": repo, "cache": cache, "snapshot": snapshot, "recorder": recorder}
+    context = RunContext(sources, dict(values, status="✅"))
+    if not run_single(
+        path, {MARKER: "commit"}, context, stream=stream, backup=backup, dry_run=dry_run, diff_format=diff_format
+    ):
+        return
 
-    # backup original and write
-    backup = path.with_suffix(path.suffix + ".bak")
-    path.rename(backup)
-    path.write_text(updated, encoding="utf-8")
+    info = context.resolve(COMMIT_FIELDS)
+    timestamp, message = info["timestamp"], info["message"]
     print(f"README.md updated with timestamp {timestamp} and message “{message}”")
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="Update the AUTO_SECTION of README.md with the latest commit info"
+    )
+    parser.add_argument("owner", help="Repository owner")
+    parser.add_argument("repo", help="Repository name")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Rewrite README.md in chunks with bounded memory",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="PATH",
+        default=os.getenv("UPDATE_README_CACHE"),
+        help="Cache commit info with its ETag in PATH and send conditional requests",
+    )
+    parser.add_argument(
+        "--backup",
+        choices=BACKUP_MODES,
+        default="copy",
+        help="Keep the previous README.md as README.md.bak: off, copy or hardlink",
+    )
+    parser.add_argument(
+        "--fallback",
+        choices=("git",),
+        help="Fill the section from the local git history if GitHub cannot be reached",
+    )
+    parser.add_argument(
+        "--snapshot",
+        metavar="PATH",
+        help="Use the commit info recorded in this snapshot file instead of fetching it",
+    )
+    parser.add_argument(
+        "--emit-snapshot",
+        metavar="PATH",
+        help="Record the fetched commit info in this snapshot file",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the changes to README.md instead of writing anything",
+    )
+    parser.add_argument(
+        "--diff-format",
+        choices=CHANGE_FORMATS,
+        default="unified",
+        help="How --dry-run prints the changes: a unified diff per section or a JSON change set",
+    )
+    metrics.add_argument(parser)
+    args = parser.parse_args()
+    with metrics.recording(args.metrics):
+        cache = CommitInfoCache(args.cache) if args.cache else None
+        try:
+            snapshot = open_snapshot(args.snapshot) if args.snapshot else None
+        except SnapshotError as e:
+            print(f"Warning: ignoring snapshot: {e}")
+            snapshot = None
+        recorder = SnapshotRecorder(args.emit_snapshot) if args.emit_snapshot else None
+        try:
+            update_file_with_github_info(
+                Path("README.md"),
+                args.owner,
+                args.repo,
+                stream=args.stream,
+                backup=args.backup,
+                cache=cache,
+                fallback=args.fallback,
+                snapshot=snapshot,
+                recorder=recorder,
+                dry_run=args.dry_run,
+                diff_format=args.diff_format,
+            )
+        except CommitInfoError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if args.dry_run:
+            return
+        if cache is not None:
+            cache.save()
+        if recorder is not None:
+            recorder.save()
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python update_readme_rest.py <owner> <repo>")
-        sys.exit(1)
-    owner, repo = sys.argv[1], sys.argv[2]
-    update_file_with_github_info(Path("README.md"), owner, repo)
\ No newline at end of file
+    main()
@@ -0,0 +1,227 @@
+import calendar
+import mmap
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from update_readme import replace_atomic
+
+# File layout (little endian):
+#   header   magic, version, reserved, record count, offset and length of the
+#            string area (the file ends with it)
+#   records  fixed-size, sorted by key: key offset/length, message offset/length,
+#            commit time (Unix seconds, UTC), raw SHA-1
+#   strings  UTF-8 keys ("owner/repo" NUL branch) followed by the messages
+MAGIC = b"URSN"
+SNAPSHOT_VERSION = 2
+_HEADER = struct.Struct("<4sHHIII")
+_RECORD = struct.Struct("<IIIIq20s")
+_NO_SHA = bytes(20)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is not a readable snapshot of this version."""
+
+    pass
+
+
+@dataclass(frozen=True)
+class CommitRecord:
+    """The latest non-CI commit of one branch, as stored in a snapshot."""
+
+    repo: str
+    branch: str
+    sha: str
+    timestamp: int
+    message: str
+
+    def formatted(self) -> tuple:
+        """(timestamp, message) as returned by the fetchers."""
+        return time.strftime(TIMESTAMP_FORMAT, time.gmtime(self.timestamp)), self.message
+
+
+def _key(repo: str, branch: str) -> bytes:
+    return f"{repo}\0{branch}".encode("utf-8")
+
+
+def write_snapshot(path, records) -> int:
+    """
+    Atomically write `records` (CommitRecords; the last one per repo and branch
+    wins) to `path`. Returns the number of records written.
+    """
+    by_key = {_key(r.repo, r.branch): r for r in records}
+    keys = sorted(by_key)
+    table = bytearray()
+    strings = bytearray()
+    messages = [by_key[k].message.encode("utf-8") for k in keys]
+    strings_offset = _HEADER.size + _RECORD.size * len(keys)
+    message_base = sum(len(k) for k in keys)
+    key_pos = message_pos = 0
+    for key, message in zip(keys, messages):
+        record = by_key[key]
+        sha = bytes.fromhex(record.sha) if len(record.sha) == 40 else _NO_SHA
+        table += _RECORD.pack(key_pos, len(key), message_base + message_pos, len(message), record.timestamp, sha)
+        key_pos += len(key)
+        message_pos += len(message)
+    strings += b"".join(keys)
+    strings += b"".join(messages)
+    header = _HEADER.pack(MAGIC, SNAPSHOT_VERSION, 0, len(keys), strings_offset, len(strings))
+    payload = header + table + strings
+
+    replace_atomic(path, payload)
+    return len(keys)
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+    Opening only maps the file and checks its header, so it costs the same
+    for ten records or ten thousand; `get` binary-searches the sorted record
+    table and decodes just the record it returns.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"{self.path} is empty")
+        try:
+            self._check_header()
+        except SnapshotError:
+            self._map.close()
+            raise
+
+    def _check_header(self):
+        if len(self._map) < _HEADER.size:
+            raise SnapshotError(f"{self.path} is not a commit snapshot")
+        magic, version = _HEADER.unpack_from(self._map)[:2]
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not a commit snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(
+                f"{self.path} has snapshot version {version} (expected {SNAPSHOT_VERSION})"
+            )
+        _, _, _, count, strings_offset, strings_length = _HEADER.unpack_from(self._map)
+        if (
+            strings_offset != _HEADER.size + count * _RECORD.size
+            or strings_offset + strings_length != len(self._map)
+        ):
+            raise SnapshotError(f"{self.path} is truncated")
+        self._count = count
+        self._strings = strings_offset
+        self._strings_length = strings_length
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __reduce__(self):
+        # Worker processes map the file themselves
+        return Snapshot, (str(self.path),)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def _entry(self, i: int):
+        key_off, key_len, msg_off, msg_len, timestamp, sha = _RECORD.unpack_from(
+            self._map, _HEADER.size + i * _RECORD.size
+        )
+        return self._string(key_off, key_len), msg_off, msg_len, timestamp, sha
+
+    def _string(self, offset: int, length: int) -> bytes:
+        if offset + length > self._strings_length:
+            raise SnapshotError(f"{self.path} is corrupt: a record points past the string area")
+        start = self._strings + offset
+        return self._map[start:start + length]
+
+    def _record(self, key: bytes, msg_off: int, msg_len: int, timestamp: int, sha: bytes):
+        try:
+            repo, _, branch = key.decode("utf-8").partition("\0")
+            message = self._string(msg_off, msg_len).decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise SnapshotError(f"{self.path} is corrupt: {e}")
+        return CommitRecord(repo, branch, sha.hex() if sha != _NO_SHA else "", timestamp, message)
+
+    def get(self, repo: str, branch: str):
+        """Return the CommitRecord for "owner/repo" and `branch`, or None."""
+        wanted = _key(repo, branch)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._entry(mid)
+            if entry[0] < wanted:
+                lo = mid + 1
+            elif entry[0] > wanted:
+                hi = mid
+            else:
+                return self._record(*entry)
+        return None
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._record(*self._entry(i))
+
+
+def open_snapshot(path):
+    """Open `path` as a Snapshot, or return None if it does not exist."""
+    try:
+        return Snapshot(path)
+    except FileNotFoundError:
+        return None
+
+
+class SnapshotRecorder:
+    """
+    Collects the commits the fetchers resolve and writes them out as one
+    snapshot, keeping the records of an existing snapshot at the same path
+    that were not refreshed.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # Copies in worker processes start empty; only this one is saved
+        return SnapshotRecorder, (str(self.path),)
+
+    def add(self, repo: str, branch: str, sha: str, timestamp: str, message: str):
+        """Record one fetch result; `timestamp` is formatted as the fetchers return it."""
+        seconds = calendar.timegm(time.strptime(timestamp, TIMESTAMP_FORMAT))
+        with self._lock:
+            self._records[(repo, branch)] = CommitRecord(repo, branch, sha or "", seconds, message)
+
+    def save(self) -> int:
+        """Write the snapshot if anything was recorded; return its record count."""
+        if not self._records:
+            return 0
+        records = []
+        try:
+            existing = open_snapshot(self.path)
+        except SnapshotError:
+            existing = None
+        if existing is not None:
+            with existing:
+                records.extend(existing)
+        records.extend(self._records.values())
+        return write_snapshot(self.path, records)
+
+
+def snapshot_result(snapshot, owner: str, repo: str, branch: str):
+    """(timestamp, message) for a branch from an optional Snapshot, or None."""
+    if snapshot is None:
+        return None
+    record = snapshot.get(f"{owner}/{repo}", branch)
+    return record.formatted() if record is not None else None
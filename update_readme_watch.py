@@ -0,0 +1,395 @@
+import argparse
+import ctypes
+import ctypes.util
+import os
+import selectors
+import signal
+import socket
+import struct
+import sys
+import time
+from pathlib import Path
+
+from update_readme import (
+    BACKUP_MODES,
+    ERROR,
+    MISSING,
+    UPDATED,
+    MarkerIndex,
+    RunContext,
+    expand_paths,
+    update_files,
+)
+import update_readme_metrics as metrics
+
+# Seconds between the first queued update and the batch that applies it
+DEFAULT_DEBOUNCE = 0.05
+DEFAULT_POLL_INTERVAL = 1.0
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """
+    Reports changes to `paths` using Linux inotify (through ctypes, no extra
+    dependency). The parent directories are watched rather than the files,
+    since atomic writes replace a file's inode on every update.
+    """
+
+    def __init__(self, paths: list):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._files = {}
+        self._dirs = {}
+        for path in paths:
+            path = Path(os.path.abspath(path))
+            self._files.setdefault(path.parent, set()).add(path.name)
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        for directory in self._files:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(err, f"cannot watch {directory}")
+            self._dirs[wd] = directory
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def changes(self) -> set:
+        """Drain pending events; return the watched paths they concern."""
+        changed = set()
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buf):
+                wd, _, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+                start = offset + _EVENT_HEADER.size
+                name = os.fsdecode(buf[start:start + length].rstrip(b"\0"))
+                offset = start + length
+                directory = self._dirs.get(wd)
+                if directory is not None and name in self._files[directory]:
+                    changed.add(directory / name)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Fallback watcher comparing each file's stat every `interval` seconds."""
+
+    def __init__(self, paths: list, interval: float = DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self._stats = {Path(os.path.abspath(p)): self._stat(p) for p in paths}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def fileno(self):
+        return None
+
+    def changes(self) -> set:
+        changed = set()
+        for path, old in self._stats.items():
+            new = self._stat(path)
+            if new != old:
+                self._stats[path] = new
+                changed.add(path)
+        return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(paths: list, poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """Return an InotifyWatcher where available, else a PollingWatcher."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(paths, poll_interval)
+
+
+class WatchDaemon:
+    """
+    Resident updater for a fixed set of files.
+
+    Status updates arrive one per line over a Unix socket and/or a file
+    descriptor (stdin). Updates are coalesced: a batch is applied `debounce`
+    seconds after the first pending update, with the latest status winning,
+    through `update_files` and a shared MarkerIndex. Files edited by someone
+    else are re-stamped with the current status and timestamp; re-applying
+    them is a no-op for the daemon's own writes.
+    """
+
+    def __init__(
+        self,
+        paths: list,
+        status: str = "✅",
+        markers: list = ["AUTO_SECTION"],
+        debounce: float = DEFAULT_DEBOUNCE,
+        socket_path: str = None,
+        input_fd: int = None,
+        watcher=None,
+        backup: str = "copy",
+        output=print,
+    ):
+        self.paths = [Path(p) for p in paths]
+        self._watched = {Path(os.path.abspath(p)): p for p in self.paths}
+        self.markers = list(markers)
+        self.debounce = debounce
+        self.socket_path = socket_path
+        self.backup = backup
+        self.output = output
+        self.watcher = watcher if watcher is not None else make_watcher(self.paths)
+        self.index = MarkerIndex()
+        self.batches = 0
+
+        self._selector = selectors.DefaultSelector()
+        self._buffers = {}
+        self._status = status
+        self._pending_status = status
+        self._dirty = set()
+        self._deadline = time.monotonic()
+        self._sections = {m: "status" for m in self.markers}
+        self._context = None
+        self._running = False
+
+        watched = self.watcher.fileno()
+        if watched is not None:
+            self._selector.register(watched, selectors.EVENT_READ, self._on_watch)
+        if input_fd is not None:
+            os.set_blocking(input_fd, False)
+            self._selector.register(input_fd, selectors.EVENT_READ, self._on_input)
+        self._listener = None
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._listener.bind(socket_path)
+            self._listener.listen()
+            self._listener.setblocking(False)
+            self._selector.register(self._listener, selectors.EVENT_READ, self._on_accept)
+
+    def submit_status(self, status: str):
+        """Queue a status update; it is applied with the next batch."""
+        if self._pending_status is None and not self._dirty:
+            self._deadline = time.monotonic() + self.debounce
+        self._pending_status = status
+
+    def notify_changed(self, paths):
+        """Queue files changed on disk to be re-stamped with the next batch."""
+        paths = {p for p in paths if p in self._watched}
+        if paths and self._pending_status is None and not self._dirty:
+            self._deadline = time.monotonic() + self.debounce
+        self._dirty.update(paths)
+
+    def flush(self) -> list:
+        """Apply every pending update now; return the FileResults."""
+        if self._pending_status is not None:
+            self._status = self._pending_status
+            # A new status gets a new timestamp; external edits reuse the last one
+            self._context = RunContext(["clock"], {"status": self._status})
+            targets = self.paths
+        elif self._dirty:
+            targets = [self._watched[p] for p in self._dirty]
+        else:
+            return []
+        self._pending_status = None
+        self._dirty = set()
+
+        results = update_files(
+            targets,
+            sections=self._sections,
+            context=self._context,
+            workers=1,
+            backup=self.backup,
+            index=self.index,
+        )
+        self.batches += 1
+        for result in results:
+            if result.outcome == UPDATED:
+                self.output(f"{result.path} has been updated with status {self._status}.")
+            elif result.outcome == MISSING:
+                self.output(f"Warning: {result.error}")
+            elif result.outcome == ERROR:
+                self.output(f"Error: {result.path}: {result.error}")
+        return results
+
+    def _on_watch(self, key):
+        self.notify_changed(self.watcher.changes())
+
+    def _on_accept(self, key):
+        conn, _ = self._listener.accept()
+        conn.setblocking(False)
+        self._selector.register(conn, selectors.EVENT_READ, self._on_input)
+
+    def _on_input(self, key):
+        fd = key.fd
+        try:
+            data = key.fileobj.recv(4096) if isinstance(key.fileobj, socket.socket) else os.read(fd, 4096)
+        except BlockingIOError:
+            return
+        lines = (self._buffers.pop(fd, b"") + data).split(b"\n")
+        if data:
+            self._buffers[fd] = lines.pop()
+        for line in lines:
+            status = line.decode("utf-8", errors="replace").strip()
+            if status:
+                self.submit_status(status)
+        if not data:
+            self._selector.unregister(key.fileobj)
+            if isinstance(key.fileobj, socket.socket):
+                key.fileobj.close()
+            elif self._listener is None:
+                # stdin was the only input: finish the pending batch and exit
+                self._running = False
+
+    def run_once(self, timeout: float = None):
+        """Wait for input for at most `timeout` seconds and apply due batches."""
+        pending = self._pending_status is not None or self._dirty
+        if pending:
+            wait = max(0.0, self._deadline - time.monotonic())
+            timeout = wait if timeout is None else min(timeout, wait)
+        if self.watcher.fileno() is None:
+            interval = self.watcher.interval
+            timeout = interval if timeout is None else min(timeout, interval)
+
+        for key, _ in self._selector.select(timeout):
+            key.data(key)
+        if self.watcher.fileno() is None:
+            self.notify_changed(self.watcher.changes())
+
+        if (self._pending_status is not None or self._dirty) and time.monotonic() >= self._deadline:
+            self.flush()
+
+    def serve_forever(self):
+        self._running = True
+        try:
+            while self._running:
+                self.run_once()
+            self.flush()
+        finally:
+            self.close()
+
+    def close(self):
+        for key in list(self._selector.get_map().values()):
+            if isinstance(key.fileobj, socket.socket):
+                key.fileobj.close()
+        self._selector.close()
+        self.watcher.close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def send_status(socket_path: str, status: str):
+    """Send one status update to a running daemon."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path)
+        conn.sendall(status.encode("utf-8") + b"\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep marker sections up to date from a resident process"
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="Files or glob patterns to watch (default: README.md)",
+    )
+    parser.add_argument(
+        "--status",
+        default="✅",
+        help="Initial deployment status (default: '✅')",
+    )
+    parser.add_argument(
+        "--markers",
+        default="AUTO_SECTION",
+        help="Comma-separated list of marker prefixes (default: 'AUTO_SECTION')",
+    )
+    parser.add_argument(
+        "--socket",
+        help="Accept status updates, one per line, on this Unix socket",
+    )
+    parser.add_argument(
+        "--stdin",
+        action="store_true",
+        help="Accept status updates, one per line, on stdin",
+    )
+    parser.add_argument(
+        "--send",
+        metavar="STATUS",
+        help="Send STATUS to the daemon listening on --socket and exit",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help=f"Seconds to coalesce updates before applying them (default: {DEFAULT_DEBOUNCE})",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help="Seconds between checks when inotify is unavailable",
+    )
+    parser.add_argument(
+        "--backup",
+        choices=BACKUP_MODES,
+        default="copy",
+        help="Keep the previous contents as <file>.bak: off, copy or hardlink (default: copy)",
+    )
+    metrics.add_argument(parser)
+    args = parser.parse_args()
+
+    if args.send is not None:
+        if not args.socket:
+            parser.error("--send requires --socket")
+        send_status(args.socket, args.send)
+        return
+    if not (args.socket or args.stdin):
+        parser.error("at least one of --socket or --stdin is required")
+
+    with metrics.recording(args.metrics):
+        paths = [p for p in expand_paths(args.paths or ["README.md"]) if p.is_file()]
+        if not paths:
+            print("Error: no files matched.")
+            sys.exit(1)
+
+        daemon = WatchDaemon(
+            paths,
+            status=args.status,
+            markers=[m.strip() for m in args.markers.split(",") if m.strip()],
+            debounce=args.debounce,
+            socket_path=args.socket,
+            input_fd=sys.stdin.fileno() if args.stdin else None,
+            watcher=make_watcher(paths, args.poll_interval),
+            backup=args.backup,
+        )
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()